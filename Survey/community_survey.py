@@ -6,6 +6,8 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramForbiddenError, TelegramAPIError
 from config import settings
+from database import segments
+from utils.send_queue import stream_to_workers
 
 router = Router()
 
@@ -77,20 +79,18 @@ async def run_club_survey_broadcast(bot: Bot, db):
     Round 2 Broadcaster: Targets EVERY registered user in the system 
     who has NOT cast a vote yet, regardless of payment history.
     """
-    rows = await db._pool.fetch("""
-        SELECT u.telegram_id, u.language,
-               EXISTS(SELECT 1 FROM payments p WHERE p.user_id = u.telegram_id AND p.status = 'approved') as is_paid
-        FROM users u
-        WHERE NOT EXISTS (
-            SELECT 1 FROM club_survey_results r 
-            WHERE r.user_id = u.telegram_id
-        )
-    """)
+    query, args = segments.select(
+        "club_survey_pending",
+        "u.telegram_id, u.language, "
+        "EXISTS(SELECT 1 FROM payments p WHERE p.user_id = u.telegram_id AND p.status = 'approved') as is_paid",
+    )
     
-    logging.info(f"🚀 Starting Club Survey Round 2 for {len(rows)} remaining users.")
+    logging.info("🚀 Starting Club Survey Round 2 for remaining users.")
     sent, skipped, failed = 0, 0, 0
 
-    for user in rows:
+    # Concurrent sends, paced by the shared Bot session limiter
+    async def send_survey(user):
+        nonlocal sent, skipped, failed
         uid = user['telegram_id']
         lang = user['language'] or 'EN'
         is_paid = user['is_paid']
@@ -101,7 +101,6 @@ async def run_club_survey_broadcast(bot: Bot, db):
             
             await bot.send_message(chat_id=uid, text=text, reply_markup=kb, parse_mode="HTML")
             sent += 1
-            await asyncio.sleep(0.05)  # Safe spacing (20 msgs/sec) to perfectly obey Telegram limits
             
         except TelegramForbiddenError:
             logging.warning(f"🚫 User {uid} blocked the bot. Skipping smoothly.")
@@ -113,6 +112,10 @@ async def run_club_survey_broadcast(bot: Bot, db):
             logging.error(f"❌ Structural system error for user {uid}: {e}")
             failed += 1
 
+    total = await stream_to_workers(
+        db.iter_chunks(query, *args), send_survey, workers=settings.BROADCAST_WORKERS
+    )
+    logging.info(f"📨 Club Survey streamed to {total} users.")
     return sent, skipped, failed
 
 # --- 3. INBOUND SURVEY RESPONSE HANDLERS ---
@@ -6,6 +6,8 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramForbiddenError
 from config import settings
+from database import segments
+from utils.send_queue import stream_to_workers
 
 router = Router()
 
@@ -52,25 +54,17 @@ async def run_price_survey_broadcast(bot: Bot, db):
     Finds unpaid users who haven't responded yet and sends the survey.
     Handles blocks and FK violations gracefully.
     """
-    # 1. FETCH: Only users who haven't paid AND haven't voted yet
-    rows = await db._pool.fetch("""
-        SELECT u.telegram_id, u.language 
-        FROM users u
-        WHERE NOT EXISTS (
-            SELECT 1 FROM payments p 
-            WHERE p.user_id = u.telegram_id AND p.status = 'approved'
-        )
-        AND NOT EXISTS (
-            SELECT 1 FROM price_survey_results r 
-            WHERE r.user_id = u.telegram_id
-        )
-    """)
+    # 1. STREAM: Only users who haven't paid AND haven't voted yet
+    query, args = segments.select("price_survey_pending", "u.telegram_id, u.language")
     
-    logging.info(f"🚀 Starting Survey for {len(rows)} users who haven't voted yet.")
+    logging.info("🚀 Starting Survey for users who haven't voted yet.")
     
     sent, skipped, failed = 0, 0, 0
+    blocked = []
 
-    for user in rows:
+    # Concurrent sends, paced by the shared Bot session limiter
+    async def send_survey(user):
+        nonlocal sent, skipped, failed
         uid = user['telegram_id']
         lang = user['language'] or 'EN'
         
@@ -80,23 +74,26 @@ async def run_price_survey_broadcast(bot: Bot, db):
             
             await bot.send_message(chat_id=uid, text=text, reply_markup=kb, parse_mode="HTML")
             sent += 1
-            await asyncio.sleep(0.06) 
             
         except TelegramForbiddenError:
-            # Catch block and try to delete; if FK violation happens, just skip
-            logging.warning(f"🚫 User {uid} blocked. Attempting cleanup...")
-            try:
-                await db._pool.execute("DELETE FROM users WHERE telegram_id = $1", uid)
-                skipped += 1
-            except Exception: 
-                # This is the Foreign Key violation catch
-                logging.warning(f"⚠️ Could not delete {uid} due to existing references. Skipping.")
-                skipped += 1
+            # Cleanup happens in one batched delete after the run
+            logging.warning(f"🚫 User {uid} blocked. Queued for cleanup...")
+            blocked.append(uid)
+            skipped += 1
                 
         except Exception as e:
             logging.error(f"❌ Other error for {uid}: {e}")
             failed += 1
 
+    total = await stream_to_workers(
+        db.iter_chunks(query, *args), send_survey, workers=settings.BROADCAST_WORKERS
+    )
+    logging.info(f"📨 Survey streamed to {total} users.")
+
+    if blocked:
+        # Users with existing references (payments etc.) are kept
+        deleted = await db.prune_blocked_users(blocked)
+        logging.info(f"🗑 Cleaned {len(deleted)}/{len(blocked)} blocked users.")
     return sent, skipped, failed
 
 # --- 3. HANDLERS ---
@@ -1,8 +1,13 @@
 # handlers/admin_api.py
+import asyncio
+import csv
+import io
 import logging
+import tempfile
 import time
+from contextlib import aclosing
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, timezone
 from typing import Any, Dict, Iterable, List, Optional
 
 from aiohttp import web
@@ -190,6 +195,8 @@ def setup_admin_routes(app: web.Application):
     app.router.add_get("/api/admin/payments/recent", get_recent_payments)
     app.router.add_get("/api/admin/payments/kpis", get_payment_kpis)
     app.router.add_post("/api/admin/payments/{payment_id}/verify", verify_payment)
+    app.router.add_get("/api/admin/export/payments", export_payments_ledger)
+    app.router.add_get("/api/admin/export/club_payments", export_club_ledger)
 
     # --- Products (Core) ---
     app.router.add_get("/api/admin/products", get_products)
@@ -478,32 +485,14 @@ async def get_pending_payout_stats(request: web.Request) -> web.Response:
         )
         last_payout_ts = last_payout_ts or datetime.min
 
-        # 2. Extract itemized Pending Balances (Product vs Club streams)
-        pending_row = await db.fetchrow("""
-    SELECT 
-        COALESCE((
-            SELECT SUM(amount) FROM payments 
-            WHERE status = 'approved' AND approved_at > $1
-        ), 0) as products_total,
-        COALESCE((
-            SELECT SUM(amount) FROM club_payments 
-            WHERE status = 'approved' AND processed_at > $1
-        ), 0) as club_total
-""", last_payout_ts)
-        
-        pending_products = Decimal(str(pending_row['products_total']))
-        pending_club = Decimal(str(pending_row['club_total']))
+        # 2. Extract itemized Pending Balances (Product vs Club streams) and
+        # 3. Itemized Lifetime KPIs (served from the kpi_counters snapshot)
+        stats = await db.get_pending_payout_stats(last_payout_ts)
+
+        pending_products = Decimal(str(stats['products_total']))
+        pending_club = Decimal(str(stats['club_total']))
         pending_revenue_total = pending_products + pending_club
 
-        # 3. Calculate Itemized Lifetime KPIs
-        stats = await db.fetchrow("""
-    SELECT 
-        (SELECT COALESCE(SUM(amount), 0) FROM payments WHERE status = 'approved') as lt_products_gross,
-        (SELECT COALESCE(SUM(amount), 0) FROM club_payments WHERE status = 'approved') as lt_club_gross,
-        (SELECT COALESCE(SUM(operational_deductions), 0) FROM payout_history) as lt_burn,
-        (SELECT COALESCE(SUM(coach_share + dagmawi_share), 0) FROM payout_history) as lt_paid
-""")
-        
         lt_products_gross = Decimal(str(stats['lt_products_gross']))
         lt_club_gross = Decimal(str(stats['lt_club_gross']))
         lt_gross_total = lt_products_gross + lt_club_gross
@@ -655,4 +644,155 @@ async def get_payout_history(request: web.Request) -> web.Response:
         return web.json_response(records_to_list(rows))
     except Exception:
         LOG.exception("get_payout_history failed")
-        return web.json_response([], status=500)
\ No newline at end of file
+        return web.json_response([], status=500)
+
+
+# --- Ledger Exports (streamed) ----------------------------------------------
+# Rows come off db.iter_chunks one keyset page at a time (keyed on the first column,
+# the ledger id), so memory stays flat whatever the date range and no transaction is
+# held open while a slow client drains the response. CSV bytes go out per chunk; XLSX
+# rows go to openpyxl's write-only workbook (spooled to disk) and the file follows once
+# it closes.
+
+_LEDGER_QUERIES = {
+    "payments": ("""
+        SELECT p.id AS payment_id, p.created_at, p.status, p.amount,
+               u.telegram_id, u.full_name, u.username,
+               pr.title AS product_title, pr.language, p.proof_file_id
+        FROM payments p
+        LEFT JOIN users    u  ON u.telegram_id = p.user_id
+        LEFT JOIN products pr ON pr.id         = p.product_id
+        WHERE {where}
+        ORDER BY p.id
+    """, "p"),
+    "club_payments": ("""
+        SELECT cp.id AS club_payment_id, cp.created_at, cp.status, cp.amount,
+               u.telegram_id, u.full_name, u.username,
+               cp.processed_by, cp.processed_at, cp.proof_file_id
+        FROM club_payments cp
+        LEFT JOIN users u ON u.telegram_id = cp.user_id
+        WHERE {where}
+        ORDER BY cp.id
+    """, "cp"),
+}
+_LEDGER_COLUMNS = {
+    "payments": ["payment_id", "created_at", "status", "amount", "telegram_id", "full_name",
+                 "username", "product_title", "language", "proof_file_id"],
+    "club_payments": ["club_payment_id", "created_at", "status", "amount", "telegram_id", "full_name",
+                      "username", "processed_by", "processed_at", "proof_file_id"],
+}
+_LEDGER_STATUSES = {"approved", "pending", "rejected", "all"}
+_XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+_XLSX_READ_SIZE = 64 * 1024
+
+
+def _ledger_query(stream: str, query: Dict[str, str]):
+    """(sql, args, filename stem) from ?status=&from=&to=; raises ValueError on bad input."""
+    sql, alias = _LEDGER_QUERIES[stream]
+    status = query.get("status", "approved").lower()
+    if status not in _LEDGER_STATUSES:
+        raise ValueError("invalid_status")
+    clauses, args = [], []
+    if status != "all":
+        args.append(status)
+        clauses.append(f"{alias}.status = ${len(args)}")
+    date_from = date.fromisoformat(query["from"]) if query.get("from") else None
+    date_to = date.fromisoformat(query["to"]) if query.get("to") else None
+    if date_from:
+        args.append(date_from)
+        clauses.append(f"{alias}.created_at::date >= ${len(args)}")
+    if date_to:
+        args.append(date_to)
+        clauses.append(f"{alias}.created_at::date <= ${len(args)}")
+    stem = f"{stream}_{status}_{date_from or 'start'}_{date_to or 'today'}"
+    return sql.format(where=" AND ".join(clauses) or "TRUE"), args, stem
+
+
+def _csv_value(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return "" if v is None else v
+
+
+def _xlsx_value(v):
+    # Excel has no timezone support: write UTC wall-clock time
+    if isinstance(v, datetime) and v.tzinfo is not None:
+        return v.astimezone(timezone.utc).replace(tzinfo=None)
+    return v
+
+
+async def _stream_csv(db, resp: web.StreamResponse, sql: str, args: list, columns: List[str]):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")                      # BOM: Excel opens UTF-8 names correctly
+    writer.writerow(columns)
+    await resp.write(buf.getvalue().encode())
+    async with aclosing(db.iter_chunks(sql, *args, key=columns[0])) as chunks:
+        async for rows in chunks:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([_csv_value(r[c]) for c in columns] for r in rows)
+            await resp.write(buf.getvalue().encode())
+
+
+async def _stream_xlsx(db, resp: web.StreamResponse, sql: str, args: list, columns: List[str], title: str):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title)
+    ws.append(columns)
+    async with aclosing(db.iter_chunks(sql, *args, key=columns[0])) as chunks:
+        async for rows in chunks:
+            for r in rows:
+                ws.append([_xlsx_value(r[c]) for c in columns])
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as out:
+        await asyncio.to_thread(wb.save, out)
+        out.seek(0)
+        while chunk := out.read(_XLSX_READ_SIZE):
+            await resp.write(chunk)
+
+
+async def _export_ledger(request: web.Request, stream: str) -> web.StreamResponse:
+    db = request.app["db"]
+    fmt = request.query.get("format", "csv").lower()
+    if fmt not in {"csv", "xlsx"}:
+        return web.json_response({"error": "invalid_format"}, status=400)
+    try:
+        sql, args, stem = _ledger_query(stream, request.query)
+    except ValueError as e:
+        error = str(e) if str(e) == "invalid_status" else "invalid_date"
+        return web.json_response({"error": error}, status=400)
+
+    resp = web.StreamResponse(headers={
+        "Content-Type": "text/csv; charset=utf-8" if fmt == "csv" else _XLSX_MIME,
+        "Content-Disposition": f'attachment; filename="{stem}.{fmt}"',
+        "Cache-Control": "no-store",
+    })
+    resp.enable_chunked_encoding()
+    await resp.prepare(request)        # headers go out before the first row is read
+
+    columns = _LEDGER_COLUMNS[stream]
+    try:
+        if fmt == "csv":
+            await _stream_csv(db, resp, sql, args, columns)
+        else:
+            await _stream_xlsx(db, resp, sql, args, columns, stream)
+        await resp.write_eof()
+    except ConnectionResetError:
+        LOG.info("ledger export %s: client disconnected", stream)
+    except Exception:
+        # Status line is already sent; a truncated chunked body is the only signal left
+        LOG.exception("ledger export %s failed", stream)
+        if request.transport is not None:
+            request.transport.close()
+    return resp
+
+
+async def export_payments_ledger(request: web.Request) -> web.StreamResponse:
+    """GET /api/admin/export/payments?format=csv|xlsx&status=approved&from=YYYY-MM-DD&to=YYYY-MM-DD"""
+    return await _export_ledger(request, "payments")
+
+
+async def export_club_ledger(request: web.Request) -> web.StreamResponse:
+    """GET /api/admin/export/club_payments?format=csv|xlsx&status=approved&from=YYYY-MM-DD&to=YYYY-MM-DD"""
+    return await _export_ledger(request, "club_payments")
@@ -3,7 +3,76 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from config import settings
 from database.db import Database
+from utils.product_matcher import ProductMatcher
+from utils.receipt_cache import ReceiptCache
+from utils.audit_queue import AuditQueue, StageLimits
+from utils.payment_approval import AutoApprover, parse_policies
+from middlewares.rate_limit_middleware import TelegramRateLimiter, TelegramRateLimitMiddleware
 
 bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN))
+
+# One limiter for every outbound send (handlers, broadcasts, surveys, reminders)
+rate_limiter = TelegramRateLimiter(
+    global_rate=settings.TG_GLOBAL_RATE,
+    global_burst=settings.TG_GLOBAL_BURST,
+    chat_rate=settings.TG_CHAT_RATE,
+    chat_burst=settings.TG_CHAT_BURST,
+    group_rate=settings.TG_GROUP_RATE,
+    admin_rate=settings.TG_ADMIN_RATE,
+)
+bot.session.middleware(TelegramRateLimitMiddleware(rate_limiter, max_retries=settings.TG_RETRY_AFTER_ATTEMPTS))
+
 dp = Dispatcher()
-db = Database(dsn=settings.DATABASE_URL)
\ No newline at end of file
+db = Database(
+    dsn=settings.DATABASE_URL,
+    user_cache_ttl=settings.USER_CACHE_TTL_SECONDS,
+    user_cache_size=settings.USER_CACHE_MAX_SIZE,
+    cursor_chunk_size=settings.DB_CURSOR_CHUNK_SIZE,
+    connection_mode=settings.DB_CONNECTION_MODE,
+    pool_min_size=settings.DB_POOL_MIN_SIZE,
+    pool_max_size=settings.DB_POOL_MAX_SIZE,
+    max_inactive_connection_lifetime=settings.DB_MAX_INACTIVE_CONN_LIFETIME,
+    statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+)
+
+# In-memory product index behind db.match_product (started in bot.on_startup)
+product_matcher = ProductMatcher(
+    db,
+    listen_dsn=settings.DB_LISTEN_URL,
+    refresh_interval=settings.PRODUCT_INDEX_REFRESH_SECONDS,
+)
+db.product_matcher = product_matcher
+
+# OCR + verification results per receipt (handlers/verify.scan_receipt)
+db.receipt_cache = ReceiptCache(
+    db,
+    max_entries=settings.RECEIPT_CACHE_SIZE,
+    negative_ttl=settings.RECEIPT_CACHE_NEGATIVE_TTL,
+    phash_distance=settings.RECEIPT_PHASH_MAX_DISTANCE,
+)
+
+# Bounded receipt audit workers (started in bot.on_startup); handlers enqueue via db.audit_queue
+audit_queue = AuditQueue(
+    db,
+    bot,
+    workers=settings.AUDIT_WORKERS,
+    limits=StageLimits(
+        download=settings.AUDIT_DOWNLOAD_CONCURRENCY,
+        cpu=settings.AUDIT_CPU_CONCURRENCY,
+        remote=settings.AUDIT_REMOTE_CONCURRENCY,
+    ),
+    max_attempts=settings.AUDIT_MAX_ATTEMPTS,
+    retry_base=settings.AUDIT_RETRY_BASE_SECONDS,
+    lease_seconds=settings.AUDIT_LEASE_SECONDS,
+)
+db.audit_queue = audit_queue
+
+# Opt-in auto-approval of fully verified product payments (empty AUTO_APPROVE_PROVIDERS = off)
+db.auto_approver = AutoApprover(
+    db,
+    parse_policies(
+        settings.AUTO_APPROVE_PROVIDERS,
+        default_tolerance=settings.AUTO_APPROVE_AMOUNT_TOLERANCE,
+        default_max_age=settings.AUTO_APPROVE_MAX_AGE_HOURS,
+    ),
+)
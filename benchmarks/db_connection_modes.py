@@ -0,0 +1,123 @@
+# benchmarks/db_connection_modes.py
+"""
+Per-query latency for the two Database connection modes.
+
+    python -m benchmarks.db_connection_modes --iterations 500 --concurrency 10
+    python -m benchmarks.db_connection_modes --dsn postgres://... --modes direct
+
+Runs the bot's hot read queries (get_user, get_user_language, match_product and the
+club_checkins lookup) against DATABASE_URL in "direct" (statement cache on) and
+"pooler" (statement_cache_size=0) mode and prints p50/p95/p99 per query.
+Read-only: nothing is written. Use a direct (non-pooler) DSN to measure "direct" mode.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.db import Database, CONNECTION_MODES  # noqa: E402
+
+HOT_QUERIES = {
+    "get_user": ("SELECT * FROM users WHERE telegram_id = $1", lambda s: (s["user_id"],)),
+    "get_user_language": ("SELECT language FROM users WHERE telegram_id = $1", lambda s: (s["user_id"],)),
+    "match_product": (
+        """
+            SELECT * FROM products
+            WHERE language = $1
+            AND level = $2
+            AND frequency = $3
+            AND is_active = TRUE
+            LIMIT 1
+        """,
+        lambda s: (s["language"], s["level"], s["frequency"]),
+    ),
+    "club_checkin": (
+        "SELECT 1 FROM club_checkins WHERE user_id = $1 AND checkin_date = $2",
+        lambda s: (s["user_id"], date.today()),
+    ),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def load_sample(db: Database) -> dict:
+    row = await db._pool.fetchrow("""
+        SELECT telegram_id, COALESCE(language, 'EN') AS language,
+               COALESCE(level, 'Beginner') AS level, COALESCE(frequency, 3) AS frequency
+        FROM users ORDER BY created_at DESC LIMIT 1
+    """)
+    if not row:
+        return {"user_id": 0, "language": "EN", "level": "Beginner", "frequency": 3}
+    return {"user_id": row["telegram_id"], "language": row["language"],
+            "level": row["level"], "frequency": row["frequency"]}
+
+
+async def run_mode(dsn: str, mode: str, iterations: int, concurrency: int, warmup: int) -> dict:
+    db = Database(dsn, connection_mode=mode, pool_min_size=concurrency, pool_max_size=concurrency)
+    await db.connect()
+    results = {}
+    try:
+        sample = await load_sample(db)
+        for name, (sql, make_args) in HOT_QUERIES.items():
+            args = make_args(sample)
+            for _ in range(warmup):
+                await db._pool.fetch(sql, *args)
+
+            latencies = []
+            remaining = iterations
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    t0 = time.perf_counter()
+                    await db._pool.fetch(sql, *args)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "mean": statistics.mean(latencies),
+                "qps": len(latencies) / elapsed,
+            }
+    finally:
+        await db._pool.close()
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL", ""))
+    parser.add_argument("--modes", nargs="+", choices=CONNECTION_MODES, default=list(CONNECTION_MODES))
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("set DATABASE_URL or pass --dsn")
+
+    print(f"{'mode':<8} {'query':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'qps':>8}")
+    for mode in args.modes:
+        results = await run_mode(args.dsn, mode, args.iterations, args.concurrency, args.warmup)
+        for name, r in results.items():
+            print(f"{mode:<8} {name:<18} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} "
+                  f"{r['mean']:>8.2f} {r['qps']:>8.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+# benchmarks/receipt_parser.py
+"""
+Micro-benchmark: sequential re.search chain vs the compiled provider-plugin parser.
+
+    python -m benchmarks.receipt_parser --iterations 20000
+    python -m benchmarks.receipt_parser --texts ./receipts/.ocr --iterations 2000
+
+--texts takes a directory of OCR text files (e.g. the --text-cache of
+benchmarks/receipt_pipeline.py); without it a few synthetic CBE/Telebirr/BOA/unknown
+receipts are used. Prints per-call p50/p95/p99 in microseconds for both parsers and how
+often they agree on provider and reference (the plugin parser is expected to differ on
+BOA receipts and on receipts that mention more than one bank).
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.receipt_parser import parse_receipt  # noqa: E402
+
+SAMPLES = [
+    "Commercial Bank of Ethiopia\nPayer  ABEBE KEBEDE\nReceiver  HILAWE TESFAYE\n"
+    "Transferred Amount 1,500.00 ETB\nReference No. (VAT Invoice No) FT24123ABC45\n",
+    "telebirr\nTransaction Number: DAB1C2D3E4\nCredited Party name  Hilawe T\n"
+    "Total Paid Amount 2,000.00 (Birr)\nየግብይት ቁጥር: DAB1C2D3E4\n",
+    "Bank of Abyssinia\nTransaction Reference: FT23456789AB\nBeneficiary Name: HILAWE T\n"
+    "Amount ETB 750.00\nDate 2025-01-04\n",
+    "Payment successful\nየግብይት ቁጥር: CH12345678\nTotal 12.00\n",
+]
+
+
+# ── the chain handlers/verify.py used before utils/receipt_parser.py ──
+def _legacy_detect(up):
+    if any(k in up for k in ("COMMERCIAL BANK", "CBE", "BRECIEPT", "FT2")):
+        return "CBE"
+    if any(k in up for k in ("TELEBIRR", "ETHIO TELECOM", "TELE BIRR")) or re.search(r"\b(D[A-Z0-9]{9})\b", up):
+        return "Telebirr"
+    if "AWASH" in up:
+        return "Awash"
+    return "Unknown"
+
+
+def _legacy_cbe(up):
+    m = re.search(r"F\s*T\s*([A-Z0-9]{8,12})", up)
+    if m: return ("FT" + m.group(1)).replace(" ", "")
+    m = re.search(r"(?:ID|TRANSACTION\s*ID)[:\s]+([A-Z0-9]{10,14})", up)
+    if m: return m.group(1).strip()
+    m = re.search(r"\b(FT[A-Z0-9]{8,12})\b", up)
+    return m.group(1) if m else None
+
+
+def _legacy_telebirr(up, raw):
+    for label in ("TRANSACTION NUMBER", "TRANSACTION NO", "INVOICE NO",
+                  "INVOICE NUMBER", "REF NO", "REFERENCE NO", "NUMBER"):
+        m = re.search(rf"{label}[:\s#]+([A-Z0-9]{{8,14}})", up)
+        if m: return m.group(1).strip()
+    m = re.search(r"የግብይት\s*ቁጥር[:\s]+([A-Z0-9a-z]{8,14})", raw, re.UNICODE)
+    if m: return m.group(1).strip().upper()
+    m = re.search(r"\b(D[A-Z0-9]{9})\b", up)
+    return m.group(1).strip() if m else None
+
+
+def legacy_parse(raw):
+    up = re.sub(r'[^A-Z0-9\n\s:\-]', ' ', raw.upper())
+    provider = _legacy_detect(up)
+    ref = None
+    if provider == "CBE":
+        ref = _legacy_cbe(up)
+    elif provider in ("Telebirr", "Unknown"):
+        ref = _legacy_telebirr(up, raw)
+        if ref:
+            provider = "Telebirr"
+    amounts = re.findall(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)", raw)
+    amount = max(amounts, key=lambda x: len(x.replace(",", ""))) if amounts else None
+    is_hilawe = "HILAWE" in raw.upper()
+    return {"provider": provider, "ref": ref, "amount": amount, "hilawe": is_hilawe}
+
+
+def plugin_parse(raw):
+    parsed = parse_receipt(raw)
+    return {"provider": parsed["provider"], "ref": parsed["ref"], "amount": parsed["amount"],
+            "hilawe": "HILAWE" in (parsed["receiver"] or raw.upper())}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def measure(fn, texts, iterations):
+    latencies = []
+    for i in range(iterations):
+        text = texts[i % len(texts)]
+        t0 = time.perf_counter()
+        fn(text)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", help="directory of OCR .txt files")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = SAMPLES
+    if args.texts:
+        texts = [p.read_text(encoding="utf-8") for p in sorted(Path(args.texts).glob("*.txt"))]
+        if not texts:
+            parser.error(f"no .txt files in {args.texts}")
+
+    print(f"{len(texts)} texts · {args.iterations} calls each")
+    print(f"{'parser':<8} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'mean us':>8}")
+    for name, fn in (("legacy", legacy_parse), ("plugins", plugin_parse)):
+        measure(fn, texts, args.warmup)
+        lat = measure(fn, texts, args.iterations)
+        print(f"{name:<8} {percentile(lat, 50):>8.1f} {percentile(lat, 95):>8.1f} "
+              f"{percentile(lat, 99):>8.1f} {statistics.mean(lat):>8.1f}")
+
+    old, new = [legacy_parse(t) for t in texts], [plugin_parse(t) for t in texts]
+    print("\nagreement with legacy")
+    for field in ("provider", "ref", "amount", "hilawe"):
+        same = sum(a[field] == b[field] for a, b in zip(old, new))
+        print(f"{field:<8} {same}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+# benchmarks/receipt_pipeline.py
+"""
+Offline receipt-extraction benchmark + regression corpus.
+
+    python -m benchmarks.receipt_pipeline --corpus ./receipts
+    python -m benchmarks.receipt_pipeline --corpus ./receipts --concurrency 1 4 8 --repeat 2
+    python -m benchmarks.receipt_pipeline --corpus ./receipts --text-cache ./receipts/.ocr --json run.json
+    python -m benchmarks.receipt_pipeline --corpus ./receipts --baseline run.json
+
+Runs the production pipeline over every jpg/jpeg/png in --corpus without Telegram or
+any network call:
+
+  preprocess   handlers/verify._preprocess_for_ocr (OCR_PREPROCESS_WORKERS processes)
+  ocr          OcrEngine with the local Tesseract backend only (OCR_PROCESS_WORKERS processes)
+  parse        handlers/verify._parse_ocr_text (provider detection, ref + amount extraction)
+
+and prints per-stage p50/p95/p99, throughput (images/s) per --concurrency level and field
+accuracy (provider, ref, amount) against the labels file:
+
+    <corpus>/labels.json  {"cbe_01.jpg": {"provider": "CBE", "ref": "FT24...", "amount": "1500.00"}, ...}
+
+--text-cache stores the OCR text per image so parser-only changes are measured in seconds.
+--baseline compares accuracy with an earlier --json report and exits 1 on any regression.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from handlers.verify import _parse_ocr_text, _preprocess_for_ocr  # noqa: E402
+from utils.ocr_engine import OcrEngine, TesseractBackend  # noqa: E402
+
+EXTENSIONS = {".jpg", ".jpeg", ".png"}
+STAGES = ("preprocess", "ocr", "parse", "total")
+FIELDS = ("provider", "ref", "amount")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _same(field: str, got, want) -> bool:
+    if field == "amount":
+        try:
+            return float(str(got).replace(",", "")) == float(str(want).replace(",", ""))
+        except (TypeError, ValueError):
+            return False
+    return str(got or "").strip().upper() == str(want).strip().upper()
+
+
+class TextCache:
+    """OCR output keyed by image content, so only the parser re-runs on later passes."""
+
+    def __init__(self, root: Path | None):
+        self.root = root
+        if root is not None:
+            root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, data: bytes) -> Path:
+        return self.root / f"{hashlib.sha1(data).hexdigest()}.txt"
+
+    def get(self, data: bytes) -> str | None:
+        if self.root is None:
+            return None
+        path = self._path(data)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def put(self, data: bytes, text: str):
+        if self.root is not None:
+            self._path(data).write_text(text, encoding="utf-8")
+
+
+async def run_one(path: Path, engine: OcrEngine, cache: TextCache) -> tuple:
+    """(timings ms per stage, parsed fields) for one image."""
+    timings = {}
+    data = path.read_bytes()
+    started = time.perf_counter()
+
+    text = cache.get(data)
+    if text is None:
+        t0 = time.perf_counter()
+        image_bytes = await _preprocess_for_ocr(data)
+        timings["preprocess"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        text, _ = await engine.recognize(image_bytes, usable=lambda t: bool(t.strip()))
+        timings["ocr"] = (time.perf_counter() - t0) * 1000
+        cache.put(data, text)
+
+    t0 = time.perf_counter()
+    parsed = _parse_ocr_text(text)
+    timings["parse"] = (time.perf_counter() - t0) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return timings, {"provider": parsed["provider"], "ref": parsed["ref"], "amount": parsed["amount_fallback"]}
+
+
+async def run_level(paths: list, engine: OcrEngine, cache: TextCache, concurrency: int, repeat: int) -> dict:
+    queue = [p for _ in range(repeat) for p in paths]
+    samples = {stage: [] for stage in STAGES}
+    fields = {}
+
+    async def worker():
+        while queue:
+            path = queue.pop()
+            timings, parsed = await run_one(path, engine, cache)
+            for stage, ms in timings.items():
+                samples[stage].append(ms)
+            fields[path.name] = parsed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"samples": samples, "fields": fields, "throughput": len(paths) * repeat / elapsed}
+
+
+def accuracy(fields: dict, labels: dict) -> dict:
+    result = {}
+    for field in FIELDS:
+        labeled = [(name, want[field]) for name, want in labels.items() if want.get(field) and name in fields]
+        if labeled:
+            hits = sum(_same(field, fields[name][field], want) for name, want in labeled)
+            result[field] = {"correct": hits, "total": len(labeled), "rate": hits / len(labeled)}
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="directory of labeled receipt screenshots")
+    parser.add_argument("--labels", help="labels JSON (default: <corpus>/labels.json)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus per concurrency level")
+    parser.add_argument("--text-cache", help="directory caching OCR text by image hash")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--baseline", help="earlier --json report; exit 1 if any field accuracy drops")
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+
+    corpus = Path(args.corpus)
+    paths = sorted(p for p in corpus.iterdir() if p.suffix.lower() in EXTENSIONS)
+    if not paths:
+        parser.error(f"no images in {corpus}")
+    labels_path = Path(args.labels) if args.labels else corpus / "labels.json"
+    labels = json.loads(labels_path.read_text()) if labels_path.exists() else {}
+
+    backend = TesseractBackend(ProcessPoolExecutor(max_workers=settings.OCR_PROCESS_WORKERS),
+                               lang=settings.OCR_TESSERACT_LANG, timeout=settings.OCR_TESSERACT_TIMEOUT)
+    if not backend.available:
+        parser.error("local Tesseract is required (apt install tesseract-ocr, pip install pytesseract)")
+    engine = OcrEngine([backend], mode="local")
+    cache = TextCache(Path(args.text_cache) if args.text_cache else None)
+
+    report = {"images": len(paths), "levels": {}, "accuracy": {}}
+    print(f"{len(paths)} images · {len(labels)} labeled · "
+          f"{settings.OCR_PREPROCESS_WORKERS} preprocess / {settings.OCR_PROCESS_WORKERS} OCR processes")
+    print(f"{'conc':>4} {'stage':<11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'img/s':>7}")
+    fields = {}
+    for concurrency in args.concurrency:
+        level = await run_level(paths, engine, cache, concurrency, args.repeat)
+        fields = level["fields"]
+        report["levels"][concurrency] = {"throughput": level["throughput"], "stages": {}}
+        for stage in STAGES:
+            samples = level["samples"][stage]
+            if not samples:
+                print(f"{concurrency:>4} {stage:<11} {'cached':>9}")
+                continue
+            r = {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                 "p99": percentile(samples, 99), "mean": statistics.mean(samples)}
+            report["levels"][concurrency]["stages"][stage] = r
+            rate = f"{level['throughput']:>7.2f}" if stage == "total" else ""
+            print(f"{concurrency:>4} {stage:<11} {r['p50']:>9.2f} {r['p95']:>9.2f} {r['p99']:>9.2f} {r['mean']:>9.2f} {rate}")
+
+    report["accuracy"] = accuracy(fields, labels)
+    report["fields"] = fields
+    if report["accuracy"]:
+        print(f"\n{'field':<10} {'correct':>8} {'total':>6} {'rate':>7}")
+        for field, a in report["accuracy"].items():
+            print(f"{field:<10} {a['correct']:>8} {a['total']:>6} {a['rate']:>7.1%}")
+    if args.show_misses:
+        for name, want in sorted(labels.items()):
+            got = fields.get(name)
+            misses = [f for f in FIELDS if got and want.get(f) and not _same(f, got[f], want[f])]
+            if misses:
+                print(f"✗ {name}: " + ", ".join(f"{f} {got[f]!r} != {want[f]!r}" for f in misses))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = []
+        print("\nvs baseline")
+        for field, a in report["accuracy"].items():
+            before = baseline.get("accuracy", {}).get(field)
+            if before is None:
+                continue
+            print(f"{field:<10} {before['rate']:>7.1%} -> {a['rate']:>7.1%}")
+            if a["rate"] < before["rate"]:
+                regressions.append(field)
+        if regressions:
+            print(f"❌ accuracy regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
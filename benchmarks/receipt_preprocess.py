@@ -0,0 +1,184 @@
+# benchmarks/receipt_preprocess.py
+"""
+Receipt preprocessing: legacy RGB/LANCZOS path vs the grayscale draft-decode path.
+
+    python -m benchmarks.receipt_preprocess --corpus ./receipts
+    python -m benchmarks.receipt_preprocess --corpus ./receipts --ocr --labels ./receipts/labels.json
+
+For every image in --corpus (jpg/jpeg/png) each variant is run in a fresh process and reports
+per-image latency p50/p95/p99, peak RSS growth of that process and output size:
+
+  legacy       the previous handlers/verify._preprocess_for_ocr (full RGB decode, LANCZOS, q90)
+  draft        utils/receipt_image.preprocess_for_ocr on the original file
+  draft@<w>    the same, fed the image re-encoded at --target-width (what pick_photo_size
+               downloads instead of the largest Telegram size; re-encoding is not timed)
+
+With --ocr the outputs also go through local Tesseract and the receipt parser. Accuracy is
+measured against --labels ({"file.jpg": {"ref": "FT...", "amount": "1500.00"}}) when given,
+otherwise as agreement with the legacy path.
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageEnhance  # noqa: E402
+
+from utils.receipt_image import preprocess_for_ocr  # noqa: E402
+
+EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def legacy_preprocess(image_bytes: bytes) -> bytes:
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    w, h = img.size
+    if w > 1400:
+        ratio = 1400 / w
+        img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.LANCZOS)
+    elif w < 600:
+        ratio = 600 / w
+        img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.BICUBIC)
+    img = ImageEnhance.Contrast(img).enhance(1.4)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def downsized(image_bytes: bytes, width: int) -> bytes:
+    """Approximates the Telegram PhotoSize at `width` (Telegram re-encodes JPEG at ~q87)."""
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    if img.width > width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=87)
+    return out.getvalue()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def run_variant(variant: str, paths: list, target_width: int, repeat: int, ocr: bool, lang: str) -> dict:
+    """Runs in its own process so ru_maxrss reflects this variant only."""
+    inputs = [Path(p).read_bytes() for p in paths]
+    if variant.startswith("draft@"):
+        inputs = [downsized(data, target_width) for data in inputs]
+    fn = legacy_preprocess if variant == "legacy" else preprocess_for_ocr
+
+    fn(inputs[0])  # warm up decoders
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies, sizes, outputs = [], [], []
+    for data in inputs:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = fn(data)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        sizes.append(len(out))
+        outputs.append(out)
+    rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+
+    texts = []
+    if ocr:
+        import pytesseract
+        for out in outputs:
+            texts.append(pytesseract.image_to_string(Image.open(io.BytesIO(out)), lang=lang, config="--oem 1 --psm 6"))
+    return {
+        "latencies": latencies,
+        "input_kb": statistics.mean(len(d) for d in inputs) / 1024,
+        "output_kb": statistics.mean(sizes) / 1024,
+        "rss_growth_mb": rss_growth_mb,
+        "texts": texts,
+    }
+
+
+def score(parsed: list, expected: list) -> tuple:
+    """(ref accuracy, amount accuracy) of `parsed` against `expected` (dicts or None)."""
+    refs = amounts = total_refs = total_amounts = 0
+    for got, want in zip(parsed, expected):
+        if not want:
+            continue
+        if want.get("ref"):
+            total_refs += 1
+            refs += str(got.get("ref") or "").upper() == str(want["ref"]).upper()
+        if want.get("amount"):
+            total_amounts += 1
+            amounts += _same_amount(got.get("amount_fallback"), want["amount"])
+    return (refs / total_refs if total_refs else None, amounts / total_amounts if total_amounts else None)
+
+
+def _same_amount(a, b) -> bool:
+    try:
+        return float(str(a).replace(",", "")) == float(str(b).replace(",", ""))
+    except (TypeError, ValueError):
+        return False
+
+
+def _pct(value) -> str:
+    return f"{value:>8.0%}" if value is not None else f"{'n/a':>8}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="directory of receipt screenshots")
+    parser.add_argument("--labels", help="JSON {filename: {ref, amount}} for accuracy")
+    parser.add_argument("--target-width", type=int, default=1280)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ocr", action="store_true", help="also run local Tesseract + parser (accuracy)")
+    parser.add_argument("--lang", default="eng")
+    args = parser.parse_args()
+
+    paths = sorted(str(p) for p in Path(args.corpus).iterdir() if p.suffix.lower() in EXTENSIONS)
+    if not paths:
+        parser.error(f"no images in {args.corpus}")
+    labels = json.loads(Path(args.labels).read_text()) if args.labels else None
+
+    variants = ["legacy", "draft", f"draft@{args.target_width}"]
+    loop = asyncio.get_running_loop()
+    results = {}
+    for variant in variants:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[variant] = await loop.run_in_executor(
+                pool, run_variant, variant, paths, args.target_width, args.repeat, args.ocr, args.lang
+            )
+
+    print(f"{len(paths)} images x {args.repeat} runs")
+    print(f"{'variant':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8} "
+          f"{'in KB':>8} {'out KB':>8} {'RSS +MB':>8}")
+    for variant, r in results.items():
+        lat = r["latencies"]
+        print(f"{variant:<12} {percentile(lat, 50):>8.1f} {percentile(lat, 95):>8.1f} {percentile(lat, 99):>8.1f} "
+              f"{statistics.mean(lat):>8.1f} {r['input_kb']:>8.0f} {r['output_kb']:>8.0f} {r['rss_growth_mb']:>8.1f}")
+
+    if not args.ocr:
+        return
+    from handlers.verify import _parse_ocr_text
+
+    names = [Path(p).name for p in paths]
+    parsed = {v: [_parse_ocr_text(t) for t in r["texts"]] for v, r in results.items()}
+    if labels:
+        expected = [labels.get(n) for n in names]
+        basis = "labels"
+    else:
+        expected = [{"ref": p["ref"], "amount": p["amount_fallback"]} for p in parsed["legacy"]]
+        basis = "legacy output"
+
+    print(f"\naccuracy vs {basis}")
+    print(f"{'variant':<12} {'ref':>8} {'amount':>8}")
+    for variant in variants:
+        ref_acc, amount_acc = score(parsed[variant], expected)
+        print(f"{variant:<12} {_pct(ref_acc)} {_pct(amount_acc)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+# benchmarks/throttle_store.py
+"""
+Micro-benchmark: the old per-instance throttle dict vs the shared ThrottleStore.
+
+    python -m benchmarks.throttle_store
+    python -m benchmarks.throttle_store --users 10000 100000 --events 200000 --rate 2000
+
+Replays --events updates (messages and callbacks mixed, --callback-share) from --users
+distinct active users on a simulated clock advancing at --rate updates/s, so the table
+holds about min(users, rate * ttl) live entries. Prints per-update p50/p95/p99/max in
+microseconds and the final table size for:
+
+  legacy   f-string keys, dict rebuilt by _prune_old_users on every update once it
+           passes 1000 entries (the middleware before utils/throttle_store.py);
+           capped at --legacy-events because each update is O(table)
+  wheel    utils/throttle_store.ThrottleStore, integer tuple keys + expiry wheel
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.throttle_store import EVENT_CALLBACK, EVENT_MESSAGE, ThrottleStore  # noqa: E402
+
+MESSAGE_INTERVAL = 0.8
+CALLBACK_INTERVAL = 0.4
+
+
+class LegacyThrottle:
+    """The dict + prune logic ThrottlingMiddleware used before the shared store."""
+
+    def __init__(self):
+        self.users = {}
+
+    def hit(self, is_callback: bool, user_id: int, now: float) -> bool:
+        event_key = f"{'cb' if is_callback else 'msg'}_{user_id}"
+        limit = CALLBACK_INTERVAL if is_callback else MESSAGE_INTERVAL
+        if (now - self.users.get(event_key, 0.0)) < limit:
+            return False
+        self.users[event_key] = now
+        if len(self.users) > 1000:
+            self.users = {k: v for k, v in self.users.items() if (now - v) < 10.0}
+        return True
+
+    def __len__(self):
+        return len(self.users)
+
+
+class WheelThrottle:
+    def __init__(self):
+        self.store = ThrottleStore(ttl=max(MESSAGE_INTERVAL, CALLBACK_INTERVAL))
+
+    def hit(self, is_callback: bool, user_id: int, now: float) -> bool:
+        key = (EVENT_CALLBACK if is_callback else EVENT_MESSAGE, user_id)
+        return self.store.hit(key, now, CALLBACK_INTERVAL if is_callback else MESSAGE_INTERVAL)
+
+    def __len__(self):
+        return len(self.store)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def workload(users: int, events: int, callback_share: float, seed: int):
+    rng = random.Random(seed)
+    return [(rng.random() < callback_share, rng.randrange(users)) for _ in range(events)]
+
+
+def replay(throttle, events: list, rate: float, warmup: int):
+    latencies, dropped = [], 0
+    step = 1.0 / rate
+    for i, (is_callback, user_id) in enumerate(events):
+        now = i * step
+        t0 = time.perf_counter()
+        allowed = throttle.hit(is_callback, user_id, now)
+        elapsed = time.perf_counter() - t0
+        if i >= warmup:
+            latencies.append(elapsed * 1e6)
+            dropped += not allowed
+    return latencies, dropped
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--legacy-events", type=int, default=5_000)
+    parser.add_argument("--rate", type=float, default=2000.0, help="simulated updates per second")
+    parser.add_argument("--callback-share", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'impl':<7} {'events':>8} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} "
+          f"{'max us':>9} {'mean us':>8} {'entries':>8} {'dropped':>8}")
+    for users in args.users:
+        events = workload(users, args.events, args.callback_share, args.seed)
+        for name, throttle, n in (("legacy", LegacyThrottle(), args.legacy_events),
+                                  ("wheel", WheelThrottle(), args.events)):
+            warmup = min(n // 10, 1000)
+            lat, dropped = replay(throttle, events[:n], args.rate, warmup)
+            print(f"{users:>8} {name:<7} {n:>8} {percentile(lat, 50):>8.2f} {percentile(lat, 95):>8.2f} "
+                  f"{percentile(lat, 99):>8.2f} {max(lat):>9.1f} {statistics.mean(lat):>8.2f} "
+                  f"{len(throttle):>8} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,7 +11,7 @@ from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeCha
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from config import settings
-from app_context import bot, dp, db
+from app_context import bot, dp, db, product_matcher, audit_queue
 from middlewares.language import LanguageMiddleware
 from middlewares.throttling_middleware import ThrottlingMiddleware
 from middlewares.error_handling_middleware import router as error_router
@@ -19,7 +19,7 @@ from middlewares.error_handling_middleware import router as error_router
 # Import your admin API route setup (aiohttp style)
 from api.api import setup_admin_routes
 from scheduler.scheduler import check_and_send_reminders, test_reminder_for_user
-from scheduler.broadcast import router as broadcast_router
+from scheduler.broadcast import router as broadcast_router, resume_broadcasts
 from scheduler.one_message_broadcast import router as one_message_broadcast_router
 from testimonial.testimonial_questions import router as testimonial_router, testimonial_scheduler
 from Survey.price_results import router as price_survey_router
@@ -33,8 +33,10 @@ logging.basicConfig(
 )
 
 # --- Dispatcher middlewares and routers ---
-dp.message.middleware(ThrottlingMiddleware(message_interval=0.8))
-dp.callback_query.middleware(ThrottlingMiddleware(message_interval=0.5))
+# One instance (one throttle table) for both event types
+throttling = ThrottlingMiddleware(message_interval=0.8, callback_interval=0.4)
+dp.message.middleware(throttling)
+dp.callback_query.middleware(throttling)
 
 # Language middleware expects a db instance; app_context.db is used at runtime
 dp.message.middleware(LanguageMiddleware(db))
@@ -98,6 +100,8 @@ async def on_startup(bot: Bot):
     logging.info("🚀 Initializing Coach Hilawe Engine...")
     await db.connect()
     await db.setup()  # run schema if needed
+    await product_matcher.start()  # product index + LISTEN for catalog changes
+    await audit_queue.start()      # receipt audit workers (picks up jobs left by a redeploy)
     await set_commands(bot, settings.ADMIN_IDS)
 
 
@@ -126,9 +130,24 @@ async def scheduler_loop(bot: Bot, db):
         logging.info("💤 Scheduler sleeping for 3 hours.")
         await asyncio.sleep(10800)
 
+async def kpi_reconcile_loop(db):
+    """
+    kpi_counters is kept current by triggers; this periodically rebuilds it from the
+    base tables so concurrent-approval races or manual SQL edits can't drift forever.
+    """
+    while True:
+        await asyncio.sleep(settings.KPI_RECONCILE_SECONDS)
+        try:
+            await db.rebuild_kpi_counters()
+            logging.info("📊 KPI counters reconciled.")
+        except Exception as e:
+            logging.error(f"KPI reconcile failed: {e}")
+
 async def on_shutdown(bot: Bot):
     logging.info("🛑 Shutting down engine...")
     try:
+        await audit_queue.stop()
+        await product_matcher.stop()
         await db.disconnect()
     except Exception:
         logging.exception("Error disconnecting DB")
@@ -200,6 +219,8 @@ async def create_app() -> web.Application:
         await on_startup(bot)               # DB connect + setup
         asyncio.create_task(scheduler_loop(bot, db))
         asyncio.create_task(daily_mission_loop(bot, db))
+        asyncio.create_task(resume_broadcasts(bot, db))  # finish any broadcast cut off by a redeploy
+        asyncio.create_task(kpi_reconcile_loop(db))
         # asyncio.create_task(reminder_worker(bot, db))
         # asyncio.create_task(testimonial_scheduler(bot, db, dp.storage))
        
@@ -213,7 +234,11 @@ async def create_app() -> web.Application:
 async def start_polling():
     await db.connect()
     await db.setup()
+    await product_matcher.start()
+    await audit_queue.start()
     await set_commands(bot, settings.ADMIN_IDS)
+    asyncio.create_task(resume_broadcasts(bot, db))  # finish any broadcast cut off by a restart
+    asyncio.create_task(kpi_reconcile_loop(db))
 
     # If you have scheduled jobs, start them here (scheduler.start())
     # asyncio.create_task(scheduler_loop(bot, db))
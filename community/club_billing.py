@@ -9,17 +9,23 @@ from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
 from database.db import Database
+from database.batch_sink import BatchSink
 from config import settings
+from utils.audit_queue import RetryAudit, audit_handler
+from utils.receipt_image import pick_photo_size
 
 # Safe imports matching your internal architecture hooks
 try:
-    from handlers.verify import extract_local_data, verify_external, is_hilawe_receiver
+    from handlers.verify import audit_receipt, format_reuse_alert, is_hilawe_receiver
 except ImportError:
     # Safe fallback wrappers if run in isolated development environments
-    async def extract_local_data(*args): return {"ref": None, "provider": "CBE", "amount_fallback": None, "raw_text": ""}
-    async def verify_external(*args): return {"success": False}
+    async def audit_receipt(*args, **kwargs):
+        return {"local": {"ref": None, "provider": "CBE", "amount_fallback": None, "raw_text": ""},
+                "bank_data": {"success": False}, "cached": None, "reused_from": None,
+                "reference_reused": False}
+    def format_reuse_alert(*args): return ""
     def is_hilawe_receiver(*args): return False
 
 logger = logging.getLogger(__name__)
@@ -163,25 +169,35 @@ async def process_club_receipt(message: types.Message, state: FSMContext, db: Da
     await message.answer(done_text, reply_markup=main_menu(lang), parse_mode="HTML")
     await state.clear()
 
-    # Trigger background validation and admin notification rules safely
-    asyncio.create_task(notify_admin_club_payment(bot, message, uid, full_name, lang, amount, pay_id, proof_id, db))
+    # Queue validation and admin notification (drained by utils/audit_queue workers);
+    # the audit downloads the smallest photo size that still meets the OCR width target
+    ocr_photo = pick_photo_size(message.photo, settings.OCR_TARGET_WIDTH)
+    await db.audit_queue.enqueue(
+        "club", pay_id, uid, ocr_photo.file_id, ocr_photo.file_unique_id,
+        context={"full_name": full_name, "username": message.from_user.username, "language": lang, "amount": float(amount)},
+    )
 
 # --- 4. ASYNC AUDIT & SECURE CORE INTERFACE ---
 
 # --- 4. ASYNC AUDIT & SECURE CORE INTERFACE ---
 
-async def notify_admin_club_payment(bot: Bot, msg: types.Message, uid: int, name: str, lang: str, amt: float, pay_id: int, proof_id: str, db: Database):
-    try:
-        username = f"@{msg.from_user.username}" if msg.from_user.username else "No Username"
-        
+@audit_handler("club")
+async def notify_admin_club_payment(bot: Bot, db: Database, job: dict, queue):
+    ctx = job["context"]
+    uid, pay_id = job["user_id"], job["payment_id"]
+
+    # Applicant alert goes out once; a retried job replies to the stored message
+    if job["admin_message_id"] is None:
+        username = f"@{ctx['username']}" if ctx.get("username") else "No Username"
+
         caption = (
             f"👑 <b>TRANSFORMATION CLUB: NEW MEMBERSHIP APPLICANT</b>\n"
             f"──────────────────────────────\n"
-            f"👤 <b>User:</b> {html.escape(name)} | {html.escape(username)}\n"
+            f"👤 <b>User:</b> {html.escape(ctx.get('full_name') or 'Athlete')} | {html.escape(username)}\n"
             f"🆔 <b>User ID:</b> <code>{uid}</code>\n"
-            f"🌍 <b>Language:</b> <code>{lang}</code>\n"
+            f"🌍 <b>Language:</b> <code>{ctx.get('language', 'EN')}</code>\n"
             f"──────────────────────────────\n"
-            f"💰 <b>Subscription Tier:</b> <code>{amt} ETB / Month</code>\n"
+            f"💰 <b>Subscription Tier:</b> <code>{ctx['amount']} ETB / Month</code>\n"
             f"🎫 <b>Club Payment ID:</b> #{pay_id}\n"
             f"──────────────────────────────\n"
             f"⚡️ <b>Verify financial integrity and choose action:</b>"
@@ -192,69 +208,87 @@ async def notify_admin_club_payment(bot: Bot, msg: types.Message, uid: int, name
         kb.button(text="❌ REJECT RECEIPT", callback_data=f"club_reject_{pay_id}")
         kb.adjust(1)
 
-        # FIX: Try fetching from settings config first, fallback safely if missing
-
         admin_msg = await bot.send_photo(
             chat_id=-5196014443,
-            photo=proof_id,
+            photo=job["file_id"],
             caption=caption,
             reply_markup=kb.as_markup(),
             parse_mode="HTML"
         )
+        await queue.set_admin_message(job, admin_msg.chat.id, admin_msg.message_id)
 
-        start = time.perf_counter()
-        try:
-            file_info = await bot.get_file(proof_id)
-            img_stream = io.BytesIO()
-            await bot.download_file(file_info.file_path, destination=img_stream)
-            img_stream.seek(0)
-
-            local = await extract_local_data(img_stream)
-            # Defensive check on parsed text structure
-            ref_id = local.get("ref") if local else None
-            provider = local.get("provider", "CBE") if local else "CBE"
-            raw_text = local.get("raw_text", "") if local else ""
-
-            if not ref_id or len(str(ref_id)) < 8:
-                await admin_msg.reply(
-                    f"🤖 <b>CLUB AI SCAN: MANUAL ESCALATION REQUIRED 🧐</b>\n"
-                    f"──────────────────────────────\n"
-                    f"⚠️ Failed to parse valid unique transaction keys from image layout.\n"
-                    f"🛡️ <i>Locking safety mechanisms to protect the pipeline against manipulation.</i>",
-                    parse_mode="HTML"
-                )
-                return
-
-            bank_data = await verify_external(ref_id, provider)
-            is_real = bank_data.get("success", False)
-            is_hilawe = is_hilawe_receiver(raw_text, bank_data)
-            elapsed = time.perf_counter() - start
-
-            if is_real and is_hilawe:
-                eval_txt = (
-                    f"🤖 <b>CLUB AI SCAN: VERIFIED AUTHENTIC ✅</b>\n"
-                    f"──────────────────────────────\n"
-                    f"🟢 Transaction matches live bank ledger parameters completely.\n"
-                    f"📊 <b>{provider}</b> • 🆔 <code>{ref_id}</code> • ⏱️ <code>{elapsed:.2f}s</code>"
-                )
-            else:
-                eval_txt = (
-                    f"🤖 <b>CLUB AI SCAN: SUSPICIOUS / FRAUD DETECTED 🚨</b>\n"
-                    f"──────────────────────────────\n"
-                    f"🔴 Alert triggered. Reference hash not located or receiver payload mismatch.\n"
-                    f"📊 <b>{provider}</b> • 🆔 <code>{ref_id or 'N/A'}</code>"
-                )
+    async def reply(text: str, **kwargs):
+        return await bot.send_message(
+            job["admin_chat_id"], text, reply_to_message_id=job["admin_message_id"], parse_mode="HTML", **kwargs
+        )
 
-            CLUB_REPORT_CACHE[pay_id] = format_club_audit(local, bank_data, elapsed, is_real, is_hilawe)
-            
-            kb_info = InlineKeyboardBuilder()
-            kb_info.button(text="ℹ️ Audit Details", callback_data=f"club_info_{pay_id}")
-            await admin_msg.reply(eval_txt, reply_markup=kb_info.as_markup(), parse_mode="HTML")
+    start = time.perf_counter()
+    audit = await audit_receipt(
+        bot, db, job["file_id"], job["file_unique_id"], owner=("club", pay_id, uid), limits=queue.limits
+    )
+    local = audit["local"]
+    if audit["reused_from"]:
+        await reply(format_reuse_alert(audit))
+
+    # Defensive check on parsed text structure
+    ref_id = local.get("ref") if local else None
+    provider = local.get("provider", "CBE") if local else "CBE"
+    raw_text = local.get("raw_text", "") if local else ""
+
+    if not ref_id or len(str(ref_id)) < 8:
+        await reply(
+            f"🤖 <b>CLUB AI SCAN: MANUAL ESCALATION REQUIRED 🧐</b>\n"
+            f"──────────────────────────────\n"
+            f"⚠️ Failed to parse valid unique transaction keys from image layout.\n"
+            f"🛡️ <i>Locking safety mechanisms to protect the pipeline against manipulation.</i>"
+        )
+        return audit.get("timings")
 
-        except Exception as ocr_err:
-            logger.error(f"Club parsing process exception details: {ocr_err}")
-    except Exception as e:
-        logger.error(f"Global structural admin alert failure: {e}")
+    bank_data = audit["bank_data"]
+    is_real = bank_data.get("success", False)
+    is_hilawe = is_hilawe_receiver(raw_text, bank_data)
+    elapsed = time.perf_counter() - start
+
+    if audit.get("reference_reused"):
+        kind, prev_id, _ = audit["reused_from"]
+        eval_txt = (
+            f"🤖 <b>CLUB AI SCAN: REFERENCE ALREADY USED ♻️</b>\n"
+            f"──────────────────────────────\n"
+            f"🟠 This reference already backs {'Club Payment' if kind == 'club' else 'Payment'} #{prev_id}. "
+            f"Bank lookup skipped — one transfer, one activation.\n"
+            f"📊 <b>{provider}</b> • 🆔 <code>{ref_id}</code>"
+        )
+    elif bank_data.get("retryable"):
+        # Bank side timed out / circuit open: reschedule through the audit queue, no verdict
+        if job["attempts"] == 1:
+            await reply(
+                f"🤖 <b>CLUB AI SCAN: BANK UNREACHABLE, RETRYING ⏳</b>\n"
+                f"──────────────────────────────\n"
+                f"🟡 Live bank ledger did not answer. Not a fraud verdict — the lookup is rescheduled.\n"
+                f"📊 <b>{provider}</b> • 🆔 <code>{ref_id}</code> • ⏱️ <code>{elapsed:.2f}s</code>"
+            )
+        raise RetryAudit(bank_data.get("error") or "bank lookup not answered")
+    elif is_real and is_hilawe:
+        eval_txt = (
+            f"🤖 <b>CLUB AI SCAN: VERIFIED AUTHENTIC ✅</b>\n"
+            f"──────────────────────────────\n"
+            f"🟢 Transaction matches live bank ledger parameters completely.\n"
+            f"📊 <b>{provider}</b> • 🆔 <code>{ref_id}</code> • ⏱️ <code>{elapsed:.2f}s</code>"
+        )
+    else:
+        eval_txt = (
+            f"🤖 <b>CLUB AI SCAN: SUSPICIOUS / FRAUD DETECTED 🚨</b>\n"
+            f"──────────────────────────────\n"
+            f"🔴 Alert triggered. Reference hash not located or receiver payload mismatch.\n"
+            f"📊 <b>{provider}</b> • 🆔 <code>{ref_id or 'N/A'}</code>"
+        )
+
+    CLUB_REPORT_CACHE[pay_id] = format_club_audit(local, bank_data, elapsed, is_real, is_hilawe)
+
+    kb_info = InlineKeyboardBuilder()
+    kb_info.button(text="ℹ️ Audit Details", callback_data=f"club_info_{pay_id}")
+    await reply(eval_txt, reply_markup=kb_info.as_markup())
+    return audit.get("timings")
 
 #Don't ever forget to reset their membership expiry date later on buddy
 
@@ -576,7 +610,7 @@ async def club_kickoff_preview(callback: types.CallbackQuery, db: Database):
         f"👥 <b>Pending Members:</b> <code>{count} athletes</code>\n"
         f"🔗 <b>Action:</b> Send group invite link\n"
         f"⏱️ <b>Clock starts:</b> At moment of successful delivery\n"
-        f"❌ <b>On failure:</b> Member skipped, remains retryable\n"
+        f"❌ <b>On failure:</b> Clock not started, member stays pending for the next run\n"
         f"──────────────────────────────\n"
         f"⚠️ <b>Confirm to dispatch all {count} invite link now?</b>"
     )
@@ -611,9 +645,13 @@ async def club_kickoff_execute(callback: types.CallbackQuery, db: Database, bot:
         parse_mode="HTML"
     )
 
-    success, failed, skipped = 0, 0, 0
+    counts = {"success": 0, "failed": 0, "skipped": 0}
+    # The 30-day clock is started in batches once delivery is confirmed
+    clock_sink = BatchSink(db.start_club_subscriptions, name="club_kickoff")
+    # Invite links and DMs are paced (and flood waits retried) by the shared limiter
+    semaphore = asyncio.Semaphore(settings.BROADCAST_WORKERS)
 
-    for record in targets:
+    async def deliver(record):
         uid = record['user_id']
         lang = record['language'] or 'EN'
         name = record['full_name'] or 'Member'
@@ -625,10 +663,15 @@ async def club_kickoff_execute(callback: types.CallbackQuery, db: Database, bot:
                 member_limit=1
             )
             group_url = grp_link.invite_link
+        except (TelegramRetryAfter, TelegramNetworkError, TelegramServerError) as link_err:
+            # Flood wait outlasted the limiter's retries, or Telegram hiccuped: try again next run
+            logger.warning(f"Invite link for {uid} hit a transient error: {link_err}")
+            counts["failed"] += 1
+            return
         except Exception as link_err:
             logger.error(f"Failed to generate invite links for {uid}: {link_err}")
-            skipped += 1
-            continue
+            counts["skipped"] += 1
+            return
 
         if lang == "AM":
             msg = (
@@ -659,26 +702,32 @@ async def club_kickoff_execute(callback: types.CallbackQuery, db: Database, bot:
                 reply_markup=builder.as_markup(),
                 parse_mode="HTML"
             )
-            await db._pool.execute("""
-                UPDATE club_subscriptions
-                SET expires_at = NOW() + INTERVAL '30 days', updated_at = NOW()
-                WHERE user_id = $1
-            """, uid)
-            success += 1
+            await clock_sink.add(uid)
+            counts["success"] += 1
         except Exception as send_err:
             logger.warning(f"Delivery failed for {uid}, skipping expiry update: {send_err}")
-            failed += 1
+            counts["failed"] += 1
+
+    async def deliver_bounded(record):
+        async with semaphore:
+            try:
+                await deliver(record)
+            except Exception as e:
+                logger.exception(f"Kickoff worker error for {record['user_id']}: {e}")
+                counts["failed"] += 1
 
-        await asyncio.sleep(0.05)
+    await asyncio.gather(*(deliver_bounded(t) for t in targets))
+    await clock_sink.close()
 
     summary = (
         f"🏁 <b>KICKOFF DISPATCH COMPLETE</b>\n"
         f"──────────────────────────────\n"
-        f"✅ <b>Links Sent + Clock Started:</b> <code>{success}</code>\n"
-        f"⚠️ <b>Link Generation Failed:</b> <code>{skipped}</code>\n"
-        f"❌ <b>Delivery Failed (retryable):</b> <code>{failed}</code>\n"
+        f"✅ <b>Links Sent + Clock Started:</b> <code>{counts['success']}</code>\n"
+        f"❌ <b>Failed (retryable):</b> <code>{counts['failed']}</code>\n"
+        f"⚠️ <b>Link Generation Rejected:</b> <code>{counts['skipped']}</code>\n"
         f"──────────────────────────────\n"
-        f"<i>Members with failed delivery still have expires_at = NULL and will appear next time you run kickoff.</i>"
+        f"<i>Nobody above has a started clock: they still have expires_at = NULL and will appear next time you run kickoff. "
+        f"Rejected links usually mean the bot lost invite rights in the club group.</i>"
     )
 
     await callback.message.edit_text(summary, parse_mode="HTML")
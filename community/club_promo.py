@@ -5,7 +5,9 @@ from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import math
 from database.db import Database
+from database import segments
 from config import settings
+from utils.send_queue import stream_to_workers
 
 logger = logging.getLogger(__name__)
 router = Router(name="admin_club_promo")
@@ -141,16 +143,8 @@ async def preview_live_broadcast(callback: types.CallbackQuery, db: Database):
         return await callback.answer("⚠️ Access Denied.", show_alert=True)
 
     # Completely opened to all users, filtering out active club subscribers
-    count_query = """
-        SELECT COUNT(1) 
-        FROM users u
-        WHERE NOT EXISTS (
-            SELECT 1 FROM club_subscriptions sub 
-            WHERE sub.user_id = u.telegram_id AND sub.is_active = TRUE
-        )
-    """
     try:
-        total_targets = await db._pool.fetchval(count_query)
+        total_targets = (await segments.counts(db, "non_club"))["non_club"]
     except Exception as sql_err:
         logger.error(f"Failed to count broad audience targets: {sql_err}")
         return await callback.message.answer(f"❌ <b>Database Error:</b>\n<code>{sql_err}</code>", parse_mode="HTML")
@@ -161,7 +155,8 @@ async def preview_live_broadcast(callback: types.CallbackQuery, db: Database):
             parse_mode="HTML"
         )
 
-    estimated_seconds = math.ceil(total_targets / 25)
+    # Each target costs 5 sends (4-photo album + card) against the global msg/s budget
+    estimated_seconds = math.ceil(total_targets * 5 / settings.TG_GLOBAL_RATE)
     est_minutes = estimated_seconds // 60
     est_secs_remainder = estimated_seconds % 60
     time_str = f"{est_minutes}m {est_secs_remainder}s" if est_minutes > 0 else f"{estimated_seconds}s"
@@ -197,29 +192,11 @@ async def execute_live_broadcast(callback: types.CallbackQuery, db: Database, bo
     await callback.message.edit_text("🛰️ <i>Stream target identities and state variations from database...</i>", parse_mode="HTML")
 
     # Pulls all users while retaining the active club subscription exclusion safety rail
-    query = """
-        SELECT u.telegram_id, COALESCE(u.language, 'EN') as language, u.has_paid
-        FROM users u
-        WHERE NOT EXISTS (
-            SELECT 1 FROM club_subscriptions sub 
-            WHERE sub.user_id = u.telegram_id AND sub.is_active = TRUE
-        )
-    """
-    try:
-        targets = await db._pool.fetch(query)
-    except Exception as sql_err:
-        logger.error(f"Failed to query global targets: {sql_err}")
-        return await callback.message.answer(f"❌ <b>Database Error:</b>\n<code>{sql_err}</code>", parse_mode="HTML")
-
-    total_count = len(targets)
-    if not targets:
-        return await callback.message.edit_text("🤷‍♂️ 0 targets found after applying exclusion logic. Broadcast dropped.", parse_mode="HTML")
-
-    await callback.message.edit_text(f"🚀 <b>Dispatching live to {total_count} personalized pipelines...</b>\nMonitoring performance counters.", parse_mode="HTML")
+    query, args = segments.select("non_club", "u.telegram_id, COALESCE(u.language, 'EN') as language, u.has_paid")
+    await callback.message.edit_text("🚀 <b>Dispatching live to personalized pipelines...</b>\nMonitoring performance counters.", parse_mode="HTML")
 
     success_tracks = 0
     failure_tracks = 0
-    BATCH_SIZE = 15 
     
     async def send_safe_message(target_id, text, markup):
         nonlocal success_tracks, failure_tracks
@@ -246,25 +223,28 @@ async def execute_live_broadcast(callback: types.CallbackQuery, db: Database, bo
             logger.warning(f"Delivery block on user {target_id}: {api_err}")
             failure_tracks += 1
 
-    # Chunk loop protecting Neon CPU cycles and complying with Telegram rate ceilings
-    for i in range(0, total_count, BATCH_SIZE):
-        batch = targets[i:i + BATCH_SIZE]
-        
-        # Stagger task creation with a 0.05-second window to prevent 429 Flood burst crashes
-        for record in batch:
-            uid = record['telegram_id']
-            lang = record['language'] or 'EN'
-            has_paid_product = record['has_paid'] or False
-            
-            # Generate the specific personalized card iteration
-            msg_text, msg_kb = get_promo_card(lang, has_bought=has_paid_product)
-            
-            # Execute sequentially per batch with a tiny microscopic delay to satisfy rate caps
-            await send_safe_message(uid, msg_text, msg_kb)
-            await asyncio.sleep(0.05)
-        
-        # Safe foundational baseline buffer time between batch waves
-        await asyncio.sleep(1.0)
+    # Every pipeline runs concurrently; the shared Bot session limiter keeps the
+    # album + card pairs under Telegram's global and per-chat ceilings
+    async def dispatch(record):
+        uid = record['telegram_id']
+        lang = record['language'] or 'EN'
+        has_paid_product = record['has_paid'] or False
+
+        # Generate the specific personalized card iteration
+        msg_text, msg_kb = get_promo_card(lang, has_bought=has_paid_product)
+        await send_safe_message(uid, msg_text, msg_kb)
+
+    # Targets stream in keyset pages; the first album leaves with the first chunk
+    try:
+        total_count = await stream_to_workers(
+            db.iter_chunks(query, *args), dispatch, workers=settings.BROADCAST_WORKERS
+        )
+    except Exception as sql_err:
+        logger.error(f"Failed to query global targets: {sql_err}")
+        return await callback.message.answer(f"❌ <b>Database Error:</b>\n<code>{sql_err}</code>", parse_mode="HTML")
+
+    if not total_count:
+        return await callback.message.edit_text("🤷‍♂️ 0 targets found after applying exclusion logic. Broadcast dropped.", parse_mode="HTML")
 
     summary_log = (
         f"🏁 <b>BROADCAST PIPELINE COMPLETE</b>\n"
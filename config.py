@@ -50,6 +50,77 @@ class Settings:
     GCP_API_KEY: str = os.getenv("GCP_API_KEY", "")
     TESTIMONIAL_ADMIN_CHAT_IDS=[1131741322,1597966240]
 
+    # Per-user record cache in front of Database.get_user / get_user_language
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+    # Outbound Telegram rate limits (shared by every send via the Bot session)
+    TG_GLOBAL_RATE: float = float(os.getenv("TG_GLOBAL_RATE", "30"))
+    TG_GLOBAL_BURST: float = float(os.getenv("TG_GLOBAL_BURST", "30"))
+    TG_CHAT_RATE: float = float(os.getenv("TG_CHAT_RATE", "1"))
+    TG_CHAT_BURST: float = float(os.getenv("TG_CHAT_BURST", "3"))
+    TG_GROUP_RATE: float = float(os.getenv("TG_GROUP_RATE", "0.33"))
+    TG_ADMIN_RATE: float = float(os.getenv("TG_ADMIN_RATE", "1"))
+    TG_RETRY_AFTER_ATTEMPTS: int = int(os.getenv("TG_RETRY_AFTER_ATTEMPTS", "3"))
+
+    # Broadcast streaming: rows per keyset page and concurrent send workers
+    DB_CURSOR_CHUNK_SIZE: int = int(os.getenv("DB_CURSOR_CHUNK_SIZE", "500"))
+    BROADCAST_WORKERS: int = int(os.getenv("BROADCAST_WORKERS", "30"))
+
+    # Postgres connection mode: "direct" keeps asyncpg's prepared statement cache,
+    # "pooler" disables it for transaction-pooling proxies (PgBouncer / Neon pooler)
+    DB_CONNECTION_MODE: str = os.getenv("DB_CONNECTION_MODE", "pooler")
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_MAX_INACTIVE_CONN_LIFETIME: float = float(os.getenv("DB_MAX_INACTIVE_CONN_LIFETIME", "300"))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # In-memory product index: LISTEN needs a session connection, so point this at a
+    # direct (non-pooler) DSN when DATABASE_URL goes through a transaction pooler
+    DB_LISTEN_URL: str = os.getenv("DB_LISTEN_URL", os.getenv("DATABASE_URL", ""))
+    PRODUCT_INDEX_REFRESH_SECONDS: float = float(os.getenv("PRODUCT_INDEX_REFRESH_SECONDS", "300"))
+
+    # KPI snapshot: counters are trigger-maintained; a full rebuild reconciles any drift
+    KPI_RECONCILE_SECONDS: int = int(os.getenv("KPI_RECONCILE_SECONDS", "21600"))
+
+    # Receipt OCR engine: auto | race | local (tesseract) | remote (OCR.space)
+    OCR_MODE: str = os.getenv("OCR_MODE", "auto")
+    OCR_PROCESS_WORKERS: int = int(os.getenv("OCR_PROCESS_WORKERS", "2"))
+    OCR_TESSERACT_LANG: str = os.getenv("OCR_TESSERACT_LANG", "eng")
+    OCR_TESSERACT_TIMEOUT: float = float(os.getenv("OCR_TESSERACT_TIMEOUT", "15"))
+    # Preprocessing: smallest Telegram photo size >= target width is downloaded, then
+    # decoded/resized to [min, max] width in its own process pool
+    OCR_TARGET_WIDTH: int = int(os.getenv("OCR_TARGET_WIDTH", "1280"))
+    OCR_MAX_WIDTH: int = int(os.getenv("OCR_MAX_WIDTH", "1400"))
+    OCR_MIN_WIDTH: int = int(os.getenv("OCR_MIN_WIDTH", "600"))
+    OCR_PREPROCESS_WORKERS: int = int(os.getenv("OCR_PREPROCESS_WORKERS", "2"))
+
+    # Receipt audit cache (file_unique_id / perceptual hash -> OCR + verify result)
+    RECEIPT_CACHE_SIZE: int = int(os.getenv("RECEIPT_CACHE_SIZE", "2048"))
+    RECEIPT_CACHE_NEGATIVE_TTL: float = float(os.getenv("RECEIPT_CACHE_NEGATIVE_TTL", "600"))
+    RECEIPT_PHASH_MAX_DISTANCE: int = int(os.getenv("RECEIPT_PHASH_MAX_DISTANCE", "0"))
+
+    # Bank verify API: hedged parallel requests + per-endpoint circuit breaker
+    VERIFY_HEDGE_DELAY: float = float(os.getenv("VERIFY_HEDGE_DELAY", "1.5"))
+    VERIFY_MAX_ATTEMPTS: int = int(os.getenv("VERIFY_MAX_ATTEMPTS", "3"))
+    VERIFY_DEADLINE: float = float(os.getenv("VERIFY_DEADLINE", "20"))
+    VERIFY_BREAKER_FAILURES: int = int(os.getenv("VERIFY_BREAKER_FAILURES", "3"))
+    VERIFY_BREAKER_RESET: float = float(os.getenv("VERIFY_BREAKER_RESET", "30"))
+
+    # Receipt audit queue (receipt_audits table + worker pool)
+    AUDIT_WORKERS: int = int(os.getenv("AUDIT_WORKERS", "4"))
+    AUDIT_DOWNLOAD_CONCURRENCY: int = int(os.getenv("AUDIT_DOWNLOAD_CONCURRENCY", "4"))
+    AUDIT_CPU_CONCURRENCY: int = int(os.getenv("AUDIT_CPU_CONCURRENCY", "2"))
+    AUDIT_REMOTE_CONCURRENCY: int = int(os.getenv("AUDIT_REMOTE_CONCURRENCY", "4"))
+    AUDIT_MAX_ATTEMPTS: int = int(os.getenv("AUDIT_MAX_ATTEMPTS", "4"))
+    AUDIT_RETRY_BASE_SECONDS: float = float(os.getenv("AUDIT_RETRY_BASE_SECONDS", "15"))
+    AUDIT_LEASE_SECONDS: float = float(os.getenv("AUDIT_LEASE_SECONDS", "300"))
+
+    # Auto-approval (opt-in): "CBE,Telebirr" or per provider "CBE:<tolerance ETB>:<max age hours>"
+    AUTO_APPROVE_PROVIDERS: str = os.getenv("AUTO_APPROVE_PROVIDERS", "")
+    AUTO_APPROVE_AMOUNT_TOLERANCE: float = float(os.getenv("AUTO_APPROVE_AMOUNT_TOLERANCE", "0"))
+    AUTO_APPROVE_MAX_AGE_HOURS: float = float(os.getenv("AUTO_APPROVE_MAX_AGE_HOURS", "48"))
+
 
 settings = Settings()
 
@@ -0,0 +1,70 @@
+# database/batch_sink.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchSink:
+    """
+    Async write-back buffer for hot send loops.
+    Rows are collected in memory and handed to `flush_fn` (one set-based statement)
+    every `max_rows` rows or `max_delay` seconds, whichever comes first.
+
+    Usage:
+        async with BatchSink(db.mark_users_reminded) as sink:
+            await sink.add(uid)
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], Awaitable[Any]],
+        max_rows: int = 200,
+        max_delay: float = 0.5,
+        name: str = "sink",
+    ):
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.name = name
+        self._rows: List[Any] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.errors = 0
+
+    async def add(self, row: Any):
+        self._rows.append(row)
+        if len(self._rows) >= self.max_rows:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        # Shielded so close() cancelling the timer never aborts a write in progress
+        await asyncio.shield(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._rows:
+                return
+            rows, self._rows = self._rows, []
+            try:
+                await self.flush_fn(rows)
+                self.flushed += len(rows)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ {self.name}: failed to flush {len(rows)} rows: {e}")
+
+    async def close(self):
+        if self._timer and not self._timer.done() and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -1,9 +1,16 @@
 # db.py
+import json
+import time
 import asyncpg
 import logging
-from typing import Optional, Any, Dict, List
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Any, Dict, List, Iterable, AsyncIterator, Tuple
 from asyncpg import Pool
 
+from database import segments
+
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS users (
     telegram_id BIGINT PRIMARY KEY,
@@ -202,25 +209,399 @@ CREATE INDEX IF NOT EXISTS idx_club_payments_status ON club_payments (status);
 CREATE INDEX IF NOT EXISTS idx_club_subs_expiry ON club_subscriptions (expires_at) WHERE is_active = TRUE;
 -- CREATE INDEX IF NOT EXISTS idx_club_survey_vote ON club_survey(vote, voted_yes);
 
+-- Durable broadcast jobs: one row per recipient so a redeploy can resume where it stopped
+ALTER TABLE broadcasts
+  ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'completed', -- queued, running, completed, cancelled
+  ADD COLUMN IF NOT EXISTS finished_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    broadcast_id INTEGER NOT NULL REFERENCES broadcasts(id) ON DELETE CASCADE,
+    telegram_id BIGINT NOT NULL,
+    language VARCHAR(2),
+    full_name TEXT,
+    gender VARCHAR(10),
+    product_id INTEGER,
+    price INTEGER,
+    status VARCHAR(20) DEFAULT 'pending', -- pending, sending, sent, failed, deleted, blocked
+    attempts INTEGER DEFAULT 0,
+    error TEXT,
+    claimed_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (broadcast_id, telegram_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_open ON broadcast_recipients (broadcast_id, status) WHERE status IN ('pending', 'sending');
+
+-- Product catalog changes are broadcast on 'products_changed' so the in-process
+-- ProductMatcher index (utils/product_matcher.py) reloads without polling
+CREATE OR REPLACE FUNCTION notify_products_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('products_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_products_changed ON products;
+CREATE TRIGGER trg_products_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_products_changed();
+
+-- KPI snapshot: counters kept current by row triggers on users/payments/club_payments,
+-- so admin dashboards read ~40 rows instead of scanning the payment tables.
+-- kpi_rebuild() recomputes everything (first boot + periodic reconcile from bot.py).
+CREATE TABLE IF NOT EXISTS kpi_counters (
+    key TEXT PRIMARY KEY,
+    value NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_payments_user_approved ON payments (user_id) WHERE status = 'approved';
+CREATE INDEX IF NOT EXISTS idx_payments_approved_at ON payments (approved_at) WHERE status = 'approved';
+CREATE INDEX IF NOT EXISTS idx_club_payments_processed_at ON club_payments (processed_at) WHERE status = 'approved';
+
+CREATE OR REPLACE FUNCTION kpi_user_deltas(lang TEXT, gender TEXT, lvl TEXT, freq INTEGER, sign INTEGER)
+RETURNS TABLE (k TEXT, v NUMERIC) AS $$
+    SELECT unnest(ARRAY[
+        'users.total',
+        'users.lang.' || COALESCE(UPPER(lang), 'NONE'),
+        'users.gender.' || COALESCE(UPPER(gender), 'NONE'),
+        'users.level.' || COALESCE(UPPER(lvl), 'NONE'),
+        'users.freq.' || CASE
+            WHEN freq IS NULL THEN 'none'
+            WHEN freq <= 3 THEN '2_3'
+            WHEN freq = 4 THEN '3_4'
+            WHEN freq = 5 THEN '4_5'
+            ELSE 'everyday'
+        END
+    ]), sign::NUMERIC
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION kpi_payment_deltas(prefix TEXT, status TEXT, amount NUMERIC,
+                                              created TIMESTAMPTZ, approved TIMESTAMPTZ, sign INTEGER)
+RETURNS TABLE (k TEXT, v NUMERIC) AS $$
+    SELECT prefix || '.count.' || COALESCE(status, 'none'), sign::NUMERIC
+    UNION ALL
+    SELECT prefix || '.amount.' || COALESCE(status, 'none'), sign * COALESCE(amount, 0)
+    UNION ALL
+    SELECT prefix || '.approval_minutes', (sign * EXTRACT(EPOCH FROM (approved - created)) / 60)::NUMERIC
+    WHERE approved IS NOT NULL AND created IS NOT NULL
+    UNION ALL
+    SELECT prefix || '.approval_count', sign::NUMERIC
+    WHERE approved IS NOT NULL AND created IS NOT NULL
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Keys are applied in sorted order so concurrent writers never deadlock on counter rows
+CREATE OR REPLACE FUNCTION kpi_users_trg() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO kpi_counters (key, value, updated_at)
+    SELECT d.k, SUM(d.v), NOW() FROM (
+        SELECT * FROM kpi_user_deltas(OLD.language, OLD.gender, OLD.level, OLD.frequency, -1) WHERE TG_OP <> 'INSERT'
+        UNION ALL
+        SELECT * FROM kpi_user_deltas(NEW.language, NEW.gender, NEW.level, NEW.frequency, 1) WHERE TG_OP <> 'DELETE'
+    ) d
+    GROUP BY d.k HAVING SUM(d.v) <> 0 ORDER BY d.k
+    ON CONFLICT (key) DO UPDATE SET value = kpi_counters.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION kpi_payments_trg() RETURNS trigger AS $$
+DECLARE
+    buyers NUMERIC := 0;
+BEGIN
+    -- Distinct approved buyers (for conversion rate): only the first/last approved payment moves it
+    IF TG_OP <> 'INSERT' AND OLD.status = 'approved'
+       AND (TG_OP = 'DELETE' OR NEW.status IS DISTINCT FROM 'approved' OR NEW.user_id IS DISTINCT FROM OLD.user_id)
+       AND NOT EXISTS (SELECT 1 FROM payments WHERE user_id = OLD.user_id AND status = 'approved' AND id <> OLD.id) THEN
+        buyers := buyers - 1;
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.status = 'approved'
+       AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'approved' OR NEW.user_id IS DISTINCT FROM OLD.user_id)
+       AND NOT EXISTS (SELECT 1 FROM payments WHERE user_id = NEW.user_id AND status = 'approved' AND id <> NEW.id) THEN
+        buyers := buyers + 1;
+    END IF;
+
+    INSERT INTO kpi_counters (key, value, updated_at)
+    SELECT d.k, SUM(d.v), NOW() FROM (
+        SELECT * FROM kpi_payment_deltas('payments', OLD.status, OLD.amount, OLD.created_at, OLD.approved_at, -1) WHERE TG_OP <> 'INSERT'
+        UNION ALL
+        SELECT * FROM kpi_payment_deltas('payments', NEW.status, NEW.amount, NEW.created_at, NEW.approved_at, 1) WHERE TG_OP <> 'DELETE'
+        UNION ALL
+        SELECT 'payments.buyers', buyers
+    ) d
+    GROUP BY d.k HAVING SUM(d.v) <> 0 ORDER BY d.k
+    ON CONFLICT (key) DO UPDATE SET value = kpi_counters.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION kpi_club_payments_trg() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO kpi_counters (key, value, updated_at)
+    SELECT d.k, SUM(d.v), NOW() FROM (
+        SELECT * FROM kpi_payment_deltas('club', OLD.status, OLD.amount, NULL, NULL, -1) WHERE TG_OP <> 'INSERT'
+        UNION ALL
+        SELECT * FROM kpi_payment_deltas('club', NEW.status, NEW.amount, NULL, NULL, 1) WHERE TG_OP <> 'DELETE'
+    ) d
+    GROUP BY d.k HAVING SUM(d.v) <> 0 ORDER BY d.k
+    ON CONFLICT (key) DO UPDATE SET value = kpi_counters.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION kpi_rebuild() RETURNS void AS $$
+BEGIN
+    -- Blocks trigger writers until the fresh snapshot is committed, so no delta is lost or doubled
+    LOCK TABLE kpi_counters IN EXCLUSIVE MODE;
+    DELETE FROM kpi_counters;
+    INSERT INTO kpi_counters (key, value, updated_at)
+    SELECT d.k, SUM(d.v), NOW() FROM (
+        SELECT t.* FROM users u, LATERAL kpi_user_deltas(u.language, u.gender, u.level, u.frequency, 1) t
+        UNION ALL
+        SELECT t.* FROM payments p, LATERAL kpi_payment_deltas('payments', p.status, p.amount, p.created_at, p.approved_at, 1) t
+        UNION ALL
+        SELECT 'payments.buyers', COUNT(DISTINCT user_id) FROM payments WHERE status = 'approved'
+        UNION ALL
+        SELECT t.* FROM club_payments c, LATERAL kpi_payment_deltas('club', c.status, c.amount, NULL, NULL, 1) t
+    ) d
+    GROUP BY d.k;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_kpi_users ON users;
+CREATE TRIGGER trg_kpi_users
+    AFTER INSERT OR DELETE OR UPDATE OF language, gender, level, frequency ON users
+    FOR EACH ROW EXECUTE FUNCTION kpi_users_trg();
+
+DROP TRIGGER IF EXISTS trg_kpi_payments ON payments;
+CREATE TRIGGER trg_kpi_payments
+    AFTER INSERT OR DELETE OR UPDATE OF status, amount, user_id, created_at, approved_at ON payments
+    FOR EACH ROW EXECUTE FUNCTION kpi_payments_trg();
+
+DROP TRIGGER IF EXISTS trg_kpi_club_payments ON club_payments;
+CREATE TRIGGER trg_kpi_club_payments
+    AFTER INSERT OR DELETE OR UPDATE OF status, amount ON club_payments
+    FOR EACH ROW EXECUTE FUNCTION kpi_club_payments_trg();
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM kpi_counters) THEN
+        PERFORM kpi_rebuild();
+    END IF;
+END;
+$$;
+
+-- Receipt audit cache (utils/receipt_cache.py): OCR + verify results per Telegram file,
+-- plus a perceptual hash so re-uploads of the same screenshot are recognised.
+-- owner_* is the first payment that submitted the receipt; later submitters are flagged.
+CREATE TABLE IF NOT EXISTS receipt_cache (
+    file_unique_id TEXT PRIMARY KEY,
+    phash TEXT,
+    local_data JSONB NOT NULL,
+    bank_data JSONB,
+    verified_at TIMESTAMP WITH TIME ZONE,
+    owner_kind TEXT,
+    owner_id INTEGER,
+    owner_user_id BIGINT,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_receipt_cache_phash ON receipt_cache (phash);
+
+-- Receipt audit jobs (utils/audit_queue.py): one row per submitted proof, drained by a
+-- bounded worker pool with retry/backoff; admin_message_id makes retries idempotent.
+CREATE TABLE IF NOT EXISTS receipt_audits (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL, -- payment, club
+    payment_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT,
+    context JSONB,
+    status VARCHAR(20) DEFAULT 'queued', -- queued, running, done, failed
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    timings JSONB,
+    admin_chat_id BIGINT,
+    admin_message_id BIGINT,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    UNIQUE (kind, payment_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_receipt_audits_open ON receipt_audits (next_attempt_at) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_receipt_audits_finished ON receipt_audits (finished_at);
+
+-- Auto-approval audit trail (utils/payment_approval.py): every decision with its reasons.
+-- A bank reference can only ever be auto-approved once.
+CREATE TABLE IF NOT EXISTS payment_auto_approvals (
+    id SERIAL PRIMARY KEY,
+    payment_id INTEGER NOT NULL REFERENCES payments(id) ON DELETE CASCADE,
+    provider VARCHAR(20),
+    reference TEXT,
+    expected_amount DECIMAL(10, 2),
+    paid_amount DECIMAL(10, 2),
+    decision VARCHAR(20) NOT NULL, -- approved, skipped, failed
+    reasons TEXT[],
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_auto_approvals_reference ON payment_auto_approvals (reference) WHERE decision = 'approved';
+CREATE INDEX IF NOT EXISTS idx_auto_approvals_payment ON payment_auto_approvals (payment_id);
+
+-- Every bank reference ever submitted, for payments and club payments alike.
+-- The first submission owns it; any later one is a reused receipt (one index probe).
+-- Keyed by the reference alone: provider is OCR-detected and informational only.
+CREATE TABLE IF NOT EXISTS payment_references (
+    id SERIAL PRIMARY KEY,
+    reference TEXT NOT NULL UNIQUE, -- upper-cased, whitespace stripped
+    provider VARCHAR(20) NOT NULL,
+    amount DECIMAL(10, 2),
+    kind VARCHAR(20) NOT NULL, -- payment, club
+    payment_id INTEGER NOT NULL,
+    user_id BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_payment_references_owner ON payment_references (kind, payment_id);
+
+-- One-time seed from receipts the audit cache already attributed to a payment
+-- (only while the table is still empty, so boots don't rescan receipt_cache)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM payment_references) THEN
+        INSERT INTO payment_references (reference, provider, kind, payment_id, user_id, created_at)
+        SELECT DISTINCT ON (ref) ref, provider, owner_kind, owner_id, owner_user_id, created_at
+        FROM (
+            SELECT UPPER(regexp_replace(local_data->>'ref', '[[:space:]]', '', 'g')) AS ref,
+                   COALESCE(local_data->>'provider', 'Unknown') AS provider,
+                   owner_kind, owner_id, owner_user_id, created_at
+            FROM receipt_cache
+            WHERE owner_kind IS NOT NULL AND LENGTH(local_data->>'ref') >= 8
+        ) c
+        ORDER BY ref, created_at
+        ON CONFLICT (reference) DO NOTHING;
+    END IF;
+END;
+$$;
+
 """
 
+class UserCache:
+    """
+    Bounded TTL + LRU cache for `users` rows keyed by telegram_id.
+    Rows are asyncpg Records (immutable) so they are safe to share between handlers.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[int, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id: int):
+        """Returns (found, row). A cached None means 'user does not exist'."""
+        entry = self._data.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            del self._data[telegram_id]
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(telegram_id)
+        self.hits += 1
+        return True, row
+
+    def set(self, telegram_id: int, row):
+        self._data[telegram_id] = (time.monotonic() + self.ttl, row)
+        self._data.move_to_end(telegram_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, telegram_ids: Optional[Iterable[int]] = None):
+        """Drops the given ids, or the whole cache when called without arguments."""
+        if telegram_ids is None:
+            self._data.clear()
+            return
+        for tid in telegram_ids:
+            self._data.pop(tid, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class KpiSnapshot:
+    """Read-side view over kpi_counters rows; missing keys read as zero."""
+
+    def __init__(self, values: Dict[str, Decimal]):
+        self.values = values
+
+    def count(self, key: str) -> int:
+        return int(self.values.get(key) or 0)
+
+    def amount(self, key: str) -> Decimal:
+        return self.values.get(key) or Decimal(0)
+
+    def keys(self, prefix: str) -> List[str]:
+        return [k for k in self.values if k.startswith(prefix)]
+
+
+CONNECTION_MODES = ("direct", "pooler")
+
+
 class Database:
     
     
-    def __init__(self, dsn: str):
+    def __init__(self, dsn: str, user_cache_ttl: float = 60.0, user_cache_size: int = 10000,
+                 cursor_chunk_size: int = 500, connection_mode: str = "pooler",
+                 pool_min_size: int = 1, pool_max_size: int = 10,
+                 max_inactive_connection_lifetime: float = 300.0,
+                 statement_cache_size: int = 100):
+        if connection_mode not in CONNECTION_MODES:
+            raise ValueError(f"connection_mode must be one of {CONNECTION_MODES}, got '{connection_mode}'")
         self.dsn = dsn
         self._pool: Optional[Pool] = None
-        
+        self.user_cache = UserCache(ttl=user_cache_ttl, max_size=user_cache_size)
+        self.cursor_chunk_size = cursor_chunk_size
+        self.connection_mode = connection_mode
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self.statement_cache_size = statement_cache_size
+        # Set by app_context; when loaded, match_product is served from memory
+        self.product_matcher = None
+        self.receipt_cache = None
+        self.audit_queue = None
+        self.auto_approver = None
+
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        """
+        direct: keep asyncpg's per-connection statement cache, so hot queries are parsed
+                and planned once per connection and then run as named prepared statements.
+        pooler: transaction-pooling proxies hand each transaction to a different backend,
+                so named prepared statements can't survive; disable the cache.
+        """
+        kwargs = {
+            "min_size": self.pool_min_size,
+            "max_size": self.pool_max_size,
+            "max_inactive_connection_lifetime": self.max_inactive_connection_lifetime,
+        }
+        if self.connection_mode == "direct":
+            kwargs["statement_cache_size"] = self.statement_cache_size
+        else:
+            kwargs["statement_cache_size"] = 0
+        return kwargs
 
     async def connect(self):
         if not self._pool:
-            self._pool = await asyncpg.create_pool(
-                self.dsn,
-                min_size=1,
-                max_size=10,
-                statement_cache_size=0
-            )
-            logging.info("Connected to PostgreSQL")
+            self._pool = await asyncpg.create_pool(self.dsn, **self._pool_kwargs())
+            logging.info(f"Connected to PostgreSQL ({self.connection_mode} mode)")
 
     async def setup(self):
         async with self._pool.acquire() as conn:
@@ -242,8 +623,44 @@ class Database:
         async with self._pool.acquire() as conn:
             return await conn.fetchval(query, *args)
 
+    async def iter_chunks(self, query: str, *args, chunk_size: Optional[int] = None,
+                          key: str = "telegram_id") -> AsyncIterator[List[asyncpg.Record]]:
+        """
+        Pages through a query by keyset on `key`, yielding lists of up to `chunk_size` rows.
+        `key` must be a selected column that is unique per row (ordering follows it).
+        Each page is its own short statement on a pooled connection: nothing — no
+        transaction, snapshot or connection — is held while the consumer works through a
+        chunk, so a slow rate-limited broadcast never pins vacuum or a pool slot.
+        """
+        chunk_size = chunk_size or self.cursor_chunk_size
+        first = f"SELECT * FROM ({query}) AS page ORDER BY page.{key} LIMIT {chunk_size}"
+        after = (f"SELECT * FROM ({query}) AS page WHERE page.{key} > ${len(args) + 1} "
+                 f"ORDER BY page.{key} LIMIT {chunk_size}")
+        rows = await self._pool.fetch(first, *args)
+        while rows:
+            yield rows
+            if len(rows) < chunk_size:
+                break
+            rows = await self._pool.fetch(after, *args, rows[-1][key])
+
+    async def iter_rows(self, query: str, *args, chunk_size: Optional[int] = None,
+                        key: str = "telegram_id") -> AsyncIterator[asyncpg.Record]:
+        """Row-at-a-time view over iter_chunks."""
+        async for chunk in self.iter_chunks(query, *args, chunk_size=chunk_size, key=key):
+            for row in chunk:
+                yield row
+
     async def get_user(self, telegram_id: int):
-        return await self._pool.fetchrow("SELECT * FROM users WHERE telegram_id = $1", telegram_id)
+        found, row = self.user_cache.get(telegram_id)
+        if found:
+            return row
+        row = await self._pool.fetchrow("SELECT * FROM users WHERE telegram_id = $1", telegram_id)
+        self.user_cache.set(telegram_id, row)
+        return row
+
+    def invalidate_user(self, *telegram_ids: int):
+        """Evicts cached user rows. Call with no ids after bulk `UPDATE users` statements."""
+        self.user_cache.invalidate(telegram_ids or None)
 
     async def create_or_update_user(self, telegram_id, **kwargs):
     # This logic creates the user if they don't exist, or updates them if they do
@@ -261,17 +678,27 @@ class Database:
             DO UPDATE SET {update_stmt}
         """
         await self._pool.execute(query, telegram_id, *values)
+        self.invalidate_user(telegram_id)
     # --- PRODUCT LOGIC ---
-    async def match_product(self, language: str, level: str, frequency: int):
+    async def match_product(self, language: str, level: str, frequency: int, gender: Optional[str] = None):
+        if self.product_matcher is not None and self.product_matcher.loaded:
+            return self.product_matcher.match(language, level, frequency, gender)
+
+        # Same rules as ProductMatcher.match: exact gender -> 'ALL' -> any gender, lowest id
         query = """
             SELECT * FROM products 
             WHERE language = $1 
             AND level = $2 
             AND frequency = $3
             AND is_active = TRUE
+            ORDER BY CASE
+                WHEN gender = $4::text THEN 0
+                WHEN $4::text IS NOT NULL AND gender = 'ALL' THEN 1
+                ELSE 2
+            END, id
             LIMIT 1
         """
-        return await self._pool.fetchrow(query, language, level, frequency)
+        return await self._pool.fetchrow(query, language, level, frequency, gender or None)
 
     async def add_product(self, title: str, lang: str, gender: str, level: str, freq: int, price: float, file_id: str):
         query = """
@@ -288,34 +715,53 @@ class Database:
         """
         return await self._pool.fetchval(query, user_id, product_id, proof_id, amount)
 
-    async def get_admin_stats_bot(self) -> asyncpg.Record:
+    # --- KPI SNAPSHOT (kpi_counters, maintained by triggers) ---
+    async def get_kpi_counters(self) -> "KpiSnapshot":
+        """One indexed read of the whole counter table (a few dozen rows)."""
+        rows = await self._pool.fetch("SELECT key, value FROM kpi_counters")
+        return KpiSnapshot({r['key']: r['value'] for r in rows})
+
+    async def rebuild_kpi_counters(self):
+        """Recomputes every counter from the base tables (reconciles any drift)."""
+        await self._pool.execute("SELECT kpi_rebuild()")
+
+    async def get_admin_stats_bot(self) -> Dict[str, Any]:
         """Fetches elite-level business intelligence including club subscription revenue."""
-        query = """
-            SELECT 
-                (SELECT count(*) FROM users) as users,
-                (SELECT count(*) FROM payments WHERE status = 'approved') as sales,
-                (SELECT COALESCE(sum(amount), 0) FROM payments WHERE status = 'approved') as revenue,
-                (SELECT COALESCE(sum(amount), 0) FROM club_payments WHERE status = 'approved') as club_revenue,
-                ((SELECT count(*) FROM payments WHERE status = 'pending') + 
-                 (SELECT count(*) FROM club_payments WHERE status = 'pending')) as pending_count
-        """
-        return await self._pool.fetchrow(query)
+        kpi = await self.get_kpi_counters()
+        return {
+            "users": kpi.count("users.total"),
+            "sales": kpi.count("payments.count.approved"),
+            "revenue": kpi.amount("payments.amount.approved"),
+            "club_revenue": kpi.amount("club.amount.approved"),
+            "pending_count": kpi.count("payments.count.pending") + kpi.count("club.count.pending"),
+        }
     
     async def get_recent_payment_proofs(self, limit: int = 5) -> List[asyncpg.Record]:
-        """Fetches the last N payments that have a proof_file_id for testing."""
+        """
+        Fetches the last N payments that have a proof_file_id for testing.
+        audit_file_id / audit_file_unique_id are the OCR-sized photo the audit queue
+        scanned (the receipt_cache key), falling back to the stored proof.
+        """
         query = """
-            SELECT p.id, p.proof_file_id, p.amount, u.full_name, pr.title
+            SELECT p.id, p.proof_file_id, p.amount, u.full_name, pr.title,
+                   COALESCE(ra.file_id, p.proof_file_id) AS audit_file_id,
+                   ra.file_unique_id AS audit_file_unique_id
             FROM payments p
             JOIN users u ON p.user_id = u.telegram_id
             JOIN products pr ON p.product_id = pr.id
+            LEFT JOIN receipt_audits ra ON ra.kind = 'payment' AND ra.payment_id = p.id
             WHERE p.proof_file_id IS NOT NULL
             ORDER BY p.created_at DESC
             LIMIT $1
         """
         return await self._pool.fetch(query, limit)
 
-    async def approve_payment(self, payment_id: int) -> Optional[Dict]:
-        """Approves payment and returns user_id + file_id for automated delivery."""
+    async def approve_payment(self, payment_id: int, only_pending: bool = False) -> Optional[Dict]:
+        """
+        Approves payment and returns user_id + file_id for automated delivery.
+        only_pending: no-op (None) unless the payment is still pending — used by auto-approval
+        so it can never race a human decision.
+        """
         async with self._pool.acquire() as conn:
             async with conn.transaction():
                 # Update status and set approved_at timestamp
@@ -323,20 +769,22 @@ class Database:
                     UPDATE payments 
                     SET status = 'approved',
                         approved_at = CURRENT_TIMESTAMP
-                    WHERE id = $1 
+                    WHERE id = $1 AND (NOT $2 OR status = 'pending')
                     RETURNING user_id, product_id
-                """, payment_id)
+                """, payment_id, only_pending)
                 
                 if not row:
                     return None
                 
                 # Get the PDF and User Language
-                return await conn.fetchrow("""
+                info = await conn.fetchrow("""
                     SELECT p.telegram_file_id, u.language, u.telegram_id as user_id
                     FROM products p
                     JOIN users u ON u.telegram_id = $1
                     WHERE p.id = $2
                 """, row['user_id'], row['product_id'])
+        self.invalidate_user(row['user_id'])
+        return info
 
 
     async def disconnect(self):
@@ -345,9 +793,8 @@ class Database:
             
     
     async def get_user_language(self, telegram_id: int) -> str:
-        """Return the user's language code (default 'EN')."""
-        query = "SELECT language FROM users WHERE telegram_id = $1"
-        row = await self._pool.fetchrow(query, telegram_id)
+        """Return the user's language code (default 'EN'). Served from the user cache."""
+        row = await self.get_user(telegram_id)
         if row and row["language"]:
             return row["language"]
         return "EN"
@@ -368,16 +815,10 @@ class Database:
         Computes lifetime gross revenue and transaction counts
         for the Hilawe Transformation Club engine.
         """
-        query = """
-            SELECT 
-                COUNT(*) FILTER (WHERE status = 'approved') as successful_billings,
-                COALESCE(SUM(amount) FILTER (WHERE status = 'approved'), 0) as gross_club_profit
-            FROM club_payments
-        """
-        row = await self._pool.fetchrow(query)
-        profit = float(row["gross_club_profit"]) if row else 0.0
+        kpi = await self.get_kpi_counters()
+        profit = float(kpi.amount("club.amount.approved"))
         return {
-            "total_transactions": row["successful_billings"] if row else 0,
+            "total_transactions": kpi.count("club.count.approved"),
             "club_profit": profit,
             "lifetime_revenue": profit
         }
@@ -565,34 +1006,22 @@ class Database:
 
     # --- UPDATED KPI HELPER ---
     
-    async def get_admin_stats(self) -> asyncpg.Record:
-        query = """
-            SELECT 
-                -- TOTAL NODES
-                (SELECT count(*) FROM users) as active_users,
-                
-                -- PENDING SYNC (Combined standard guides + club claims)
-                ((SELECT count(*) FROM payments WHERE status = 'pending') + 
-                 (SELECT count(*) FROM club_payments WHERE status = 'pending')) as pending_payments,
-                
-                -- PRODUCT REVENUE
-                (SELECT COALESCE(sum(amount), 0) FROM payments WHERE status = 'approved') as total_revenue,
-                
-                -- CLUB REVENUE / PROFIT LAYER
-                (SELECT COALESCE(sum(amount), 0) FROM club_payments WHERE status = 'approved') as club_revenue,
-                
-                -- THE "PURITY" CONVERSION RATE (Users who bought a standard product / Total Users)
-                (SELECT 
-                    CASE 
-                        WHEN (SELECT count(*) FROM users) = 0 THEN 0 
-                        ELSE ROUND(
-                            (COUNT(DISTINCT user_id)::numeric / 
-                            (SELECT count(*) FROM users)::numeric) * 100, 1
-                        )
-                    END 
-                FROM payments WHERE status = 'approved') as conversion_rate
-        """
-        return await self._pool.fetchrow(query)
+    async def get_admin_stats(self) -> Dict[str, Any]:
+        kpi = await self.get_kpi_counters()
+        users = kpi.count("users.total")
+        buyers = kpi.count("payments.buyers")
+        return {
+            # TOTAL NODES
+            "active_users": users,
+            # PENDING SYNC (Combined standard guides + club claims)
+            "pending_payments": kpi.count("payments.count.pending") + kpi.count("club.count.pending"),
+            # PRODUCT REVENUE
+            "total_revenue": kpi.amount("payments.amount.approved"),
+            # CLUB REVENUE / PROFIT LAYER
+            "club_revenue": kpi.amount("club.amount.approved"),
+            # THE "PURITY" CONVERSION RATE (Users who bought a standard product / Total Users)
+            "conversion_rate": round(Decimal(buyers) / Decimal(users) * 100, 1) if users else 0,
+        }
 
     #New api for revenue targeting
     async def get_revenue_by_products(self) -> List[asyncpg.Record]:
@@ -650,32 +1079,24 @@ class Database:
             return await self._pool.fetchrow(query)
         
         
-    async def get_node_intelligence_matrix(self) -> asyncpg.Record:
-        query = """
-            SELECT 
-                -- Language (Case Insensitive)
-                COUNT(*) FILTER (WHERE UPPER(language) = 'EN') as lang_en,
-                COUNT(*) FILTER (WHERE UPPER(language) = 'AM') as lang_am,
-                
-                -- Gender (Case Insensitive)
-                COUNT(*) FILTER (WHERE UPPER(gender) = 'MALE') as gen_male,
-                COUNT(*) FILTER (WHERE UPPER(gender) = 'FEMALE') as gen_female,
-                
-                -- Level (Case Insensitive + Matches your specific VARCHAR values)
-                COUNT(*) FILTER (WHERE UPPER(level) = 'BEGINNER') as lvl_beginner,
-                COUNT(*) FILTER (WHERE UPPER(level) = 'INTERMEDIATE') as lvl_inter,
-                COUNT(*) FILTER (WHERE UPPER(level) = 'ADVANCED') as lvl_adv,
-                COUNT(*) FILTER (WHERE UPPER(level) = 'GLUTE_FOCUSED') as lvl_glute,
-                
-                -- Frequency (Integer Mapping)
-                -- Mapping typical integer values to your UI labels
-                COUNT(*) FILTER (WHERE frequency <= 3) as freq_2_3,
-                COUNT(*) FILTER (WHERE frequency = 4) as freq_3_4,
-                COUNT(*) FILTER (WHERE frequency = 5) as freq_4_5,
-                COUNT(*) FILTER (WHERE frequency >= 6) as freq_everyday
-            FROM users
-        """
-        return await self._pool.fetchrow(query)
+    async def get_node_intelligence_matrix(self) -> Dict[str, int]:
+        kpi = await self.get_kpi_counters()
+        return {
+            # Language / Gender / Level (case-insensitive, bucketed by the kpi_users trigger)
+            "lang_en": kpi.count("users.lang.EN"),
+            "lang_am": kpi.count("users.lang.AM"),
+            "gen_male": kpi.count("users.gender.MALE"),
+            "gen_female": kpi.count("users.gender.FEMALE"),
+            "lvl_beginner": kpi.count("users.level.BEGINNER"),
+            "lvl_inter": kpi.count("users.level.INTERMEDIATE"),
+            "lvl_adv": kpi.count("users.level.ADVANCED"),
+            "lvl_glute": kpi.count("users.level.GLUTE_FOCUSED"),
+            # Frequency (Integer Mapping to the UI labels)
+            "freq_2_3": kpi.count("users.freq.2_3"),
+            "freq_3_4": kpi.count("users.freq.3_4"),
+            "freq_4_5": kpi.count("users.freq.4_5"),
+            "freq_everyday": kpi.count("users.freq.everyday"),
+        }
 
     async def get_top_sellers(self, limit: int = 5):
         query = """
@@ -693,22 +1114,52 @@ class Database:
         return await self._pool.fetch(query, limit)
 
 
-    async def get_payment_kpis(self) -> asyncpg.Record:
+    async def get_payment_kpis(self) -> Dict[str, Any]:
         """
         Returns KPI metrics for payments tab.
         """
-        query = """
-            SELECT 
-                COALESCE(SUM(amount) FILTER (WHERE status = 'approved'), 0) as total_revenue,
-                COUNT(*) FILTER (WHERE status = 'pending') as pending_count,
-                COALESCE(AVG(EXTRACT(EPOCH FROM (approved_at - created_at)) / 60), 0) as avg_approval_time_minutes,
-                CASE 
-                    WHEN COUNT(*) = 0 THEN 0
-                    ELSE ROUND((COUNT(*) FILTER (WHERE status = 'rejected')::numeric / COUNT(*)::numeric), 3)
-                END as rejection_rate
-            FROM payments
+        kpi = await self.get_kpi_counters()
+        total = sum(kpi.count(k) for k in kpi.keys("payments.count."))
+        approvals = kpi.count("payments.approval_count")
+        products_revenue = kpi.amount("payments.amount.approved")
+        club_revenue = kpi.amount("club.amount.approved")
+        return {
+            "total_revenue": products_revenue,
+            "products_revenue": products_revenue,
+            "club_revenue": club_revenue,
+            "pending_count": kpi.count("payments.count.pending"),
+            "avg_approval_time_minutes": kpi.amount("payments.approval_minutes") / approvals if approvals else 0,
+            "rejection_rate": round(Decimal(kpi.count("payments.count.rejected")) / total, 3) if total else 0,
+        }
+
+    async def get_pending_payout_stats(self, last_payout_ts: datetime) -> Dict[str, Decimal]:
         """
-        return await self._pool.fetchrow(query)
+        Pending (since last payout) and lifetime gross per stream.
+        Lifetime sums come from kpi_counters; the pending window is an index range scan
+        over approvals since the last payout, so cost tracks payout cadence, not table size.
+        """
+        kpi = await self.get_kpi_counters()
+        row = await self._pool.fetchrow("""
+            SELECT
+                COALESCE((
+                    SELECT SUM(amount) FROM payments
+                    WHERE status = 'approved' AND approved_at > $1
+                ), 0) as products_total,
+                COALESCE((
+                    SELECT SUM(amount) FROM club_payments
+                    WHERE status = 'approved' AND processed_at > $1
+                ), 0) as club_total,
+                (SELECT COALESCE(SUM(operational_deductions), 0) FROM payout_history) as lt_burn,
+                (SELECT COALESCE(SUM(coach_share + dagmawi_share), 0) FROM payout_history) as lt_paid
+        """, last_payout_ts)
+        return {
+            "products_total": row['products_total'],
+            "club_total": row['club_total'],
+            "lt_products_gross": kpi.amount("payments.amount.approved"),
+            "lt_club_gross": kpi.amount("club.amount.approved"),
+            "lt_burn": row['lt_burn'],
+            "lt_paid": row['lt_paid'],
+        }
     
     
     async def create_product(self, data: Dict[str, Any]) -> int:
@@ -752,27 +1203,69 @@ class Database:
     from typing import List, Dict, Any
     from datetime import datetime, timedelta
     
-    async def set_deal_for_targets(self, filter_sql: str, expires_at: datetime, price: float) -> int:
+    async def set_deal_for_targets(self, segment: str, expires_at: datetime, price: float, **params) -> int:
         """
-        Set deal_expires_at and deal_price for users matching filter_sql.
-        filter_sql should be a WHERE clause fragment like "has_paid = FALSE".
+        Set deal_expires_at and deal_price for users in a registry segment (database.segments).
         Returns number of rows updated.
         """
+        target_sql, target_args = segments.select(segment, "u.telegram_id", **params)
+        n = len(target_args)
         query = f"""
         UPDATE users
-        SET deal_expires_at = $1, deal_price = $2
-        WHERE {filter_sql}
+        SET deal_expires_at = ${n + 1}, deal_price = ${n + 2}
+        WHERE telegram_id IN ({target_sql})
         """
-        result = await self._pool.execute(query, expires_at, price)
+        result = await self._pool.execute(query, *target_args, expires_at, price)
+        self.invalidate_user()
         # asyncpg returns a string like "UPDATE <n>"
         try:
             return int(result.split()[-1])
         except Exception:
             return 0
 
-    async def fetch_broadcast_targets(self, filter_sql: str) -> List[Dict[str, Any]]:
-        q = f"SELECT telegram_id, language FROM users WHERE {filter_sql}"
-        rows = await self._pool.fetch(q)
+    async def apply_campaign_pricing(self, target_spec, expires_at: datetime,
+                                     broadcast_id: Optional[int] = None):
+        """
+        Locks in campaign prices with one set-based UPDATE ... FROM (target query).
+        target_spec: (sql, args) whose SELECT returns telegram_id, p_id and final_price.
+
+        With broadcast_id the RETURNING rows go straight into broadcast_recipients in the
+        same statement (one round trip) and the number queued is returned.
+        Without it the priced rows (telegram_id, language, full_name, gender, p_id,
+        final_price) are returned.
+        """
+        target_sql, target_args = target_spec
+        n = len(target_args)
+        priced = f"""
+            UPDATE users u
+            SET deal_price = t.final_price, deal_expires_at = ${n + 1}
+            FROM ({target_sql}) t
+            WHERE u.telegram_id = t.telegram_id
+            RETURNING u.telegram_id, u.language, u.full_name, u.gender, t.p_id, t.final_price
+        """
+
+        if broadcast_id is None:
+            rows = await self._pool.fetch(priced, *target_args, expires_at)
+            if rows:
+                self.invalidate_user(*(r['telegram_id'] for r in rows))
+            return rows
+
+        rows = await self._pool.fetch(f"""
+            WITH priced AS ({priced})
+            INSERT INTO broadcast_recipients
+                (broadcast_id, telegram_id, language, full_name, gender, product_id, price)
+            SELECT ${n + 2}, telegram_id, language, full_name, gender, p_id, final_price::int
+            FROM priced
+            ON CONFLICT DO NOTHING
+            RETURNING telegram_id
+        """, *target_args, expires_at, broadcast_id)
+        if rows:
+            self.invalidate_user(*(r['telegram_id'] for r in rows))
+        return len(rows)
+
+    async def fetch_broadcast_targets(self, segment: str, **params) -> List[Dict[str, Any]]:
+        q, args = segments.select(segment, "DISTINCT u.telegram_id, u.language", **params)
+        rows = await self._pool.fetch(q, *args)
         return [dict(r) for r in rows]
 
     async def create_broadcast(self, name: str, target_filter: str, language: str, expires_at: datetime, total_target: int, admin_id: int):
@@ -784,3 +1277,412 @@ class Database:
     async def update_broadcast_stats(self, broadcast_id: int, sent: int, failed: int):
         await self._pool.execute("UPDATE broadcasts SET sent_count = $1, failed_count = $2 WHERE id = $3", sent, failed, broadcast_id)
 
+    async def recount_broadcast_stats(self, broadcast_id: int) -> Tuple[int, int]:
+        """
+        Rebuilds sent_count/failed_count from broadcast_recipients, the source of truth
+        (blocked/deleted rows count as failed, like the live counters). Returns (sent, failed).
+        """
+        row = await self._pool.fetchrow("""
+            UPDATE broadcasts b
+            SET sent_count = c.sent, failed_count = c.failed
+            FROM (
+                SELECT COUNT(*) FILTER (WHERE status = 'sent')::INT AS sent,
+                       COUNT(*) FILTER (WHERE status NOT IN ('pending', 'sending', 'sent'))::INT AS failed
+                FROM broadcast_recipients
+                WHERE broadcast_id = $1
+            ) c
+            WHERE b.id = $1
+            RETURNING b.sent_count, b.failed_count
+        """, broadcast_id)
+        return (row['sent_count'], row['failed_count']) if row else (0, 0)
+
+    # --- DURABLE BROADCAST QUEUE ---
+    async def create_broadcast_job(self, name: str, target_filter: str, expires_at: datetime, admin_id: int) -> int:
+        """
+        Creates a broadcasts row in 'queued' state. Recipients are streamed in with
+        enqueue_broadcast_recipients and the job flips to 'running' via activate_broadcast.
+        Queued jobs are never resumed on startup, so a crash mid-enqueue can't send a partial list.
+        """
+        return await self._pool.fetchval("""
+            INSERT INTO broadcasts (name, target_filter, expires_at, admin_id, status)
+            VALUES ($1, $2, $3, $4, 'queued') RETURNING id
+        """, name, target_filter, expires_at, admin_id)
+
+    async def enqueue_broadcast_recipients(self, broadcast_id: int, recipients: List[Dict[str, Any]]) -> int:
+        """
+        recipients: dicts with telegram_id, language, full_name, gender, product_id, price.
+        Returns how many rows were inserted (duplicates are ignored).
+        """
+        if not recipients:
+            return 0
+        result = await self._pool.execute("""
+            INSERT INTO broadcast_recipients
+                (broadcast_id, telegram_id, language, full_name, gender, product_id, price)
+            SELECT $1, t.* FROM unnest($2::bigint[], $3::text[], $4::text[], $5::text[], $6::int[], $7::int[]) AS t
+            ON CONFLICT DO NOTHING
+        """,
+            broadcast_id,
+            [r['telegram_id'] for r in recipients],
+            [r.get('language') for r in recipients],
+            [r.get('full_name') for r in recipients],
+            [r.get('gender') for r in recipients],
+            [r.get('product_id') for r in recipients],
+            [int(r['price']) if r.get('price') is not None else None for r in recipients],
+        )
+        return int(result.split()[-1])
+
+    async def activate_broadcast(self, broadcast_id: int) -> int:
+        """Marks a fully enqueued job as 'running' (resumable) and stores its final size."""
+        return await self._pool.fetchval("""
+            UPDATE broadcasts
+            SET status = 'running',
+                total_target = (SELECT COUNT(*) FROM broadcast_recipients WHERE broadcast_id = $1)
+            WHERE id = $1 AND status = 'queued'
+            RETURNING total_target
+        """, broadcast_id)
+
+    async def claim_broadcast_batch(self, broadcast_id: int, limit: int) -> List[asyncpg.Record]:
+        """
+        Atomically moves up to `limit` pending recipients to 'sending' and returns them.
+        SKIP LOCKED lets several workers drain the same broadcast without overlapping.
+        """
+        query = """
+            UPDATE broadcast_recipients r
+            SET status = 'sending', attempts = r.attempts + 1, claimed_at = NOW()
+            FROM (
+                SELECT telegram_id FROM broadcast_recipients
+                WHERE broadcast_id = $1 AND status = 'pending'
+                ORDER BY telegram_id
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ) c
+            WHERE r.broadcast_id = $1 AND r.telegram_id = c.telegram_id
+            RETURNING r.*
+        """
+        return await self._pool.fetch(query, broadcast_id, limit)
+
+    async def mark_broadcast_recipients(self, broadcast_id: int, telegram_ids: List[int],
+                                        status: str, error: Optional[str] = None):
+        """Records the final delivery state for a group of recipients."""
+        if not telegram_ids:
+            return
+        await self._pool.execute("""
+            UPDATE broadcast_recipients
+            SET status = $2, error = $3, finished_at = NOW()
+            WHERE broadcast_id = $1 AND telegram_id = ANY($4::bigint[])
+        """, broadcast_id, status, error, telegram_ids)
+
+    async def bulk_mark_broadcast_recipients(self, broadcast_id: int, rows: List[tuple]):
+        """rows: (telegram_id, status, error) tuples, written with a single UPDATE ... FROM unnest."""
+        if not rows:
+            return
+        await self._pool.execute("""
+            UPDATE broadcast_recipients r
+            SET status = v.status, error = v.error, finished_at = NOW()
+            FROM unnest($2::bigint[], $3::text[], $4::text[]) AS v(telegram_id, status, error)
+            WHERE r.broadcast_id = $1 AND r.telegram_id = v.telegram_id
+        """, broadcast_id, [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+
+    async def bulk_set_broadcast_messages(self, rows: List[tuple]):
+        """rows: (telegram_id, message_id, product_id) tuples from a broadcast send loop."""
+        if not rows:
+            return
+        ids = [r[0] for r in rows]
+        await self._pool.execute("""
+            UPDATE users u
+            SET last_broadcast_msg_id = v.msg_id, matched_product_id = v.product_id
+            FROM unnest($1::bigint[], $2::bigint[], $3::int[]) AS v(telegram_id, msg_id, product_id)
+            WHERE u.telegram_id = v.telegram_id
+        """, ids, [r[1] for r in rows], [r[2] for r in rows])
+        self.invalidate_user(*ids)
+
+    # --- AUTO-APPROVAL ---
+    async def get_payment_expectation(self, payment_id: int) -> Optional[asyncpg.Record]:
+        """What the user was supposed to pay: their flash-deal price if it was live when they paid, else list price."""
+        return await self._pool.fetchrow("""
+            SELECT p.id, p.status, p.user_id, p.amount AS quoted_amount, pr.price AS product_price,
+                   CASE WHEN u.deal_price IS NOT NULL AND u.deal_expires_at >= p.created_at
+                        THEN u.deal_price ELSE pr.price END AS expected_amount
+            FROM payments p
+            JOIN products pr ON pr.id = p.product_id
+            JOIN users u ON u.telegram_id = p.user_id
+            WHERE p.id = $1
+        """, payment_id)
+
+    async def reference_auto_approved(self, reference: str, exclude_payment_id: int) -> Optional[int]:
+        """Payment id that already consumed this bank reference through auto-approval, if any."""
+        return await self._pool.fetchval("""
+            SELECT payment_id FROM payment_auto_approvals
+            WHERE reference = $1 AND decision = 'approved' AND payment_id <> $2
+        """, reference, exclude_payment_id)
+
+    async def record_auto_approval(self, payment_id: int, provider: Optional[str], reference: Optional[str],
+                                   expected_amount, paid_amount, decision: str, reasons: List[str]) -> Optional[int]:
+        """Audit trail row id. None if another payment won the unique reference race."""
+        try:
+            return await self._pool.fetchval("""
+                INSERT INTO payment_auto_approvals
+                    (payment_id, provider, reference, expected_amount, paid_amount, decision, reasons)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                RETURNING id
+            """, payment_id, provider, reference, expected_amount, paid_amount, decision, reasons)
+        except asyncpg.UniqueViolationError:
+            return None
+
+    async def void_auto_approval(self, approval_id: int, reason: str):
+        """An 'approved' decision that could not be applied (payment no longer pending)."""
+        await self._pool.execute("""
+            UPDATE payment_auto_approvals
+            SET decision = 'failed', reasons = array_append(reasons, $2)
+            WHERE id = $1
+        """, approval_id, reason)
+
+    # --- PAYMENT REFERENCES (duplicate receipt index) ---
+    async def claim_payment_reference(self, reference: str, provider: str, amount, kind: str,
+                                      payment_id: int, user_id: int) -> asyncpg.Record:
+        """
+        Registers a normalized bank reference for a payment and returns its owner
+        (kind, payment_id, user_id). An owner other than the caller means the receipt
+        was already used. One statement, one unique-index probe.
+        """
+        holder = await self._pool.fetchrow("""
+            WITH ins AS (
+                INSERT INTO payment_references (reference, provider, amount, kind, payment_id, user_id)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (reference) DO NOTHING
+                RETURNING kind, payment_id, user_id
+            )
+            SELECT kind, payment_id, user_id FROM ins
+            UNION ALL
+            SELECT kind, payment_id, user_id FROM payment_references WHERE reference = $1
+            LIMIT 1
+        """, reference, provider, amount, kind, payment_id, user_id)
+        if holder is None:
+            # A concurrent claimant committed after this statement's snapshot: the insert
+            # conflicted but its row wasn't visible yet. A fresh statement sees it.
+            holder = await self._pool.fetchrow(
+                "SELECT kind, payment_id, user_id FROM payment_references WHERE reference = $1", reference
+            )
+        return holder
+
+    async def set_payment_reference_amount(self, reference: str, amount):
+        """Replaces the OCR amount with the bank-confirmed one."""
+        await self._pool.execute(
+            "UPDATE payment_references SET amount = $2 WHERE reference = $1",
+            reference, amount,
+        )
+
+    # --- RECEIPT AUDIT QUEUE ---
+    @staticmethod
+    def _audit_job(row) -> Dict[str, Any]:
+        job = dict(row)
+        job['context'] = json.loads(job['context']) if job['context'] else {}
+        return job
+
+    async def enqueue_receipt_audit(self, kind: str, payment_id: int, user_id: int, file_id: str,
+                                    file_unique_id: Optional[str], context: Dict[str, Any]) -> int:
+        """Queues a proof for the audit workers; re-submitting the same payment is a no-op."""
+        return await self._pool.fetchval("""
+            INSERT INTO receipt_audits (kind, payment_id, user_id, file_id, file_unique_id, context)
+            VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+            ON CONFLICT (kind, payment_id) DO UPDATE SET kind = EXCLUDED.kind
+            RETURNING id
+        """, kind, payment_id, user_id, file_id, file_unique_id, json.dumps(context))
+
+    async def claim_receipt_audit(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Takes the oldest due job. 'running' jobs whose lease expired (worker died mid-audit)
+        are taken over; SKIP LOCKED keeps workers from claiming the same row.
+        """
+        row = await self._pool.fetchrow("""
+            UPDATE receipt_audits a
+            SET status = 'running', attempts = a.attempts + 1, started_at = NOW()
+            FROM (
+                SELECT id FROM receipt_audits
+                WHERE (status = 'queued' AND next_attempt_at <= NOW())
+                   OR (status = 'running' AND started_at < NOW() - make_interval(secs => $1))
+                ORDER BY next_attempt_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ) c
+            WHERE a.id = c.id
+            RETURNING a.*
+        """, float(lease_seconds))
+        return self._audit_job(row) if row else None
+
+    async def set_receipt_audit_message(self, job_id: int, chat_id: int, message_id: int):
+        await self._pool.execute(
+            "UPDATE receipt_audits SET admin_chat_id = $2, admin_message_id = $3 WHERE id = $1",
+            job_id, chat_id, message_id,
+        )
+
+    async def finish_receipt_audit(self, job_id: int, timings: Optional[Dict[str, float]]):
+        await self._pool.execute("""
+            UPDATE receipt_audits
+            SET status = 'done', finished_at = NOW(), last_error = NULL, timings = $2::jsonb
+            WHERE id = $1
+        """, job_id, json.dumps(timings) if timings else None)
+
+    async def retry_receipt_audit(self, job_id: int, error: str, delay_seconds: Optional[float]):
+        """Schedules another attempt after `delay_seconds`, or marks the job failed when None."""
+        if delay_seconds is None:
+            await self._pool.execute("""
+                UPDATE receipt_audits SET status = 'failed', last_error = $2, finished_at = NOW()
+                WHERE id = $1
+            """, job_id, error)
+        else:
+            await self._pool.execute("""
+                UPDATE receipt_audits
+                SET status = 'queued', last_error = $2, next_attempt_at = NOW() + make_interval(secs => $3)
+                WHERE id = $1
+            """, job_id, error, float(delay_seconds))
+
+    async def get_receipt_audit_metrics(self) -> Dict[str, Any]:
+        """Queue depth plus end-to-end and queue-wait percentiles over the last hour."""
+        row = await self._pool.fetchrow("""
+            SELECT
+                COUNT(*) FILTER (WHERE status = 'queued')::INT AS queued,
+                COUNT(*) FILTER (WHERE status = 'running')::INT AS running,
+                COUNT(*) FILTER (WHERE status = 'queued' AND attempts > 0)::INT AS retrying,
+                COUNT(*) FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour')::INT AS done_1h,
+                COUNT(*) FILTER (WHERE status = 'failed' AND finished_at > NOW() - INTERVAL '24 hours')::INT AS failed_24h,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at))
+                    FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour') AS total_p50,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at))
+                    FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour') AS total_p95,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM started_at - created_at))
+                    FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour') AS wait_p95,
+                EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE status = 'queued')) AS oldest_queued
+            FROM receipt_audits
+            WHERE status IN ('queued', 'running') OR finished_at > NOW() - INTERVAL '24 hours'
+        """)
+        return dict(row)
+
+    async def mark_users_reminded(self, telegram_ids: List[int]):
+        if not telegram_ids:
+            return
+        await self._pool.execute(
+            "UPDATE users SET reminded = TRUE WHERE telegram_id = ANY($1::bigint[])", telegram_ids
+        )
+        self.invalidate_user(*telegram_ids)
+
+    async def start_club_subscriptions(self, user_ids: List[int]):
+        """Starts the 30-day clock for members whose kickoff link was delivered."""
+        if not user_ids:
+            return
+        await self._pool.execute("""
+            UPDATE club_subscriptions
+            SET expires_at = NOW() + INTERVAL '30 days', updated_at = NOW()
+            WHERE user_id = ANY($1::bigint[])
+        """, user_ids)
+
+    async def prune_blocked_users(self, telegram_ids: List[int]) -> List[int]:
+        """
+        Deletes users who blocked the bot in one statement. Users still referenced by
+        payments, club check-ins or survey answers are kept (those FKs don't cascade).
+        Returns the ids that were actually deleted.
+        """
+        if not telegram_ids:
+            return []
+        rows = await self._pool.fetch("""
+            DELETE FROM users u
+            WHERE u.telegram_id = ANY($1::bigint[])
+            AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.user_id = u.telegram_id)
+            AND NOT EXISTS (SELECT 1 FROM club_checkins c WHERE c.user_id = u.telegram_id)
+            AND NOT EXISTS (SELECT 1 FROM club_survey_results s WHERE s.user_id = u.telegram_id)
+            RETURNING u.telegram_id
+        """, telegram_ids)
+        deleted = [r['telegram_id'] for r in rows]
+        if deleted:
+            self.invalidate_user(*deleted)
+        return deleted
+
+    async def get_broadcast_recipient_ids(self, broadcast_id: int, status: str) -> List[int]:
+        rows = await self._pool.fetch(
+            "SELECT telegram_id FROM broadcast_recipients WHERE broadcast_id = $1 AND status = $2",
+            broadcast_id, status
+        )
+        return [r['telegram_id'] for r in rows]
+
+    async def get_broadcast(self, broadcast_id: int) -> Optional[asyncpg.Record]:
+        return await self._pool.fetchrow("SELECT * FROM broadcasts WHERE id = $1", broadcast_id)
+
+    async def get_broadcast_breakdown(self, broadcast_id: int) -> Dict[str, Any]:
+        """Per-status counts plus the price tier distribution of delivered recipients."""
+        rows = await self._pool.fetch("""
+            SELECT status, price, COUNT(*)::INT AS n
+            FROM broadcast_recipients
+            WHERE broadcast_id = $1
+            GROUP BY status, price
+        """, broadcast_id)
+        statuses: Dict[str, int] = {}
+        tiers: Dict[str, int] = {}
+        for r in rows:
+            statuses[r['status']] = statuses.get(r['status'], 0) + r['n']
+            if r['status'] == 'sent' and r['price'] is not None:
+                tiers[str(r['price'])] = tiers.get(str(r['price']), 0) + r['n']
+        return {"statuses": statuses, "tiers": tiers}
+
+    async def finish_broadcast(self, broadcast_id: int, status: str = 'completed'):
+        await self._pool.execute(
+            "UPDATE broadcasts SET status = $2, finished_at = NOW() WHERE id = $1",
+            broadcast_id, status
+        )
+
+    async def get_resumable_broadcasts(self) -> List[asyncpg.Record]:
+        """
+        Called on startup. Rows still in 'sending' belong to a worker that died mid-batch;
+        we cannot know whether Telegram delivered them, so they are failed rather than
+        re-sent (at-most-once). Returns running broadcasts that still have pending rows.
+        """
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    UPDATE broadcast_recipients r
+                    SET status = 'failed', error = 'interrupted', finished_at = NOW()
+                    FROM broadcasts b
+                    WHERE b.id = r.broadcast_id AND b.status = 'running' AND r.status = 'sending'
+                """)
+                # Persisted counters lag the recipients table after a crash (and miss the
+                # rows just failed): rebuild them before anything resumes or completes
+                await conn.execute("""
+                    UPDATE broadcasts b
+                    SET sent_count = c.sent, failed_count = c.failed
+                    FROM (
+                        SELECT r.broadcast_id,
+                               COUNT(*) FILTER (WHERE r.status = 'sent')::INT AS sent,
+                               COUNT(*) FILTER (WHERE r.status NOT IN ('pending', 'sending', 'sent'))::INT AS failed
+                        FROM broadcast_recipients r
+                        JOIN broadcasts rb ON rb.id = r.broadcast_id AND rb.status = 'running'
+                        GROUP BY r.broadcast_id
+                    ) c
+                    WHERE b.id = c.broadcast_id
+                """)
+                # Jobs whose last batch finished but never got marked complete
+                await conn.execute("""
+                    UPDATE broadcasts b
+                    SET status = 'completed', finished_at = NOW()
+                    WHERE b.status = 'running'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM broadcast_recipients r
+                        WHERE r.broadcast_id = b.id AND r.status = 'pending'
+                    )
+                """)
+                return await conn.fetch("""
+                    SELECT b.* FROM broadcasts b
+                    WHERE b.status = 'running'
+                    AND EXISTS (
+                        SELECT 1 FROM broadcast_recipients r
+                        WHERE r.broadcast_id = b.id AND r.status = 'pending'
+                    )
+                    ORDER BY b.id
+                """)
+
+    async def get_active_broadcasts(self, limit: int = 5) -> List[asyncpg.Record]:
+        return await self._pool.fetch("""
+            SELECT id, name, target_filter, status, total_target, sent_count, failed_count, started_at, finished_at
+            FROM broadcasts
+            ORDER BY id DESC
+            LIMIT $1
+        """, limit)
+
@@ -0,0 +1,195 @@
+# database/segments.py
+"""
+Audience segment registry.
+
+Every broadcaster selects its audience here instead of concatenating SQL fragments.
+Segments are fixed predicates over `users u` with named parameters, so a given
+(query shape, segment) pair always renders the same statement text and asyncpg's
+statement cache reuses the prepared plan across runs.
+
+Usage:
+    sql, args = segments.select("unpaid", "u.telegram_id, u.language")
+    async for chunk in db.iter_chunks(sql, *args): ...
+
+    counts = await segments.counts(db, "unpaid", "paid")
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+# --- Sources: the FROM clause a segment is evaluated against ---
+# "deal" is the flash-deal audience: users matched to an active product, with their survey price.
+SOURCES: Dict[str, Tuple[str, str]] = {
+    "users": ("users u", "TRUE"),
+    "deal": (
+        """users u
+        INNER JOIN products p ON
+            u.language = p.language AND u.gender = p.gender AND
+            u.level = p.level AND u.frequency = p.frequency
+        LEFT JOIN price_survey_results s ON s.user_id = u.telegram_id""",
+        "p.is_active = TRUE",
+    ),
+}
+
+# Columns available on the "deal" source (what execute_broadcast_run prices and queues)
+DEAL_COLUMNS = (
+    "u.telegram_id, u.language, u.full_name, u.gender, p.id AS p_id, "
+    "COALESCE(s.selected_price, 399) AS final_price"
+)
+
+_PAID = "EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')"
+_RECENT = "u.created_at >= NOW() - INTERVAL '3 weeks'"
+
+
+@dataclass(frozen=True)
+class Segment:
+    name: str
+    label: str
+    predicate: str              # SQL over `u` (and p/s on the deal source); {param} placeholders
+    source: str = "users"
+    params: Tuple[str, ...] = ()
+
+    def render(self, offset: int = 0, **values) -> Tuple[str, List[Any]]:
+        """Returns the predicate with $n placeholders starting after `offset`, plus its args."""
+        missing = [p for p in self.params if p not in values]
+        if missing:
+            raise ValueError(f"Segment '{self.name}' needs parameters: {', '.join(missing)}")
+        slots = {p: f"${offset + i + 1}" for i, p in enumerate(self.params)}
+        return self.predicate.format(**slots), [values[p] for p in self.params]
+
+
+_REGISTRY: Dict[str, Segment] = {}
+
+
+def register(segment: Segment) -> Segment:
+    _REGISTRY[segment.name] = segment
+    return segment
+
+
+# --- Flash deal segments (broadcast target picker) ---
+register(Segment("all", "All matched users", "TRUE", source="deal"))
+register(Segment("unpaid", "Unpaid", f"NOT {_PAID}", source="deal"))
+register(Segment("paid", "Paid", _PAID, source="deal"))
+register(Segment("test", "Admins only", "u.telegram_id = ANY({admin_ids}::BIGINT[])",
+                 source="deal", params=("admin_ids",)))
+register(Segment("recent", "Joined last 3 weeks", _RECENT, source="deal"))
+register(Segment("recent_unpaid", "Joined last 3 weeks, unpaid", f"{_RECENT} AND NOT {_PAID}", source="deal"))
+
+# --- Campaign audiences ---
+register(Segment(
+    "non_club", "All non-club members",
+    "NOT EXISTS (SELECT 1 FROM club_subscriptions sub WHERE sub.user_id = u.telegram_id AND sub.is_active = TRUE)",
+))
+register(Segment(
+    "feedback_due", "Paid 2+ days ago, no completed feedback",
+    """EXISTS (
+            SELECT 1 FROM payments p
+            WHERE p.user_id = u.telegram_id
+              AND p.status = 'approved'
+              AND COALESCE(p.approved_at, p.created_at) <= NOW() - INTERVAL '2 days'
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM product_feedback_sessions fs
+            WHERE fs.user_id = u.telegram_id
+              AND fs.campaign_key = {campaign_key}
+              AND fs.status = 'completed'
+        )""",
+    params=("campaign_key",),
+))
+register(Segment(
+    "price_survey_pending", "Unpaid, no price survey vote",
+    f"NOT {_PAID} AND NOT EXISTS (SELECT 1 FROM price_survey_results r WHERE r.user_id = u.telegram_id)",
+))
+register(Segment(
+    "club_survey_pending", "No club survey vote",
+    "NOT EXISTS (SELECT 1 FROM club_survey_results r WHERE r.user_id = u.telegram_id)",
+))
+
+
+def get(name: str) -> Segment:
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown segment '{name}'") from None
+
+
+def names(source: str = None) -> List[str]:
+    return [s.name for s in _REGISTRY.values() if source is None or s.source == source]
+
+
+# --- Query shapes ---
+def select(name: str, columns: str, order_by: str = None, **values) -> Tuple[str, List[Any]]:
+    """SELECT <columns> for a segment. Returns (sql, args) ready for fetch/iter_chunks."""
+    seg = get(name)
+    from_sql, base = SOURCES[seg.source]
+    predicate, args = seg.render(**values)
+    sql = f"SELECT {columns} FROM {from_sql} WHERE {base} AND ({predicate})"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    return sql, args
+
+
+def deal_targets(name: str, **values) -> Tuple[str, List[Any]]:
+    """Target spec for Database.apply_campaign_pricing (telegram_id, p_id, final_price, ...)."""
+    if get(name).source != "deal":
+        raise ValueError(f"Segment '{name}' is not a flash deal segment")
+    return select(name, DEAL_COLUMNS, **values)
+
+
+# --- Precomputed counts for dry runs ---
+COUNT_TTL = 60.0
+_count_cache: Dict[Tuple, Tuple[float, Dict[str, int]]] = {}
+
+
+def _cache_key(names_: Tuple[str, ...], values: Dict[str, Any]) -> Tuple:
+    frozen = tuple(sorted((k, tuple(v) if isinstance(v, (list, tuple)) else v) for k, v in values.items()))
+    return names_, frozen
+
+
+async def counts(db, *segment_names: str, refresh: bool = False, **values) -> Dict[str, int]:
+    """
+    Audience sizes for the given segments (every segment whose parameters are supplied
+    if none are named).
+    One COUNT(*) FILTER pass per source, cached for COUNT_TTL seconds so repeated
+    previews don't rescan the users table.
+    """
+    wanted = tuple(segment_names) or tuple(
+        n for n, s in _REGISTRY.items() if all(p in values for p in s.params)
+    )
+    key = _cache_key(wanted, values)
+    hit = _count_cache.get(key)
+    if hit and not refresh and time.monotonic() - hit[0] < COUNT_TTL:
+        return hit[1]
+
+    result: Dict[str, int] = {}
+    for source in dict.fromkeys(get(n).source for n in wanted):
+        filters, args = [], []
+        for i, n in enumerate(x for x in wanted if get(x).source == source):
+            predicate, seg_args = get(n).render(offset=len(args), **values)
+            args.extend(seg_args)
+            filters.append(f"COUNT(*) FILTER (WHERE {predicate})::INT AS c{i}")
+        from_sql, base = SOURCES[source]
+        row = await db._pool.fetchrow(f"SELECT {', '.join(filters)} FROM {from_sql} WHERE {base}", *args)
+        for i, n in enumerate(x for x in wanted if get(x).source == source):
+            result[n] = row[f"c{i}"]
+
+    _count_cache[key] = (time.monotonic(), result)
+    return result
+
+
+async def price_tiers(db, name: str, **values) -> Dict[int, int]:
+    """Flash deal audience grouped by the price it will be offered (survey price or 399)."""
+    sql, args = deal_targets(name, **values)
+    rows = await db._pool.fetch(
+        f"SELECT final_price::INT AS price, COUNT(*)::INT AS n FROM ({sql}) t GROUP BY 1", *args
+    )
+    return {r['price']: r['n'] for r in rows}
+
+
+async def product_price_tiers(db, name: str, **values) -> Dict[int, int]:
+    """Flash deal audience grouped by the matched product's list price (products.price)."""
+    if get(name).source != "deal":
+        raise ValueError(f"Segment '{name}' is not a flash deal segment")
+    sql, args = select(name, "p.price::INT AS price, COUNT(*)::INT AS n", **values)
+    rows = await db._pool.fetch(f"{sql} GROUP BY 1", *args)
+    return {r['price']: r['n'] for r in rows}
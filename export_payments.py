@@ -15,6 +15,7 @@ Folder layout:
   ├── 2025-01-10/
   │   ├── product_sales/
   │   │   ├── pay_42_user_123456.jpg
+  │   │   ├── pay_42_user_123456.thumb.jpg   (--proof-gallery thumbnail, built once)
   │   │   └── pay_43_user_789012.jpg
   │   ├── club_payments/
   │   │   ├── club_7_user_111222.jpg
@@ -22,10 +23,12 @@ Folder layout:
   │   └── DAILY_SUMMARY_2025-01-10.pdf
   ├── 2025-01-11/
   │   └── ...
+  ├── download_manifest.json
+  ├── export_manifest.json      (--incremental)
   └── MASTER_AUDIT.pdf
 
 Usage:
-  pip install asyncpg aiohttp aiofiles reportlab python-dotenv
+  pip install asyncpg aiohttp aiofiles reportlab pillow python-dotenv
   python export_payments.py
 
   Optional flags:
@@ -33,6 +36,18 @@ Usage:
     --to    2025-01-31   only include payments created on/before this date
     --stream sales       export only product sales  (default: both)
     --stream club        export only club payments  (default: both)
+    --concurrency 8      parallel Telegram downloads; re-runs skip proofs whose
+                         sha256 still matches payments_export/download_manifest.json
+    --render-workers N   processes rendering day PDFs while later days download
+                         (default: CPU count); the master audit is assembled from
+                         the per-day aggregates they return
+    --incremental        only re-query, re-download and re-render days whose
+                         (count, sum, max id) fingerprint changed since the last
+                         run (payments_export/export_manifest.json); the master
+                         audit is patched from the cached day aggregates
+    --proof-gallery      add a thumbnail gallery of the day's proofs to each daily
+                         PDF (thumbnails cached next to the originals); the
+                         master audit never embeds images
 """
 
 import asyncio
@@ -40,13 +55,18 @@ import asyncpg
 import aiohttp
 import aiofiles
 import argparse
+import hashlib
+import json
 import logging
 import os
 import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
 from pathlib import Path
 from dotenv import load_dotenv
+from PIL import Image as PILImage
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -54,7 +74,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm, mm
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    HRFlowable, PageBreak, KeepTogether,
+    HRFlowable, PageBreak, KeepTogether, Image,
 )
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 
@@ -67,6 +87,11 @@ DATABASE_URL = os.getenv("DATABASE_URL", "")
 BOT_TOKEN    = os.getenv("BOT_TOKEN", "")
 OUTPUT_DIR   = Path("payments_export")
 
+# --proof-gallery thumbnails in the day PDFs: longest edge in px and JPEG quality.
+# Bounds both PDF size and render memory per proof, whatever Telegram served.
+THUMB_MAX_PX  = 480
+THUMB_QUALITY = 70
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s  %(levelname)-8s  %(message)s",
@@ -335,11 +360,11 @@ def _kpi_block(kpis: list[tuple], accent_a=C_NAVY, accent_b=C_GOLD) -> Table:
     return t
 
 
-def _sales_kpi_block(payments: list[dict]) -> Table:
-    total  = sum(float(p["amount"] or 0) for p in payments)
-    count  = len(payments)
+def _sales_kpi_block(agg: dict) -> Table:
+    total  = agg["sales_revenue"]
+    count  = agg["sales_count"]
     avg    = total / count if count else 0
-    buyers = len({p["telegram_id"] for p in payments})
+    buyers = len(agg["buyers"])
     return _kpi_block([
         (f"{total:,.0f}", "ETB", "Product Sales Revenue"),
         (str(count),      "TXN", "Transactions"),
@@ -348,10 +373,10 @@ def _sales_kpi_block(payments: list[dict]) -> Table:
     ], C_NAVY, C_GOLD)
 
 
-def _club_kpi_block(club_payments: list[dict]) -> Table:
-    total   = sum(float(p["amount"] or 0) for p in club_payments)
-    count   = len(club_payments)
-    members = len({p["telegram_id"] for p in club_payments})
+def _club_kpi_block(agg: dict) -> Table:
+    total   = agg["club_revenue"]
+    count   = agg["club_count"]
+    members = len(agg["members"])
     avg     = total / count if count else 0
     return _kpi_block([
         (f"{total:,.0f}",   "ETB", "Club Subscription Revenue"),
@@ -361,13 +386,10 @@ def _club_kpi_block(club_payments: list[dict]) -> Table:
     ], C_CLUB_ACCENT, C_GOLD)
 
 
-def _combined_kpi_block(payments: list[dict], club_payments: list[dict]) -> Table:
-    p_rev  = sum(float(p["amount"] or 0) for p in payments)
-    c_rev  = sum(float(p["amount"] or 0) for p in club_payments)
-    total  = p_rev + c_rev
-    txns   = len(payments) + len(club_payments)
-    buyers = len({p["telegram_id"] for p in payments} |
-                 {p["telegram_id"] for p in club_payments})
+def _combined_kpi_block(agg: dict) -> Table:
+    total  = agg["sales_revenue"] + agg["club_revenue"]
+    txns   = agg["sales_count"] + agg["club_count"]
+    buyers = len(set(agg["buyers"]) | set(agg["members"]))
     avg    = total / txns if txns else 0
     return _kpi_block([
         (f"{total:,.0f}", "ETB", "Combined Revenue"),
@@ -558,15 +580,8 @@ def _club_table(club_payments: list[dict], s: dict) -> Table:
 # ──────────────────────────────────────────────────────────────────────────────
 # PRODUCT BREAKDOWN TABLE  (sales stream)
 # ──────────────────────────────────────────────────────────────────────────────
-def _product_breakdown_table(payments: list[dict], s: dict) -> Table:
-    totals: dict[str, dict] = {}
-    for p in payments:
-        title = p.get("product_title") or "Unknown Product"
-        if title not in totals:
-            totals[title] = {"count": 0, "revenue": 0.0}
-        totals[title]["count"]   += 1
-        totals[title]["revenue"] += float(p["amount"] or 0)
-
+def _product_breakdown_table(totals: dict[str, dict], s: dict) -> Table:
+    """totals: product title → {count, revenue} (an aggregate's "products")."""
     sorted_items = sorted(totals.items(), key=lambda x: x[1]["revenue"], reverse=True)
     grand_rev    = sum(v["revenue"] for v in totals.values())
     grand_count  = sum(v["count"]   for v in totals.values())
@@ -617,21 +632,20 @@ def _product_breakdown_table(payments: list[dict], s: dict) -> Table:
 # RECONCILIATION BOX  — dual stream aware
 # ──────────────────────────────────────────────────────────────────────────────
 def _recon_box(
-    payments: list[dict],
-    club_payments: list[dict],
+    agg: dict,
     day_str: str | None,
     s: dict,
     missing_sales: list[int] | None = None,
     missing_club:  list[int] | None = None,
 ) -> Table:
-    p_total = sum(float(p["amount"] or 0) for p in payments)
-    c_total = sum(float(p["amount"] or 0) for p in club_payments)
+    p_total = agg["sales_revenue"]
+    c_total = agg["club_revenue"]
     combined = p_total + c_total
     period   = f"for {day_str}" if day_str else "across this date range"
 
     note_text = (
         f"Combined expected credit {period}: "
-        f"{len(payments)} product sale(s) + {len(club_payments)} club subscription(s). "
+        f"{agg['sales_count']} product sale(s) + {agg['club_count']} club subscription(s). "
         "Compare this figure to your bank statement for each channel. "
         "Gap causes: manual transfers bypassing the bot, cross-date approvals, "
         "or duplicate approvals."
@@ -695,6 +709,142 @@ def _recon_box(
     return t
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# PROOF THUMBNAILS
+#   · only with --proof-gallery: the daily PDFs get a gallery, the master
+#     audit stays image-free so it scales with days, not receipts
+#   · <stem>.thumb.jpg next to each downloaded proof, rebuilt only when the
+#     original is newer, so re-exports reuse it
+#   · JPEG draft mode decodes straight at 1/2–1/8 scale, so a render worker
+#     never holds a full-resolution bitmap
+#   · the PDF embeds the thumbnail JPEG bytes as-is (no re-encode), opened
+#     lazily and released once drawn
+# ──────────────────────────────────────────────────────────────────────────────
+THUMB_SUFFIX = ".thumb.jpg"
+
+
+def make_thumbnail(src: Path) -> tuple[Path, int, int] | None:
+    """(thumbnail path, width, height) for a downloaded proof; None if it can't be decoded."""
+    thumb = src.with_name(src.stem + THUMB_SUFFIX)
+    try:
+        if thumb.exists() and thumb.stat().st_mtime >= src.stat().st_mtime:
+            with PILImage.open(thumb) as img:      # header only
+                return thumb, *img.size
+        with PILImage.open(src) as img:
+            img.draft("RGB", (THUMB_MAX_PX, THUMB_MAX_PX))
+            img = img.convert("RGB")
+            img.thumbnail((THUMB_MAX_PX, THUMB_MAX_PX), PILImage.Resampling.BICUBIC, reducing_gap=2.0)
+            tmp = thumb.with_suffix(".part")
+            img.save(tmp, format="JPEG", quality=THUMB_QUALITY, optimize=True)
+            os.replace(tmp, thumb)
+            return thumb, *img.size
+    except (OSError, PILImage.DecompressionBombError) as e:
+        log.warning("    Thumbnail failed for %s: %s", src.name, e)
+        return None
+
+
+def build_proof_thumbs(
+    payments:      list[dict],
+    club_payments: list[dict],
+    sale_shots:    dict[int, Path | None],
+    club_shots:    dict[int, Path | None],
+) -> list[dict]:
+    """One entry per available proof: label, stream, thumbnail path relative to OUTPUT_DIR, size."""
+    items = (
+        [("sales", f"Sale #{p['payment_id']}", sale_shots.get(p["payment_id"])) for p in payments]
+        + [("club", f"Club #{p['club_payment_id']}", club_shots.get(p["club_payment_id"])) for p in club_payments]
+    )
+    proofs = []
+    for stream, label, shot in items:
+        thumb = make_thumbnail(shot) if shot else None
+        if thumb:
+            path, w, h = thumb
+            proofs.append({"stream": stream, "label": label,
+                           "path": path.relative_to(OUTPUT_DIR).as_posix(), "w": w, "h": h})
+    return proofs
+
+
+def _proof_gallery(proofs: list[dict], root: Path, s: dict, per_row: int = 4) -> Table:
+    """Grid of proof thumbnails with captions; each image is scaled into a fixed cell."""
+    cell_w = (A4[0] - 36*mm) / per_row
+    max_w, max_h = cell_w - 0.4*cm, cell_w * 1.4
+
+    cells = []
+    for proof in proofs:
+        scale = min(max_w / proof["w"], max_h / proof["h"])
+        cells.append([
+            Image(str(root / proof["path"]), width=proof["w"] * scale,
+                  height=proof["h"] * scale, lazy=2),
+            Paragraph(proof["label"], s["td_c"]),
+        ])
+    cells += [""] * (-len(cells) % per_row)
+    rows = [cells[i:i + per_row] for i in range(0, len(cells), per_row)]
+
+    t = Table(rows, colWidths=[cell_w] * per_row)
+    t.setStyle(TableStyle([
+        ("GRID",          (0, 0), (-1, -1), 0.3, C_RULE),
+        ("ALIGN",         (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN",        (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING",    (0, 0), (-1, -1), 4),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+    ]))
+    return t
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# DAY AGGREGATES — what a render worker hands back for the master audit
+# ──────────────────────────────────────────────────────────────────────────────
+CLUB_ROW_FIELDS = ("club_payment_id", "amount", "proof_file_id", "created_at",
+                   "processed_at", "processed_by", "full_name", "username")
+
+
+def aggregate_day(
+    day_str:       str,
+    payments:      list[dict],
+    club_payments: list[dict],
+    sale_shots:    dict[int, Path | None],
+    club_shots:    dict[int, Path | None],
+) -> dict:
+    products: dict[str, dict] = {}
+    for p in payments:
+        title = p.get("product_title") or "Unknown Product"
+        if title not in products:
+            products[title] = {"count": 0, "revenue": 0.0}
+        products[title]["count"]   += 1
+        products[title]["revenue"] += float(p["amount"] or 0)
+
+    return {
+        "day":           day_str,
+        "sales_count":   len(payments),
+        "sales_revenue": sum(float(p["amount"] or 0) for p in payments),
+        "club_count":    len(club_payments),
+        "club_revenue":  sum(float(p["amount"] or 0) for p in club_payments),
+        "buyers":        sorted({p["telegram_id"] for p in payments}),
+        "members":       sorted({p["telegram_id"] for p in club_payments}),
+        "products":      products,
+        # The master audit lists every club payment; only the columns it prints travel back
+        "club_rows":     [{k: p.get(k) for k in CLUB_ROW_FIELDS} for p in club_payments],
+        "missing_sales": [p["payment_id"]      for p in payments      if not sale_shots.get(p["payment_id"])],
+        "missing_club":  [p["club_payment_id"] for p in club_payments if not club_shots.get(p["club_payment_id"])],
+    }
+
+
+def merge_aggregates(aggregates: list[dict]) -> dict:
+    merged = {"sales_count": 0, "sales_revenue": 0.0, "club_count": 0, "club_revenue": 0.0,
+              "buyers": set(), "members": set(), "products": {}, "club_rows": []}
+    for a in sorted(aggregates, key=lambda a: a["day"]):
+        for key in ("sales_count", "sales_revenue", "club_count", "club_revenue"):
+            merged[key] += a[key]
+        merged["buyers"].update(a["buyers"])
+        merged["members"].update(a["members"])
+        merged["club_rows"].extend(a["club_rows"])
+        for title, t in a["products"].items():
+            slot = merged["products"].setdefault(title, {"count": 0, "revenue": 0.0})
+            slot["count"]   += t["count"]
+            slot["revenue"] += t["revenue"]
+    return merged
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # PER-DAY PDF
 # ──────────────────────────────────────────────────────────────────────────────
@@ -703,15 +853,15 @@ def generate_day_pdf(
     payments:         list[dict],
     club_payments:    list[dict],
     folder:           Path,
-    sale_shots:       dict[int, Path | None],
-    club_shots:       dict[int, Path | None],
+    agg:              dict,
+    proofs:           list[dict] | None = None,
 ) -> Path:
     pdf_path = folder / f"DAILY_SUMMARY_{day_str}.pdf"
     s = _styles()
     story = []
 
-    total_sales = sum(float(p["amount"] or 0) for p in payments)
-    total_club  = sum(float(p["amount"] or 0) for p in club_payments)
+    total_sales = agg["sales_revenue"]
+    total_club  = agg["club_revenue"]
     total_all   = total_sales + total_club
 
     # ── Title block ───────────────────────────────────────────────────────────
@@ -737,7 +887,7 @@ def generate_day_pdf(
         "Aggregated metrics across both revenue streams for this day.",
         s,
     )
-    story.append(_combined_kpi_block(payments, club_payments))
+    story.append(_combined_kpi_block(agg))
     story.append(Spacer(1, 0.25*cm))
 
     # Revenue split bar
@@ -759,7 +909,7 @@ def generate_day_pdf(
             "Revenue and transaction summary for product sales on this day.",
             s, accent=C_NAVY_MID,
         )
-        story.append(_sales_kpi_block(payments))
+        story.append(_sales_kpi_block(agg))
         story += _section(
             "Sales Transaction Register",
             "All approved product sale payments, ordered chronologically. "
@@ -772,7 +922,7 @@ def generate_day_pdf(
             "Sales breakdown across active products for this day.",
             s, accent=C_NAVY_MID,
         )
-        story.append(_product_breakdown_table(payments, s))
+        story.append(_product_breakdown_table(agg["products"], s))
     else:
         story.append(Spacer(1, 0.2*cm))
         story.append(Paragraph("No approved product sales on this day.", s["note"]))
@@ -792,7 +942,7 @@ def generate_day_pdf(
             "Revenue and subscription summary for the club on this day.",
             s, accent=C_CLUB_ACCENT,
         )
-        story.append(_club_kpi_block(club_payments))
+        story.append(_club_kpi_block(agg))
         story += _section(
             "Club Subscription Register",
             "All approved club payment entries, ordered chronologically. "
@@ -804,35 +954,60 @@ def generate_day_pdf(
         story.append(Spacer(1, 0.2*cm))
         story.append(Paragraph("No approved club subscriptions on this day.", s["note"]))
 
+    # ── Proof gallery ─────────────────────────────────────────────────────────
+    if proofs:
+        story += _section(
+            "Proof Gallery",
+            f"Thumbnails of the {len(proofs)} proof screenshot(s) on file; "
+            "full-resolution originals are in the stream folders.",
+            s,
+        )
+        story.append(_proof_gallery(proofs, OUTPUT_DIR, s))
+
     # ── Reconciliation ────────────────────────────────────────────────────────
     story.append(Spacer(1, 0.5*cm))
     story.append(_hr(C_RULE))
     story.append(Spacer(1, 0.3*cm))
-    missing_sales = [p["payment_id"]      for p in payments      if not sale_shots.get(p["payment_id"])]
-    missing_club  = [p["club_payment_id"] for p in club_payments if not club_shots.get(p["club_payment_id"])]
-    story.append(_recon_box(payments, club_payments, day_str, s, missing_sales, missing_club))
+    story.append(_recon_box(agg, day_str, s, agg["missing_sales"], agg["missing_club"]))
 
     _build_doc(pdf_path, story)
     log.info("  Daily PDF saved: %s", pdf_path.name)
     return pdf_path
 
 
+def render_day(
+    day_str:       str,
+    payments:      list[dict],
+    club_payments: list[dict],
+    folder:        Path,
+    sale_shots:    dict[int, Path | None],
+    club_shots:    dict[int, Path | None],
+    gallery:       bool = False,
+) -> dict:
+    """Render-pool entry point (module level so it pickles): day PDF + the day's aggregate."""
+    agg = aggregate_day(day_str, payments, club_payments, sale_shots, club_shots)
+    proofs = build_proof_thumbs(payments, club_payments, sale_shots, club_shots) if gallery else None
+    generate_day_pdf(day_str, payments, club_payments, folder, agg, proofs)
+    return agg
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # MASTER AUDIT PDF
 # ──────────────────────────────────────────────────────────────────────────────
 def generate_master_pdf(
-    all_payments:      list[dict],
-    all_club_payments: list[dict],
-    output_dir:        Path,
-    date_from:         date | None,
-    date_to:           date | None,
+    day_aggregates: list[dict],
+    output_dir:     Path,
+    date_from:      date | None,
+    date_to:        date | None,
 ) -> Path:
+    """Built from the per-day aggregates the render workers returned — no payment rows needed."""
     pdf_path = output_dir / "MASTER_AUDIT.pdf"
     s = _styles()
     story = []
 
-    total_sales = sum(float(p["amount"] or 0) for p in all_payments)
-    total_club  = sum(float(p["amount"] or 0) for p in all_club_payments)
+    agg         = merge_aggregates(day_aggregates)
+    total_sales = agg["sales_revenue"]
+    total_club  = agg["club_revenue"]
     total_all   = total_sales + total_club
     dr          = f"{date_from or 'All Time'}  →  {date_to or 'Today'}"
 
@@ -845,8 +1020,8 @@ def generate_master_pdf(
     ))
     story.append(Paragraph(
         f"Date range: {dr}  ·  "
-        f"Sales records: {len(all_payments)}  ·  "
-        f"Club records: {len(all_club_payments)}  ·  "
+        f"Sales records: {agg['sales_count']}  ·  "
+        f"Club records: {agg['club_count']}  ·  "
         f"Exported: {datetime.now().strftime('%d %B %Y, %H:%M')}",
         s["doc_meta"],
     ))
@@ -859,24 +1034,12 @@ def generate_master_pdf(
         "Aggregated metrics across both revenue streams for the full date range.",
         s,
     )
-    story.append(_combined_kpi_block(all_payments, all_club_payments))
+    story.append(_combined_kpi_block(agg))
     story.append(Spacer(1, 0.25*cm))
     story += _revenue_split_bar(total_sales, total_club)
     story.append(Spacer(1, 0.3*cm))
 
     # ── Day-by-Day Combined Summary ───────────────────────────────────────────
-    by_day_sales: dict[str, list] = defaultdict(list)
-    by_day_club:  dict[str, list] = defaultdict(list)
-
-    for p in all_payments:
-        day = p["created_at"].strftime("%Y-%m-%d") if p.get("created_at") else "unknown"
-        by_day_sales[day].append(p)
-    for p in all_club_payments:
-        day = p["created_at"].strftime("%Y-%m-%d") if p.get("created_at") else "unknown"
-        by_day_club[day].append(p)
-
-    all_days = sorted(set(by_day_sales) | set(by_day_club))
-
     story += _section(
         "Day-by-Day Combined Summary",
         "Both streams aggregated per day — sales revenue + club revenue + combined running total.",
@@ -889,17 +1052,15 @@ def generate_master_pdf(
     rows = [[Paragraph(h, s["th"]) for h in headers]]
 
     running = 0.0
-    for day in all_days:
-        dp  = by_day_sales.get(day, [])
-        cp  = by_day_club.get(day, [])
-        s_r = sum(float(p["amount"] or 0) for p in dp)
-        c_r = sum(float(p["amount"] or 0) for p in cp)
+    for a in sorted(day_aggregates, key=lambda a: a["day"]):
+        s_r = a["sales_revenue"]
+        c_r = a["club_revenue"]
         day_total = s_r + c_r
         running  += day_total
         rows.append([
-            Paragraph(day,              s["td_c"]),
-            Paragraph(str(len(dp)),     s["td_c"]),
-            Paragraph(str(len(cp)),     s["td_c"]),
+            Paragraph(a["day"],              s["td_c"]),
+            Paragraph(str(a["sales_count"]), s["td_c"]),
+            Paragraph(str(a["club_count"]),  s["td_c"]),
             Paragraph(f"{s_r:,.2f}",   s["td_money"]),
             Paragraph(f"{c_r:,.2f}",   s["td_money_club"]),
             Paragraph(f"{day_total:,.2f}", ParagraphStyle(
@@ -913,8 +1074,8 @@ def generate_master_pdf(
     # Grand total row
     rows.append([
         Paragraph("GRAND TOTAL",             s["total_label"]),
-        Paragraph(str(len(all_payments)),    s["total_val"]),
-        Paragraph(str(len(all_club_payments)), s["total_val_club"]),
+        Paragraph(str(agg["sales_count"]),   s["total_val"]),
+        Paragraph(str(agg["club_count"]),    s["total_val_club"]),
         Paragraph(f"{total_sales:,.2f}",     s["total_val"]),
         Paragraph(f"{total_club:,.2f}",      s["total_val_club"]),
         Paragraph(f"{total_all:,.2f}",       s["total_val"]),
@@ -957,7 +1118,7 @@ def generate_master_pdf(
         "Revenue contribution and sales volume per product across the full date range.",
         s, accent=C_NAVY_MID,
     )
-    story.append(_product_breakdown_table(all_payments, s))
+    story.append(_product_breakdown_table(agg["products"], s))
 
     # ── Page break → Stream B deep-dive ──────────────────────────────────────
     story.append(PageBreak())
@@ -970,13 +1131,13 @@ def generate_master_pdf(
         "Full list of all approved club payments across the date range.",
         s, accent=C_CLUB_ACCENT,
     )
-    story.append(_club_table(all_club_payments, s))
+    story.append(_club_table(agg["club_rows"], s))
 
     # ── Reconciliation ────────────────────────────────────────────────────────
     story.append(Spacer(1, 0.6*cm))
     story.append(_hr(C_RULE))
     story.append(Spacer(1, 0.3*cm))
-    story.append(_recon_box(all_payments, all_club_payments, None, s))
+    story.append(_recon_box(agg, None, s))
 
     _build_doc(pdf_path, story)
     log.info("Master audit PDF saved: %s", pdf_path)
@@ -986,10 +1147,15 @@ def generate_master_pdf(
 # ──────────────────────────────────────────────────────────────────────────────
 # DATABASE QUERIES
 # ──────────────────────────────────────────────────────────────────────────────
+# Day bucket as main() groups rows (asyncpg hands timestamptz back in UTC)
+EXPORT_DAY = "({alias}.created_at AT TIME ZONE 'UTC')::date"
+
+
 async def fetch_approved_sales(
     conn: asyncpg.Connection,
     date_from: date | None,
     date_to:   date | None,
+    days:      list[date] | None = None,
 ) -> list[dict]:
     clauses = ["p.status = 'approved'"]
     params: list = []
@@ -1000,6 +1166,9 @@ async def fetch_approved_sales(
     if date_to:
         params.append(date_to)
         clauses.append(f"p.created_at::date <= ${len(params)}")
+    if days is not None:
+        params.append(days)
+        clauses.append(f"{EXPORT_DAY.format(alias='p')} = ANY(${len(params)}::date[])")
 
     query = f"""
         SELECT
@@ -1030,6 +1199,7 @@ async def fetch_approved_club(
     conn: asyncpg.Connection,
     date_from: date | None,
     date_to:   date | None,
+    days:      list[date] | None = None,
 ) -> list[dict]:
     clauses = ["cp.status = 'approved'"]
     params: list = []
@@ -1040,6 +1210,9 @@ async def fetch_approved_club(
     if date_to:
         params.append(date_to)
         clauses.append(f"cp.created_at::date <= ${len(params)}")
+    if days is not None:
+        params.append(days)
+        clauses.append(f"{EXPORT_DAY.format(alias='cp')} = ANY(${len(params)}::date[])")
 
     query = f"""
         SELECT
@@ -1066,79 +1239,227 @@ async def fetch_approved_club(
     return [dict(r) for r in rows]
 
 
+async def fetch_day_fingerprints(
+    conn:      asyncpg.Connection,
+    stream:    str,                 # "sales" | "club"
+    date_from: date | None,
+    date_to:   date | None,
+) -> dict[str, list]:
+    """day → [row count, amount sum, max id] over exactly the rows the full fetch would return."""
+    alias, source = ("p", """
+        FROM  payments p
+        JOIN  users    u  ON u.telegram_id = p.user_id
+        JOIN  products pr ON pr.id         = p.product_id
+    """) if stream == "sales" else ("cp", """
+        FROM  club_payments   cp
+        LEFT  JOIN users      u  ON u.telegram_id = cp.user_id
+        LEFT  JOIN club_subscriptions cs ON cs.user_id = cp.user_id
+    """)
+    clauses = [f"{alias}.status = 'approved'"]
+    params: list = []
+    if date_from:
+        params.append(date_from)
+        clauses.append(f"{alias}.created_at::date >= ${len(params)}")
+    if date_to:
+        params.append(date_to)
+        clauses.append(f"{alias}.created_at::date <= ${len(params)}")
+
+    day = EXPORT_DAY.format(alias=alias)
+    rows = await conn.fetch(f"""
+        SELECT {day} AS day, COUNT(*) AS n, COALESCE(SUM({alias}.amount), 0) AS total, MAX({alias}.id) AS max_id
+        {source}
+        WHERE {" AND ".join(clauses)}
+        GROUP BY 1
+    """, *params)
+    return {
+        (r["day"].isoformat() if r["day"] else "unknown"): [r["n"], str(r["total"]), r["max_id"]]
+        for r in rows
+    }
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # TELEGRAM FILE DOWNLOAD
+#   · one getFile per proof (the file_path also gives the extension)
+#   · bounded concurrency, streamed to disk in chunks via a .part file
+#   · 429s honour Telegram's retry_after for every request (shared cooldown)
+#   · download_manifest.json keeps sha256 + size per proof; re-runs skip files
+#     that still match instead of touching Telegram at all
 # ──────────────────────────────────────────────────────────────────────────────
-async def _get_file_url(session: aiohttp.ClientSession, file_id: str) -> str | None:
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getFile"
-    try:
-        async with session.get(
-            url,
-            params={"file_id": file_id},
-            timeout=aiohttp.ClientTimeout(total=15),
-        ) as resp:
-            data = await resp.json()
-            if data.get("ok") and data["result"].get("file_path"):
-                return (
-                    f"https://api.telegram.org/file/bot{BOT_TOKEN}/"
-                    f"{data['result']['file_path']}"
-                )
-    except Exception as e:
-        log.warning("getFile failed (%s): %s", file_id[:20], e)
-    return None
+MANIFEST_NAME = "download_manifest.json"
+CHUNK_SIZE    = 64 * 1024
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DownloadManifest:
+    """sha256 + size of every proof on disk, keyed by its path (without extension) under OUTPUT_DIR."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict] = json.loads(path.read_text()) if path.exists() else {}
+        self._unsaved = 0
+
+    async def verified(self, key: str, folder: Path, file_id: str) -> Path | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry.get("file_id") != file_id:
+                return None          # proof was replaced: fetch the new one
+            dest = folder / entry["file"]
+            if (dest.exists() and dest.stat().st_size == entry["size"]
+                    and await asyncio.to_thread(_sha256, dest) == entry["sha256"]):
+                return dest
+            return None
+        # Proofs from exports that predate the manifest are adopted as they are
+        stem = key.rsplit("/", 1)[-1]
+        for dest in folder.glob(f"{stem}.*"):
+            if dest.suffix != ".part" and not dest.name.endswith(THUMB_SUFFIX):
+                self.record(key, dest, file_id, await asyncio.to_thread(_sha256, dest))
+                return dest
+        return None
 
+    def record(self, key: str, dest: Path, file_id: str, sha256: str):
+        self.entries[key] = {"file": dest.name, "file_id": file_id,
+                             "sha256": sha256, "size": dest.stat().st_size}
+        self._unsaved += 1
+        if self._unsaved >= 25:
+            self.save()
 
-async def _download_file(
-    session:      aiohttp.ClientSession,
-    file_id:      str,
-    dest:         Path,
-    label:        str,
-) -> Path | None:
-    if dest.exists():
-        log.info("    Already exists: %s", dest.name)
-        return dest
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+        self._unsaved = 0
+
+
+class ProofDownloader:
+    def __init__(self, session: aiohttp.ClientSession, manifest: DownloadManifest,
+                 concurrency: int = 8, max_attempts: int = 5):
+        self.session      = session
+        self.manifest     = manifest
+        self.max_attempts = max_attempts
+        self._sem         = asyncio.Semaphore(concurrency)
+        self._cooldown    = 0.0     # loop time until which Telegram asked us to back off
+        self.stats        = {"downloaded": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+    async def _wait_cooldown(self):
+        delay = self._cooldown - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _back_off(self, attempt: int, retry_after: float | None, label: str):
+        delay = float(retry_after) if retry_after else min(30.0, 2 ** attempt)
+        if retry_after:
+            # Rate limits are per bot: every in-flight request waits, not just this one
+            self._cooldown = max(self._cooldown, asyncio.get_running_loop().time() + delay)
+            log.warning("    Telegram rate limit on %s — retry after %.0fs", label, delay)
+        return delay
+
+    async def _file_path(self, file_id: str, label: str) -> str | None:
+        url = f"https://api.telegram.org/bot{BOT_TOKEN}/getFile"
+        for attempt in range(self.max_attempts):
+            await self._wait_cooldown()
+            retry_after = None
+            try:
+                async with self.session.get(
+                    url, params={"file_id": file_id}, timeout=aiohttp.ClientTimeout(total=15),
+                ) as resp:
+                    data = await resp.json(content_type=None)
+                    status = resp.status
+                if data.get("ok") and data["result"].get("file_path"):
+                    return data["result"]["file_path"]
+                retry_after = (data.get("parameters") or {}).get("retry_after")
+                if status != 429 and status < 500 and not retry_after:
+                    log.warning("getFile failed (%s): %s", label, data.get("description"))
+                    return None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                log.warning("getFile failed (%s), attempt %d: %s", label, attempt + 1, e)
+            await asyncio.sleep(self._back_off(attempt, retry_after, label))
+        return None
 
-    url = await _get_file_url(session, file_id)
-    if not url:
-        log.warning("    Could not resolve Telegram URL for %s", label)
+    async def _stream_to(self, file_path: str, dest: Path, label: str) -> str | None:
+        """Streams the file into dest (via .part) and returns its sha256."""
+        url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file_path}"
+        part = dest.with_name(dest.name + ".part")
+        for attempt in range(self.max_attempts):
+            await self._wait_cooldown()
+            retry_after = None
+            try:
+                async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=None, sock_read=30)) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        retry_after = resp.headers.get("Retry-After")
+                        raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status)
+                    resp.raise_for_status()
+                    h = hashlib.sha256()
+                    async with aiofiles.open(part, "wb") as f:
+                        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                            h.update(chunk)
+                            await f.write(chunk)
+                os.replace(part, dest)
+                return h.hexdigest()
+            except aiohttp.ClientResponseError as e:
+                if e.status != 429 and e.status < 500:
+                    log.error("    ✗ Download failed for %s: %s", label, e)
+                    break
+                log.warning("    Download of %s failed, attempt %d: HTTP %s", label, attempt + 1, e.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                log.warning("    Download of %s failed, attempt %d: %s", label, attempt + 1, e)
+            await asyncio.sleep(self._back_off(attempt, retry_after, label))
+        part.unlink(missing_ok=True)
         return None
 
-    try:
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-            resp.raise_for_status()
-            async with aiofiles.open(dest, "wb") as f:
-                await f.write(await resp.read())
+    async def download(self, file_id: str, folder: Path, stem: str, label: str) -> Path | None:
+        key = f"{folder.relative_to(OUTPUT_DIR).as_posix()}/{stem}"
+        async with self._sem:
+            dest = await self.manifest.verified(key, folder, file_id)
+            if dest is not None:
+                self.stats["skipped"] += 1
+                return dest
+
+            file_path = await self._file_path(file_id, label)
+            if not file_path:
+                log.warning("    Could not resolve Telegram URL for %s", label)
+                self.stats["failed"] += 1
+                return None
+
+            name = file_path.rsplit("/", 1)[-1]
+            ext  = name.rsplit(".", 1)[-1].lower() if "." in name else "jpg"
+            dest = folder / f"{stem}.{ext}"
+            sha256 = await self._stream_to(file_path, dest, label)
+            if sha256 is None:
+                self.stats["failed"] += 1
+                return None
+
+        self.manifest.record(key, dest, file_id, sha256)
+        self.stats["downloaded"] += 1
+        self.stats["bytes"] += dest.stat().st_size
         log.info("    ✓ %s", dest.name)
         return dest
-    except Exception as e:
-        log.error("    ✗ Download failed for %s: %s", label, e)
-        return None
 
 
 async def download_sale_screenshot(
-    session:  aiohttp.ClientSession,
-    payment:  dict,
-    folder:   Path,          # .../2025-01-10/product_sales/
+    downloader: ProofDownloader,
+    payment:    dict,
+    folder:     Path,          # .../2025-01-10/product_sales/
 ) -> Path | None:
     file_id = payment.get("proof_file_id")
     if not file_id:
         log.warning("  Sale #%s — no proof_file_id.", payment["payment_id"])
         return None
-
-    url_stub = await _get_file_url(session, file_id)
-    ext = "jpg"
-    if url_stub and "." in url_stub.rsplit("/", 1)[-1]:
-        ext = url_stub.rsplit(".", 1)[-1].lower()
-
-    dest = folder / f"sale_{payment['payment_id']}_user_{payment['telegram_id']}.{ext}"
-    return await _download_file(
-        session, file_id, dest,
+    return await downloader.download(
+        file_id, folder,
+        f"sale_{payment['payment_id']}_user_{payment['telegram_id']}",
         f"sale #{payment['payment_id']}",
     )
 
 
 async def download_club_screenshot(
-    session:       aiohttp.ClientSession,
+    downloader:    ProofDownloader,
     club_payment:  dict,
     folder:        Path,     # .../2025-01-10/club_payments/
 ) -> Path | None:
@@ -1146,49 +1467,127 @@ async def download_club_screenshot(
     if not file_id:
         log.warning("  Club #%s — no proof_file_id.", club_payment["club_payment_id"])
         return None
-
-    url_stub = await _get_file_url(session, file_id)
-    ext = "jpg"
-    if url_stub and "." in url_stub.rsplit("/", 1)[-1]:
-        ext = url_stub.rsplit(".", 1)[-1].lower()
-
-    dest = folder / (
-        f"club_{club_payment['club_payment_id']}_user_{club_payment['telegram_id']}.{ext}"
-    )
-    return await _download_file(
-        session, file_id, dest,
+    return await downloader.download(
+        file_id, folder,
+        f"club_{club_payment['club_payment_id']}_user_{club_payment['telegram_id']}",
         f"club #{club_payment['club_payment_id']}",
     )
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# INCREMENTAL EXPORT MANIFEST  (--incremental)
+#   export_manifest.json: per day, the row fingerprint of each stream
+#   ([count, amount sum, max id]) and the aggregate its day PDF was built from.
+#   Unchanged days are neither re-queried, re-downloaded nor re-rendered; the
+#   master audit is rebuilt from their cached aggregates.
+# ──────────────────────────────────────────────────────────────────────────────
+EXPORT_MANIFEST_NAME = "export_manifest.json"
+
+
+def _restore_aggregate(agg: dict) -> dict:
+    """JSON round-trip turned datetimes into strings; the club register formats them again."""
+    for row in agg["club_rows"]:
+        for key in ("created_at", "processed_at"):
+            if isinstance(row.get(key), str):
+                row[key] = datetime.fromisoformat(row[key])
+    return agg
+
+
+class ExportManifest:
+    def __init__(self, path: Path, stream: str, gallery: bool = False):
+        self.path = path
+        data = json.loads(path.read_text()) if path.exists() else {}
+        # A different --stream / --proof-gallery renders different day PDFs: nothing cached is reusable
+        same = data.get("stream") == stream and data.get("proof_gallery", False) == gallery
+        self.days: dict[str, dict] = data.get("days", {}) if same else {}
+        self.stream = stream
+        self.gallery = gallery
+        self.master_range = data.get("master_range")
+
+    def stale(self, day: str, fingerprint: dict) -> bool:
+        entry = self.days.get(day)
+        return (
+            entry is None
+            or entry["fingerprint"] != fingerprint
+            or not (OUTPUT_DIR / day / f"DAILY_SUMMARY_{day}.pdf").exists()
+        )
+
+    def aggregate(self, day: str) -> dict:
+        return _restore_aggregate(self.days[day]["aggregate"])
+
+    def store(self, day: str, fingerprint: dict, agg: dict):
+        self.days[day] = {"fingerprint": fingerprint, "aggregate": agg}
+
+    def forget(self, day: str):
+        self.days.pop(day, None)
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(
+            {"stream": self.stream, "proof_gallery": self.gallery,
+             "master_range": self.master_range, "days": self.days},
+            default=str, sort_keys=True,
+        ))
+        os.replace(tmp, self.path)
+
+
+async def fetch_fingerprints(
+    conn:      asyncpg.Connection,
+    stream:    str,
+    date_from: date | None,
+    date_to:   date | None,
+) -> dict[str, dict]:
+    """day → {"sales": [n, sum, max id] | None, "club": ... | None} for the exported streams."""
+    sales = await fetch_day_fingerprints(conn, "sales", date_from, date_to) if stream in ("both", "sales") else {}
+    club  = await fetch_day_fingerprints(conn, "club",  date_from, date_to) if stream in ("both", "club")  else {}
+    return {day: {"sales": sales.get(day), "club": club.get(day)} for day in set(sales) | set(club)}
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # MAIN
 # ──────────────────────────────────────────────────────────────────────────────
-async def main(date_from: date | None, date_to: date | None, stream: str):
+async def main(date_from: date | None, date_to: date | None, stream: str,
+               concurrency: int = 8, render_workers: int | None = None, incremental: bool = False,
+               proof_gallery: bool = False):
     if not DATABASE_URL:
         log.error("DATABASE_URL not set in .env"); sys.exit(1)
     if not BOT_TOKEN:
         log.error("BOT_TOKEN not set in .env"); sys.exit(1)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    render_workers = render_workers or os.cpu_count() or 1
 
     log.info("Connecting to database …")
     conn = await asyncpg.connect(DATABASE_URL)
     try:
         all_payments      = []
         all_club_payments = []
-
-        if stream in ("both", "sales"):
-            all_payments = await fetch_approved_sales(conn, date_from, date_to)
+        fetch_days: list[date] | None = None     # None = every day in range
+
+        if incremental:
+            export_manifest = ExportManifest(OUTPUT_DIR / EXPORT_MANIFEST_NAME, stream, proof_gallery)
+            fingerprints = await fetch_fingerprints(conn, stream, date_from, date_to)
+            stale = sorted(d for d, fp in fingerprints.items() if export_manifest.stale(d, fp))
+            in_range = lambda d: ((not date_from or d >= str(date_from))
+                                  and (not date_to or d <= str(date_to)))
+            removed = [d for d in export_manifest.days if in_range(d) and d not in fingerprints]
+            for d in removed:
+                export_manifest.forget(d)
+            fetch_days = [date.fromisoformat(d) for d in stale if d != "unknown"]
+            log.info("  Incremental: %d day(s) changed, %d unchanged, %d emptied",
+                     len(stale), len(fingerprints) - len(stale), len(removed))
+
+        if stream in ("both", "sales") and fetch_days != []:
+            all_payments = await fetch_approved_sales(conn, date_from, date_to, fetch_days)
             log.info("  Stream A (product sales)  : %d records", len(all_payments))
 
-        if stream in ("both", "club"):
-            all_club_payments = await fetch_approved_club(conn, date_from, date_to)
+        if stream in ("both", "club") and fetch_days != []:
+            all_club_payments = await fetch_approved_club(conn, date_from, date_to, fetch_days)
             log.info("  Stream B (club payments)  : %d records", len(all_club_payments))
     finally:
         await conn.close()
 
-    if not all_payments and not all_club_payments:
+    if not incremental and not all_payments and not all_club_payments:
         log.warning("No approved payments found in either stream. Nothing to export.")
         return
 
@@ -1204,63 +1603,107 @@ async def main(date_from: date | None, date_to: date | None, stream: str):
         by_day_club[day].append(p)
 
     all_days = sorted(set(by_day_sales) | set(by_day_club))
-    log.info("Days to process: %s", ", ".join(all_days))
-
-    # ── Per-day processing ───────────────────────────────────────────────────
-    async with aiohttp.ClientSession() as session:
-        for day in all_days:
-            day_sales = by_day_sales.get(day, [])
-            day_club  = by_day_club.get(day, [])
-
-            day_folder   = OUTPUT_DIR / day
-            sales_folder = day_folder / "product_sales"
-            club_folder  = day_folder / "club_payments"
-
-            day_folder.mkdir(parents=True, exist_ok=True)
-            if day_sales: sales_folder.mkdir(parents=True, exist_ok=True)
-            if day_club:  club_folder.mkdir(parents=True, exist_ok=True)
-
-            log.info("── %s  (sales: %d  |  club: %d) ──",
-                     day, len(day_sales), len(day_club))
-
-            # Download sale screenshots → product_sales/
-            sale_shots: dict[int, Path | None] = {}
-            for p in day_sales:
-                sale_shots[p["payment_id"]] = await download_sale_screenshot(
-                    session, p, sales_folder,
-                )
+    log.info("Days to process: %s", ", ".join(all_days) or "none")
 
-            # Download club screenshots → club_payments/
-            club_shots: dict[int, Path | None] = {}
-            for p in day_club:
-                club_shots[p["club_payment_id"]] = await download_club_screenshot(
-                    session, p, club_folder,
-                )
+    # ── Downloads: every day at once, bounded by --concurrency ──────────────
+    manifest = DownloadManifest(OUTPUT_DIR / MANIFEST_NAME)
 
-            generate_day_pdf(
-                day, day_sales, day_club,
-                day_folder, sale_shots, club_shots,
-            )
+    async def download_day(day: str, downloader: ProofDownloader):
+        day_sales = by_day_sales.get(day, [])
+        day_club  = by_day_club.get(day, [])
 
-    # ── Master audit ─────────────────────────────────────────────────────────
-    log.info("Generating master audit PDF …")
-    generate_master_pdf(all_payments, all_club_payments, OUTPUT_DIR, date_from, date_to)
+        day_folder   = OUTPUT_DIR / day
+        sales_folder = day_folder / "product_sales"
+        club_folder  = day_folder / "club_payments"
+
+        day_folder.mkdir(parents=True, exist_ok=True)
+        if day_sales: sales_folder.mkdir(parents=True, exist_ok=True)
+        if day_club:  club_folder.mkdir(parents=True, exist_ok=True)
+
+        # Download sale screenshots → product_sales/, club screenshots → club_payments/
+        sale_paths, club_paths = await asyncio.gather(
+            asyncio.gather(*(download_sale_screenshot(downloader, p, sales_folder) for p in day_sales)),
+            asyncio.gather(*(download_club_screenshot(downloader, p, club_folder) for p in day_club)),
+        )
+        sale_shots: dict[int, Path | None] = {
+            p["payment_id"]: path for p, path in zip(day_sales, sale_paths)
+        }
+        club_shots: dict[int, Path | None] = {
+            p["club_payment_id"]: path for p, path in zip(day_club, club_paths)
+        }
+        log.info("── %s  (sales: %d  |  club: %d) downloaded ──",
+                 day, len(day_sales), len(day_club))
+        return sale_shots, club_shots
+
+    # ── Day PDFs: rendered in a process pool as soon as a day's proofs are in,
+    #    while downloads for later days keep running ──────────────────────────
+    loop = asyncio.get_running_loop()
+
+    async def export_day(day: str, downloader: ProofDownloader, pool: ProcessPoolExecutor) -> dict:
+        sale_shots, club_shots = await download_day(day, downloader)
+        return await loop.run_in_executor(
+            pool, render_day,
+            day, by_day_sales.get(day, []), by_day_club.get(day, []),
+            OUTPUT_DIR / day, sale_shots, club_shots, proof_gallery,
+        )
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    with ProcessPoolExecutor(max_workers=render_workers) as pool:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            downloader = ProofDownloader(session, manifest, concurrency)
+            try:
+                aggregates = await asyncio.gather(
+                    *(export_day(day, downloader, pool) for day in all_days)
+                )
+            finally:
+                manifest.save()
+    elapsed = time.perf_counter() - started
+    st = downloader.stats
+    log.info("Proofs: %d downloaded (%.1f MB), %d verified & skipped, %d failed · "
+             "%d day PDFs on %d workers · %.1fs",
+             st["downloaded"], st["bytes"] / 1e6, st["skipped"], st["failed"],
+             len(aggregates), render_workers, elapsed)
+
+    if incremental:
+        for agg in aggregates:
+            export_manifest.store(agg["day"], fingerprints[agg["day"]], agg)
+        # rows without created_at ("unknown") can't be fetched by day and are left out here
+        cached = [export_manifest.aggregate(d) for d in sorted(fingerprints)
+                  if d not in all_days and d in export_manifest.days]
+        if not aggregates and not removed and export_manifest.master_range == [str(date_from), str(date_to)] \
+                and (OUTPUT_DIR / "MASTER_AUDIT.pdf").exists():
+            log.info("Nothing changed — MASTER_AUDIT.pdf is current.")
+        else:
+            log.info("Patching master audit: %d fresh + %d cached day(s) …", len(aggregates), len(cached))
+            generate_master_pdf(aggregates + cached, OUTPUT_DIR, date_from, date_to)
+            export_manifest.master_range = [str(date_from), str(date_to)]
+        export_manifest.save()
+        aggregates = aggregates + cached
+        if not aggregates:
+            log.warning("No approved payments found in either stream. Nothing to export.")
+            return
+    else:
+        # ── Master audit ─────────────────────────────────────────────────────
+        log.info("Generating master audit PDF …")
+        generate_master_pdf(aggregates, OUTPUT_DIR, date_from, date_to)
 
     # ── Summary banner ────────────────────────────────────────────────────────
-    total_sales = sum(float(p["amount"] or 0) for p in all_payments)
-    total_club  = sum(float(p["amount"] or 0) for p in all_club_payments)
+    totals      = merge_aggregates(aggregates)
+    total_sales = totals["sales_revenue"]
+    total_club  = totals["club_revenue"]
     total_all   = total_sales + total_club
 
     print("\n" + "═" * 62)
     print("  DIGITAL REVENUE — DUAL-STREAM EXPORT COMPLETE")
     print("═" * 62)
     print(f"  Output folder      : {OUTPUT_DIR.resolve()}")
-    print(f"  Days processed     : {len(all_days)}")
+    print(f"  Days processed     : {len(all_days)} rendered / {len(aggregates)} in report")
     print(f"  ── Stream A (Sales) ──────────────────────────────────")
-    print(f"  Transactions       : {len(all_payments)}")
+    print(f"  Transactions       : {totals['sales_count']}")
     print(f"  Product Sales Rev  : {total_sales:>14,.2f} ETB")
     print(f"  ── Stream B (Club) ───────────────────────────────────")
-    print(f"  Subscriptions      : {len(all_club_payments)}")
+    print(f"  Subscriptions      : {totals['club_count']}")
     print(f"  Club Sub Rev       : {total_club:>14,.2f} ETB")
     print(f"  ── Combined ──────────────────────────────────────────")
     print(f"  Total Revenue      : {total_all:>14,.2f} ETB")
@@ -1287,8 +1730,25 @@ if __name__ == "__main__":
         default="both",
         help="Which revenue stream to export (default: both)",
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=8,
+        help="Parallel Telegram downloads (default: 8)",
+    )
+    parser.add_argument(
+        "--render-workers", type=int, default=None,
+        help="Processes rendering day PDFs (default: CPU count)",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only re-export days whose rows changed since the last run",
+    )
+    parser.add_argument(
+        "--proof-gallery", action="store_true",
+        help="Add a proof thumbnail gallery to each daily PDF",
+    )
     args = parser.parse_args()
 
     def _d(v): return datetime.strptime(v, "%Y-%m-%d").date() if v else None
 
-    asyncio.run(main(_d(args.date_from), _d(args.date_to), args.stream))
\ No newline at end of file
+    asyncio.run(main(_d(args.date_from), _d(args.date_to), args.stream,
+                     args.concurrency, args.render_workers, args.incremental, args.proof_gallery))
\ No newline at end of file
@@ -254,10 +254,11 @@ async def prod_finalize(message: types.Message, state: FSMContext, db: Database)
 
 PAY_PER_PAGE = 6
 
-from .verify import get_verifier_menu # Import the menu builder we made
+from .verify import get_verifier_menu, format_ocr_stats # Import the menu builder we made
+from utils.payment_approval import deliver_product
 
 @router.message(F.text == "🤖 AI Verifier", F.from_user.id.in_(settings.ADMIN_IDS))
-async def open_verifier_tools(message: types.Message):
+async def open_verifier_tools(message: types.Message, db: Database):
     """
     Opens the testing suite with 'Upload Screenshot' and 'Test Batch'
     """
@@ -265,7 +266,9 @@ async def open_verifier_tools(message: types.Message):
         "🛠 **TRANSACTION ARCHITECT: TEST SUITE**\n"
         "━━━━━━━━━━━━━━━━━━━━\n"
         "Use these tools to stress-test OCR and Bank API logic "
-        "without affecting real user records.",
+        "without affecting real user records.\n\n"
+        # Stats go in a pre block: backend names contain underscores (Markdown parse mode)
+        f"```\n{format_ocr_stats(db)}\n\n{await db.audit_queue.format_metrics()}\n```",
         reply_markup=get_verifier_menu()
     )
     
@@ -358,23 +361,8 @@ async def approve_payment(callback: types.CallbackQuery, db: Database, bot: Bot)
     # Get the admin's name who clicked the button
     admin_name = html.escape(callback.from_user.full_name)
 
-    # 1. Message for the User (Athlete)
-    msg = (
-        "🔥 <b>ACCESS GRANTED</b>\n\nYour payment is verified. Your personalized Product is attached below. Let's work."
-        if info['language'] == "EN" else
-        "🔥 <b>ፈቃድ ተሰጥቷል</b>\n\nክፍያዎ ተረጋግጧል። የእርስዎ ልዩ የልምምድ እቅድ ከታች ተያይዟል። ስራ እንጀምር።"
-    )
-
-    # 2. Try sending document to the user
-    try:
-        await bot.send_document(
-            chat_id=info['user_id'], 
-            document=info['telegram_file_id'], 
-            caption=msg,
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logging.error(f"Delivery failed: {e}")
+    # 1-2. Localized access message + PDF (shared with the auto-approval fast path)
+    if not await deliver_product(bot, info):
         return await callback.answer("❌ Could not send. User might have blocked the bot.")
 
     # 3. Update the Admin Group message
@@ -237,7 +237,7 @@ async def process_frequency(callback: types.CallbackQuery, state: FSMContext, db
             await callback.message.edit_text(clean_text, parse_mode=None)
 
     # 3. MATCH THE PRODUCT
-    product = await db.match_product(lang, data['level'], freq)
+    product = await db.match_product(lang, data['level'], freq, data.get('gender'))
     if not product:
         await callback.message.edit_text(get_text(lang, "no_product_found"))
         return
@@ -364,7 +364,7 @@ async def process_commitment(callback: types.CallbackQuery, state: FSMContext, d
     await asyncio.sleep(8.5)
 
     # ── PITCH ─────────────────────────────────────────────────────
-    product = await db.match_product(lang, data["level"], freq)
+    product = await db.match_product(lang, data["level"], freq, data.get("gender"))
     if not product:
         return
 
@@ -421,6 +421,7 @@ async def process_commitment(callback: types.CallbackQuery, state: FSMContext, d
         "UPDATE users SET last_pitch_at = $1 WHERE telegram_id = $2",
         datetime.datetime.now(), user_id
     )
+    db.invalidate_user(user_id)
     await state.clear()
     
     
@@ -490,7 +491,7 @@ def build_pitch(user, product):
 @router.callback_query(F.data == "re_pitch_trigger")
 async def re_pitch_trigger(callback: types.CallbackQuery, db: Database):
     user = await db.get_user(callback.from_user.id)
-    product = await db.match_product(user['language'], user['level'], user['frequency'])
+    product = await db.match_product(user['language'], user['level'], user['frequency'], user['gender'])
     if not product:
         return await callback.message.answer("No product found for your profile.")
 
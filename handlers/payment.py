@@ -18,7 +18,10 @@ from config import settings
 # 🚨 IMPORT THE CORE ENGINES FROM VERIFY.PY Safely
 import io
 import time
-from handlers.verify import extract_local_data, verify_external, is_hilawe_receiver
+from handlers.verify import audit_receipt, format_reuse_alert, is_hilawe_receiver
+from utils.audit_queue import RetryAudit, audit_handler
+from utils.payment_approval import format_auto_approval
+from utils.receipt_image import pick_photo_size
 REPORT_CACHE = {}
 
 router = Router(name="payment")
@@ -169,41 +172,55 @@ async def handle_payment_proof(message: types.Message, state: FSMContext, db: Da
     # 5. Send fresh message WITH the main menu keyboard
     await message.answer(final_text, reply_markup=rb.main_menu(lang), parse_mode="HTML")
 
-    # 6. Fire-and-forget admin notification (background task)
-    asyncio.create_task(
-        notify_admin_payment(bot, message, data, payment_id, proof_file_id, db)
+    # 6. Queue the admin alert + receipt audit (drained by utils/audit_queue workers);
+    #    the audit downloads the smallest photo size that still meets the OCR width target
+    ocr_photo = pick_photo_size(message.photo, settings.OCR_TARGET_WIDTH)
+    await db.audit_queue.enqueue(
+        "payment", payment_id, user_id, ocr_photo.file_id, ocr_photo.file_unique_id,
+        context={
+            "full_name": message.from_user.full_name,
+            "username": message.from_user.username,
+            "language": data.get("language", "EN"),
+            "product_id": product_id,
+            "amount": amount,
+        },
     )
 
     # 7. Final State Clear
     await state.clear()
 
 
-async def notify_admin_payment(bot: Bot, message: types.Message, data: dict, payment_id: int, proof_id: str, db: Database):
+@audit_handler("payment")
+async def notify_admin_payment(bot: Bot, db: Database, job: dict, queue):
     """The Founder Alert: Sends the receipt immediately, then runs automated OCR verification."""
-    try:
-        product = await db._pool.fetchrow("SELECT title FROM products WHERE id = $1", data['selected_product_id'])
-        
-        lang_code = data.get("language", "EN")
+    ctx = job["context"]
+    payment_id = job["payment_id"]
+
+    # Founder alert goes out once; a retried job replies to the stored message
+    if job["admin_message_id"] is None:
+        product = await db._pool.fetchrow("SELECT title FROM products WHERE id = $1", ctx['product_id'])
+
+        lang_code = ctx.get("language", "EN")
         lang_display = "🇺🇸 English" if lang_code == "EN" else "🇪🇹 አማርኛ (Amharic)"
-        
-        full_name = html.escape(message.from_user.full_name)
-        username = html.escape(f"@{message.from_user.username}") if message.from_user.username else "No Username"
+
+        full_name = html.escape(ctx.get("full_name") or "")
+        username = html.escape(f"@{ctx['username']}") if ctx.get("username") else "No Username"
         product_title = html.escape(product['title'])
-        
+
         admin_caption = (
-            f"💸 <b>MONEY IN: NEW PAYMENT</b>\n"            
+            f"💸 <b>MONEY IN: NEW PAYMENT</b>\n"
             f"────────────────────\n"
             f"👤 <b>User:</b> {full_name} | {username}\n"
-            f"🆔 <b>User ID:</b> <code>{message.from_user.id}</code>\n"
+            f"🆔 <b>User ID:</b> <code>{job['user_id']}</code>\n"
             f"🌍 <b>Language:</b> <code>{lang_display}</code>\n"
             f"────────────────────\n"
             f"📦 <b>Plan:</b> {product_title}\n"
-            f"💰 <b>Amount:</b> <code>{data['amount']} ETB</code>\n"
+            f"💰 <b>Amount:</b> <code>{ctx['amount']} ETB</code>\n"
             f"🎫 <b>Payment ID:</b> #{payment_id}\n"
             f"────────────────────\n"
             f"⚡️ <b>Verify receipt and choose action:</b>"
         )
-        
+
         kb_builder = InlineKeyboardBuilder()
         kb_builder.button(text="✅ APPROVE & SEND PDF", callback_data=f"approve_{payment_id}")
         kb_builder.button(text="❌ REJECT / FAKE", callback_data=f"reject_{payment_id}")
@@ -212,86 +229,116 @@ async def notify_admin_payment(bot: Bot, message: types.Message, data: dict, pay
         # Immediate Delivery to Group Channel
         admin_msg = await bot.send_photo(
             chat_id=settings.ADMIN_PAYMENT_LOG_ID,
-            photo=proof_id,
+            photo=job["file_id"],
             caption=admin_caption,
             reply_markup=kb_builder.as_markup(),
             parse_mode="HTML"
         )
+        await queue.set_admin_message(job, admin_msg.chat.id, admin_msg.message_id)
 
-        # 🚀 ASYNC NON-BLOCKING VERIFICATION PROCESSING
-        
-        start_time = time.perf_counter()
-        try:
-            file_info = await bot.get_file(proof_id)
-            img_stream = io.BytesIO()
-            await bot.download_file(file_info.file_path, destination=img_stream)
-            img_stream.seek(0)
-
-            # Process with verify.py core mechanics
-            local = await extract_local_data(img_stream)
-
-            # Verification Scenario 1: No clear text could be read by OCR
-            if not local["ref"] or len(str(local["ref"])) < 8:
-                elapsed = time.perf_counter() - start_time
-                await admin_msg.reply(
-                    f"🤖 <b>AI SCAN: MANUAL REVIEW REQUIRED 🧐</b>\n"
-                    f"────────────────────\n"
-                    f"⚠️ Layout is too messy or other bank. Couldn't extract a solid Transaction ID.\n"
-                    f"🛡️ <i>Locking it down to prevent a false approval. Over to you, human.</i>\n\n"
-                    f"⏱️ <b>Speed:</b> {elapsed:.2f}s",
-                    parse_mode="HTML"
-                )
-                return
-
-            # Verification Scenario 2: ID extracted, let's look up the APIs
-            bank_data = await verify_external(local["ref"], local["provider"])
-            is_real = bank_data.get("success", False)
-            is_hilawe = is_hilawe_receiver(local["raw_text"], bank_data)
-
-            api_amount = bank_data.get("data", {}).get("amount")
-            display_amount = f"{float(api_amount):,.2f}" if api_amount else (local['amount_fallback'] or "Unknown")
-            elapsed = time.perf_counter() - start_time
-            full_audit_report = format_audit_report(local, bank_data, elapsed, is_real, is_hilawe)
-        
-        # 2. Store it in cache
-            
-
-            if is_real and is_hilawe:
-                evaluation_text = (
-                    f"🤖 <b>API MATCH: SECURE & VALID ✅</b>\n"
-                    f"────────────────────\n"
-                    f"🟢 100% authentic. Live bank transaction check confirmed the funds are safely in.\n\n"
-                    f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref']}</code> • 💰 <b>{display_amount} ETB</b>\n"
-                    f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
-                )
-            else:
-                evaluation_text = (
-                    f"🤖 <b>API MATCH: REJECTED / FAKE ALERT 🚨</b>\n"
-                    f"────────────────────\n"
-                    f"🔴 Fraud guard triggered. This transaction ID does not exist on the bank's live server.\n"
-                    f"🛡️ <i>Nice try, but the system just caught a ghost receipt. Do not send the program.</i>\n\n"
-                    f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref'] or 'N/A'}</code> • 💰 <b>{display_amount} ETB</b>\n"
-                    f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
-                )
-            
-            REPORT_CACHE[payment_id] = full_audit_report
-
-            # 3. Define the "More Info" button
-            kb_info = InlineKeyboardBuilder()
-            kb_info.button(text="ℹ️ Detail", callback_data=f"info_{payment_id}")
-        
-        # 3. Send the reply with the button
-            await admin_msg.reply(
-            evaluation_text, 
-            reply_markup=kb_info.as_markup(), 
-            parse_mode="HTML"
+    async def reply(text: str, **kwargs):
+        return await bot.send_message(
+            job["admin_chat_id"], text, reply_to_message_id=job["admin_message_id"], parse_mode="HTML", **kwargs
         )
 
-        except Exception as ocr_err:
-            logger.error(f"In-line background execution processing error: {ocr_err}")
+    # 🚀 BOUNDED VERIFICATION (download / CPU / remote caps from the audit queue)
+    start_time = time.perf_counter()
+
+    # Process with verify.py core mechanics (cached by Telegram file / image hash)
+    audit = await audit_receipt(
+        bot, db, job["file_id"], job["file_unique_id"],
+        owner=("payment", payment_id, job["user_id"]), limits=queue.limits,
+    )
+    local = audit["local"]
 
-    except Exception as e:
-        logging.error(f"Global admin notification error: {e}")
+    # Same receipt already backs another payment: flag it before anything else
+    if audit["reused_from"]:
+        await reply(format_reuse_alert(audit))
+
+    # Verification Scenario 1: No clear text could be read by OCR
+    if not local["ref"] or len(str(local["ref"])) < 8:
+        elapsed = time.perf_counter() - start_time
+        await reply(
+            f"🤖 <b>AI SCAN: MANUAL REVIEW REQUIRED 🧐</b>\n"
+            f"────────────────────\n"
+            f"⚠️ Layout is too messy or other bank. Couldn't extract a solid Transaction ID.\n"
+            f"🛡️ <i>Locking it down to prevent a false approval. Over to you, human.</i>\n\n"
+            f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
+        )
+        return audit["timings"]
+
+    # Verification Scenario 2: ID extracted, bank lookup already done by audit_receipt
+    bank_data = audit["bank_data"]
+    is_real = bank_data.get("success", False)
+    is_hilawe = is_hilawe_receiver(local["raw_text"], bank_data)
+
+    api_amount = bank_data.get("data", {}).get("amount")
+    display_amount = f"{float(api_amount):,.2f}" if api_amount else (local['amount_fallback'] or "Unknown")
+    elapsed = time.perf_counter() - start_time
+    full_audit_report = format_audit_report(local, bank_data, elapsed, is_real, is_hilawe)
+
+    if audit["reference_reused"]:
+        kind, pay_id, _ = audit["reused_from"]
+        evaluation_text = (
+            f"🤖 <b>API CHECK SKIPPED: REFERENCE ALREADY USED ♻️</b>\n"
+            f"────────────────────\n"
+            f"🟠 This transaction ID already backs {'Club Payment' if kind == 'club' else 'Payment'} #{pay_id}. "
+            f"The receipt may be genuine, but one transfer pays once.\n"
+            f"🛡️ <i>Do not send the program unless the earlier payment was a mistake.</i>\n\n"
+            f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref']}</code> • 💰 <b>{display_amount} ETB</b>\n"
+            f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
+        )
+    elif bank_data.get("retryable"):
+        # Timeout / open circuit / transport error: no verdict yet, the queue retries with backoff
+        if job["attempts"] == 1:
+            await reply(
+                f"🤖 <b>API CHECK: BANK UNREACHABLE, RETRYING ⏳</b>\n"
+                f"────────────────────\n"
+                f"🟡 The bank's live server didn't answer. This is not a fraud verdict; "
+                f"the lookup is rescheduled automatically.\n\n"
+                f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref']}</code> • 💰 <b>{display_amount} ETB</b>\n"
+                f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
+            )
+        raise RetryAudit(bank_data.get("error") or "bank lookup not answered")
+    elif is_real and is_hilawe:
+        evaluation_text = (
+            f"🤖 <b>API MATCH: SECURE & VALID ✅</b>\n"
+            f"────────────────────\n"
+            f"🟢 100% authentic. Live bank transaction check confirmed the funds are safely in.\n\n"
+            f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref']}</code> • 💰 <b>{display_amount} ETB</b>\n"
+            f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
+        )
+    else:
+        evaluation_text = (
+            f"🤖 <b>API MATCH: REJECTED / FAKE ALERT 🚨</b>\n"
+            f"────────────────────\n"
+            f"🔴 Fraud guard triggered. This transaction ID does not exist on the bank's live server.\n"
+            f"🛡️ <i>Nice try, but the system just caught a ghost receipt. Do not send the program.</i>\n\n"
+            f"📊 <b>{local['provider']}</b> • 🆔 <code>{local['ref'] or 'N/A'}</code> • 💰 <b>{display_amount} ETB</b>\n"
+            f"⏱️ <b>Speed:</b> {elapsed:.2f}s"
+        )
+
+    REPORT_CACHE[payment_id] = full_audit_report
+
+    # "More Info" button
+    kb_info = InlineKeyboardBuilder()
+    kb_info.button(text="ℹ️ Detail", callback_data=f"info_{payment_id}")
+    await reply(evaluation_text, reply_markup=kb_info.as_markup())
+
+    # ⚡ Opt-in fast path: approve + deliver without waiting for a human
+    approver = db.auto_approver
+    if approver is not None and approver.enabled and is_real and is_hilawe:
+        info, reasons = await approver.try_approve(bot, payment_id, audit, is_real, is_hilawe)
+        if info is not None:
+            try:
+                # Approve/Reject buttons are gone so nobody acts on it twice
+                await bot.edit_message_reply_markup(
+                    chat_id=job["admin_chat_id"], message_id=job["admin_message_id"], reply_markup=None
+                )
+            except Exception as e:
+                logger.error(f"Admin UI update error: {e}")
+        await reply(format_auto_approval(info, reasons))
+    return audit["timings"]
 
 from datetime import datetime, timezone
 
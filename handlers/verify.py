@@ -1,10 +1,12 @@
-#verify.py — OCR.space Edition
-#Target: < 4 seconds per transaction
+#verify.py — Local + OCR.space Edition
+#Target: < 1 second per transaction
 
 #Architecture:
 # 1. API Authority:   Verify API is the source of truth for amounts/names.
-# 2. OCR.space API:  REST-based, multi-part form data. Engine 2 enabled for optimal receipt parsing.
-# 3. Memory Guard:    Downscales large screenshots before sending to OCR.space (speed + payload limit).
+# 2. OCR Engine:      utils/ocr_engine.py — local Tesseract (process pool) and OCR.space,
+#                     raced or auto-selected by measured latency (OCR_MODE).
+# 3. Memory Guard:    Smallest adequate Telegram photo size, grayscale draft decode and downscale
+#                     in a dedicated process pool (utils/receipt_image.py).
 # 4. Dual HTTP Clients: Separate persistent clients for OCR.space API vs Verify API — no timeout bleed.
 # 5. Graceful Fallback: Detailed error logging; empty string on OCR failure so flow continues.
 
@@ -16,17 +18,24 @@
 import io
 import asyncio
 import base64
+import contextlib
 import re
 import time
 from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
 
 import httpx
-from PIL import Image, ImageEnhance
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from concurrent.futures import ProcessPoolExecutor
 from config import settings
+from utils.ocr_engine import OcrEngine, RemoteBackend, TesseractBackend
+from utils.receipt_cache import perceptual_hash
+from utils.receipt_image import pick_photo_size, preprocess_for_ocr
+from utils.receipt_parser import parse_receipt, receiver_matches
+from utils.verify_client import VerifyClient
 
 
 # ─────────────────────────────────────────────
@@ -36,6 +45,7 @@ VERIFY_API_KEY    = settings.VERIFY_API_KEY
 VERIFY_URL        = "https://verifyapi.leulzenebe.pro/verify"
 VERIFY_URL_TB     = "https://verifyapi.leulzenebe.pro/verify-telebirr/"
 CBE_SUFFIX        = "99533641"
+RECEIVER_NAME     = "HILAWE"
 
 OCR_SPACE_API_KEY = getattr(settings, "OCR_SPACE_API_KEY", "helloworld")  # Fallback to public demo key if unconfigured
 OCR_SPACE_URL     = "https://api.ocr.space/parse/image"
@@ -87,30 +97,25 @@ class PaymentStates(StatesGroup):
 # ─────────────────────────────────────────────
 #  IMAGE PREPROCESSING
 # ─────────────────────────────────────────────
-def _preprocess_for_ocr(img_stream: io.BytesIO) -> bytes:
-    """
-    Lightweight preprocessing before sending to OCR.space.
+_preprocess_pool: ProcessPoolExecutor | None = None
 
-    - Downscale oversized screenshots (cost guard, payload limit)
-    - Upscale tiny screenshots (OCR struggles below ~600px wide)
-    - Apply a mild contrast boost for washed-out Telebirr receipts
-    - Re-encode as high-quality JPEG for the API payload
-    """
-    img = Image.open(img_stream).convert("RGB")
-    w, h = img.size
 
-    if w > 1400:
-        ratio = 1400 / w
-        img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.LANCZOS)
-    elif w < 600:
-        ratio = 600 / w
-        img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.BICUBIC)
+def get_preprocess_pool() -> ProcessPoolExecutor:
+    """Dedicated pool so decode/resize never competes with the event loop's default threads."""
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        _preprocess_pool = ProcessPoolExecutor(max_workers=settings.OCR_PREPROCESS_WORKERS)
+    return _preprocess_pool
+
 
-    img = ImageEnhance.Contrast(img).enhance(1.4)
+async def _preprocess_for_ocr(image_bytes: bytes) -> bytes:
+    """Grayscale draft decode + resize + contrast (utils/receipt_image.py), off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_preprocess_pool(), preprocess_for_ocr, image_bytes,
+        settings.OCR_MAX_WIDTH, settings.OCR_MIN_WIDTH,
+    )
 
-    out = io.BytesIO()
-    img.save(out, format="JPEG", quality=90)
-    return out.getvalue()
 
 
 # ─────────────────────────────────────────────
@@ -156,129 +161,301 @@ async def _ocr_space(image_bytes: bytes) -> str:
 
 
 # ─────────────────────────────────────────────
-#  PROVIDER DETECTION
+#  OCR ENGINE  (local tesseract + OCR.space)
 # ─────────────────────────────────────────────
-def _detect_provider(up: str) -> str:
-    if any(k in up for k in ("COMMERCIAL BANK", "CBE", "BRECIEPT", "FT2")):
-        return "CBE"
-    if any(k in up for k in ("TELEBIRR", "ETHIO TELECOM", "TELE BIRR")) or re.search(r"\b(D[A-Z0-9]{9})\b", up):
-        return "Telebirr"
-    if "AWASH" in up:
-        return "Awash"
-    return "Unknown"
+_ocr_engine: OcrEngine | None = None
+
+
+def get_ocr_engine() -> OcrEngine:
+    """Lazily builds the shared engine; the process pool is only forked on first local OCR."""
+    global _ocr_engine
+    if _ocr_engine is None:
+        pool = ProcessPoolExecutor(max_workers=settings.OCR_PROCESS_WORKERS)
+        _ocr_engine = OcrEngine(
+            backends=[
+                TesseractBackend(pool, lang=settings.OCR_TESSERACT_LANG, timeout=settings.OCR_TESSERACT_TIMEOUT),
+                RemoteBackend("ocr_space", _ocr_space),
+            ],
+            mode=settings.OCR_MODE,
+        )
+    return _ocr_engine
+
+
+def format_ocr_stats(db=None) -> str:
+    """One line per OCR backend (plus the receipt cache) for the admin verifier menu."""
+    engine = get_ocr_engine()
+    lines = [f"OCR mode: {engine.mode}"]
+    for name, s in engine.snapshot().items():
+        latency = f"{s['latency_ms']}ms" if s['latency_ms'] is not None else "n/a"
+        lines.append(f"• {name}: {latency} · {s['usable_rate']:.0%} usable · {s['wins']}/{s['samples']} wins")
+    for url, b in get_verifier().snapshot().items():
+        lines.append(f"• verify {url.rstrip('/').rsplit('/', 1)[-1]}: circuit {b['state']} ({b['failures']} fails)")
+    cache = getattr(db, "receipt_cache", None)
+    if cache is not None:
+        c = cache.snapshot()
+        lines.append(f"• receipt cache: {c['entries']} cached · {c['hits']} hits / {c['misses']} misses")
+    return "\n".join(lines)
 
 
 # ─────────────────────────────────────────────
-#  REFERENCE ID EXTRACTION
+#  RECEIPT PARSING  (utils/receipt_parser.py provider plugins)
 # ─────────────────────────────────────────────
-def _extract_cbe(up: str) -> str | None:
-    m = re.search(r"F\s*T\s*([A-Z0-9]{8,12})", up)
-    if m: return ("FT" + m.group(1)).replace(" ", "")
-    m = re.search(r"(?:ID|TRANSACTION\s*ID)[:\s]+([A-Z0-9]{10,14})", up)
-    if m: return m.group(1).strip()
-    m = re.search(r"\b(FT[A-Z0-9]{8,12})\b", up)
-    return m.group(1) if m else None
+def normalize_reference(ref: str) -> str:
+    """Canonical form stored in payment_references (OCR spacing/case differences collapse)."""
+    return re.sub(r"\s+", "", str(ref)).upper()
 
 
-def _extract_telebirr(up: str, raw: str) -> str | None:
-    for label in (
-        "TRANSACTION NUMBER", "TRANSACTION NO", "INVOICE NO",
-        "INVOICE NUMBER", "REF NO", "REFERENCE NO", "NUMBER",
-    ):
-        m = re.search(rf"{label}[:\s#]+([A-Z0-9]{{8,14}})", up)
-        if m: return m.group(1).strip()
+def _to_amount(value) -> Decimal | None:
+    try:
+        return Decimal(str(value).replace(",", "")) if value not in (None, "") else None
+    except InvalidOperation:
+        return None
 
-    # Amharic label — OCR Engine reads Ethiopic script reliably
-    m = re.search(r"የግብይት\s*ቁጥር[:\s]+([A-Z0-9a-z]{8,14})", raw, re.UNICODE)
-    if m: return m.group(1).strip().upper()
 
-    # D-prefix fallback: Telebirr IDs are consistently D + 9 alphanumeric chars
-    m = re.search(r"\b(D[A-Z0-9]{9})\b", up)
-    if m: return m.group(1).strip()
-    return None
+# ─────────────────────────────────────────────
+#  PUBLIC HOOKS  (imported by payment.py)
+# ─────────────────────────────────────────────
+def _parse_ocr_text(raw: str) -> dict:
+    """provider/ref/amount (+ printed receiver) from raw OCR text."""
+    parsed = parse_receipt(raw)
+    return {
+        "provider":        parsed["provider"],
+        "ref":             parsed["ref"],
+        "amount_fallback": parsed["amount"],
+        "receiver":        parsed["receiver"],
+        "raw_text":        raw,
+    }
 
 
-def _extract_amount_fallback(raw: str) -> str | None:
-    """Last-resort amount extraction from raw OCR text if Verify API returns nothing."""
-    amounts = re.findall(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)", raw)
-    return max(amounts, key=lambda x: len(x.replace(",", ""))) if amounts else None
+def _gate(limits, stage: str):
+    """Stage semaphore from utils/audit_queue.StageLimits, or a no-op outside the queue."""
+    return getattr(limits, stage) if limits is not None else contextlib.nullcontext()
 
 
-# ─────────────────────────────────────────────
-#  PUBLIC HOOKS  (imported by payment.py)
-# ─────────────────────────────────────────────
-async def extract_local_data(img_stream: io.BytesIO) -> dict:
+async def extract_local_data(img_stream: io.BytesIO | bytes, limits=None) -> dict:
     """
-    Full OCR pipeline: preprocess → OCR.space → extract provider/ref/amount.
-    Returns the exact same dict shape as the original version — payment.py unchanged.
+    Full OCR pipeline: preprocess → OCR engine → extract provider/ref/amount.
+    Returns the same dict shape as before (plus `ocr_engine`) — payment.py unchanged.
     """
-    loop = asyncio.get_running_loop()
+    data = img_stream if isinstance(img_stream, bytes) else img_stream.getvalue()
 
-    # PIL preprocessing is CPU-bound — run in thread pool
-    image_bytes = await loop.run_in_executor(None, _preprocess_for_ocr, img_stream)
+    # PIL preprocessing is CPU-bound — run in the preprocessing process pool
+    async with _gate(limits, "cpu"):
+        image_bytes = await _preprocess_for_ocr(data)
 
-    # OCR.space OCR — async REST call
-    raw = await _ocr_space(image_bytes)
+    # A result only counts once it yields a transaction reference; until then the
+    # engine keeps waiting on (or falls back to) the other backend
+    gates = {"local": limits.cpu, "remote": limits.remote} if limits is not None else None
+    raw, engine_name = await get_ocr_engine().recognize(
+        image_bytes, usable=lambda text: bool(_parse_ocr_text(text)["ref"]), gates=gates
+    )
 
-    # Sanitize: strip non-alphanumeric for regex safety, keep Ethiopic in `raw`
-    up       = re.sub(r'[^A-Z0-9\n\s:\-]', ' ', raw.upper())
-    provider = _detect_provider(up)
-    ref      = None
+    local = _parse_ocr_text(raw)
+    local["ocr_engine"] = engine_name
+    return local
 
-    if provider == "CBE":
-        ref = _extract_cbe(up)
-    elif provider in ("Telebirr", "Unknown"):
-        ref = _extract_telebirr(up, raw)
-        if ref:
-            provider = "Telebirr"
 
-    return {
-        "provider":        provider,
-        "ref":             ref,
-        "amount_fallback": _extract_amount_fallback(raw),
-        "raw_text":        raw,
-    }
-async def verify_external(reference: str, provider: str, max_attempts: int = 3) -> dict:
-    """Hits the Leulzenebe verify API with retries (up to 30s total budget)."""
-    client  = get_verify_client()
+def _verify_endpoints(provider: str) -> list[str]:
+    # Telebirr references can resolve on either endpoint — both are asked at once
+    if provider == "Telebirr":
+        return [VERIFY_URL_TB, VERIFY_URL]
+    return [VERIFY_URL]
+
+
+_verifier: VerifyClient | None = None
+
+
+def get_verifier() -> VerifyClient:
+    """Shared hedged/single-flight verify client (utils/verify_client.py)."""
+    global _verifier
+    if _verifier is None:
+        _verifier = VerifyClient(
+            client_factory=get_verify_client,
+            endpoints_for=_verify_endpoints,
+            hedge_delay=settings.VERIFY_HEDGE_DELAY,
+            max_attempts=settings.VERIFY_MAX_ATTEMPTS,
+            deadline=settings.VERIFY_DEADLINE,
+            failure_threshold=settings.VERIFY_BREAKER_FAILURES,
+            reset_timeout=settings.VERIFY_BREAKER_RESET,
+        )
+    return _verifier
+
+
+async def verify_external(reference: str, provider: str) -> dict:
+    """
+    Hits the Leulzenebe verify API: all endpoints in parallel, hedged retries,
+    first success wins. Concurrent calls for the same reference share one lookup.
+    Failures carry `retryable` (timeout / circuit open) vs a definitive not-found.
+    """
     payload = {"reference": reference.strip()}
     if provider == "CBE":
         payload["suffix"] = CBE_SUFFIX
 
-    endpoints = [VERIFY_URL]
-    if provider == "Telebirr":
-        endpoints.append(VERIFY_URL_TB)
-
-    for attempt in range(1, max_attempts + 1):
-        for url in endpoints:
-            try:
-                print(f"🔄 [VERIFY ATTEMPT {attempt}/{max_attempts}] Requesting {url}...")
-                resp = await client.post(url, json=payload)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data.get("success"):
-                        print(f"🔥 [VERIFY API MATCH] REF: {reference}")
-                        return data
-            except httpx.ReadTimeout:
-                print(f"⚠️ [Attempt {attempt}] ReadTimeout (10s) on {url}")
-            except Exception as e:
-                print(f"⚠️ [Attempt {attempt}] Error on {url}: {type(e).__name__}: {e}")
-
-        # Pause 1 second before retrying if attempts remain
-        if attempt < max_attempts:
-            await asyncio.sleep(1.0)
-
-    return {"success": False, "error": "Bank verification server timed out after 30 seconds."}
+    data = await get_verifier().verify(reference, payload, provider)
+    if data.get("success"):
+        print(f"🔥 [VERIFY API MATCH] REF: {reference}")
+    return data
 
 def is_hilawe_receiver(raw: str, bank_data: dict) -> bool:
-    """Checks OCR text and API response for Hilawe as the credited receiver."""
-    data     = bank_data.get("data", {})
+    """
+    The bank's receiver name is authoritative when the API returns one; otherwise the
+    receiver field the provider plugin read off the receipt.
+    """
+    data     = (bank_data or {}).get("data", {}) or {}
     api_name = str(
         data.get("receiver") or
         data.get("creditedPartyName") or
         data.get("credited_party_name") or ""
     ).upper()
-    return "HILAWE" in raw.upper() or "HILAWE" in api_name
+    if api_name:
+        return RECEIVER_NAME in api_name
+    return receiver_matches(raw, RECEIVER_NAME)
+
+
+# ─────────────────────────────────────────────
+#  CACHED AUDIT PIPELINE  (utils/receipt_cache.py)
+# ─────────────────────────────────────────────
+def _receipt_cache(db):
+    return getattr(db, "receipt_cache", None) if db is not None else None
+
+
+async def scan_receipt(bot: Bot, db, file_id: str, file_unique_id: str | None = None, owner=None,
+                       limits=None) -> dict:
+    """
+    Cache-aware download + OCR for one receipt photo.
+    `owner` is ("payment" | "club", payment_id, user_id) for real submissions, None for admin tests.
+    `limits` (audit queue StageLimits) bounds downloads, CPU work and remote calls separately.
+
+    Returns {local, bank_data, cached, reused_from, reuse_match, reference_reused, owner, entry, timings}:
+      cached      — None (fresh scan), "file" (same Telegram file) or "phash" (same-looking
+                    image whose OCR'd reference also matches)
+      bank_data   — a still-valid cached verification, else None (see verify_receipt)
+      reused_from — the earlier owner when this receipt belongs to another payment
+      reference_reused — set later by verify_receipt when another payment owns the bank reference
+    """
+    cache   = _receipt_cache(db)
+    timings = {"download": 0.0, "ocr": 0.0, "api": 0.0}
+    audit   = {"local": None, "bank_data": None, "cached": None, "reused_from": None,
+               "reuse_match": None, "reference_reused": False, "owner": owner, "entry": None,
+               "timings": timings}
+
+    file = None
+    if cache is not None and not file_unique_id:
+        file = await bot.get_file(file_id)  # metadata only — gives us the unique id
+        file_unique_id = file.file_unique_id
+
+    entry = await cache.get(file_unique_id) if cache is not None else None
+    if entry is not None:
+        audit["cached"] = "file"
+        entry = await cache.claim(entry, owner)
+    else:
+        t0 = time.perf_counter()
+        async with _gate(limits, "download"):
+            file       = file or await bot.get_file(file_id)
+            img_stream = io.BytesIO()
+            await bot.download_file(file.file_path, destination=img_stream)
+        image_bytes = img_stream.getvalue()
+        timings["download"] = time.perf_counter() - t0
+
+        phash = similar = None
+        if cache is not None:
+            loop    = asyncio.get_running_loop()
+            async with _gate(limits, "cpu"):
+                phash = await loop.run_in_executor(None, perceptual_hash, image_bytes)
+            similar = await cache.find_similar(phash)
+
+        t1    = time.perf_counter()
+        local = await extract_local_data(io.BytesIO(image_bytes), limits)
+        timings["ocr"] = time.perf_counter() - t1
+        if cache is None:
+            audit["local"] = local
+            return audit
+
+        # A phash hit is only a hint (receipts from one bank template can hash alike):
+        # the earlier verification and owner carry over only if the reference matches too
+        similar_ref = (similar or {}).get("local", {}).get("ref")
+        if similar_ref and local["ref"] and normalize_reference(similar_ref) == normalize_reference(local["ref"]):
+            audit["cached"] = "phash"
+            bank_data = similar["bank_data"] if cache.bank_data_fresh(similar) else None
+            entry = await cache.put(file_unique_id, phash, local, bank_data, similar["owner"] or owner)
+        else:
+            entry = await cache.put(file_unique_id, phash, local, None, owner)
+
+    audit.update(
+        local=entry["local"],
+        entry=entry,
+        bank_data=entry["bank_data"] if cache.bank_data_fresh(entry) else None,
+        reused_from=cache.reused_from(entry, owner),
+    )
+    if audit["reused_from"]:
+        audit["reuse_match"] = "image fingerprint + reference" if audit["cached"] == "phash" else "same Telegram file"
+    return audit
+
+
+async def verify_receipt(db, audit: dict, limits=None) -> dict:
+    """
+    Bank lookup for a scanned receipt; cached verifications are reused, new ones stored.
+    Real submissions first claim the reference in payment_references: a reference owned
+    by another payment sets audit["reference_reused"] (and reused_from) and skips the bank
+    call. bank_data is left alone — the receipt may be real, it just already paid once.
+    """
+    local = audit["local"]
+    ref   = local["ref"]
+    if not ref or len(str(ref)) < 8:
+        return audit["bank_data"] or {}
+
+    owner = audit.get("owner")
+    if owner is not None and db is not None:
+        holder = await db.claim_payment_reference(
+            normalize_reference(ref), local["provider"], _to_amount(local["amount_fallback"]), *owner
+        )
+        if (holder["kind"], holder["payment_id"]) != tuple(owner[:2]):
+            audit["reference_reused"] = True
+            if not audit["reused_from"]:
+                audit["reused_from"] = (holder["kind"], holder["payment_id"], holder["user_id"])
+                audit["reuse_match"] = "bank reference"
+            return audit["bank_data"] or {}
+
+    if audit["bank_data"] is not None:
+        return audit["bank_data"]
+
+    t0        = time.perf_counter()
+    async with _gate(limits, "remote"):
+        bank_data = await verify_external(ref, local["provider"])
+    audit["timings"]["api"] = time.perf_counter() - t0
+    audit["bank_data"]      = bank_data
+
+    cache = _receipt_cache(db)
+    if cache is not None and audit["entry"] is not None:
+        await cache.store_bank_data(audit["entry"], bank_data)
+    if owner is not None and db is not None and bank_data.get("success"):
+        amount = _to_amount((bank_data.get("data") or {}).get("amount"))
+        if amount is not None:
+            await db.set_payment_reference_amount(normalize_reference(ref), amount)
+    return bank_data
+
+
+async def audit_receipt(bot: Bot, db, file_id: str, file_unique_id: str | None = None, owner=None,
+                        limits=None) -> dict:
+    """scan_receipt + verify_receipt; the result carries `bank_data` ({} when no usable ref)."""
+    audit = await scan_receipt(bot, db, file_id, file_unique_id, owner, limits)
+    await verify_receipt(db, audit, limits)
+    if audit["bank_data"] is None:
+        audit["bank_data"] = {}
+    return audit
+
+
+def format_reuse_alert(audit: dict) -> str:
+    kind, pay_id, user_id = audit["reused_from"]
+    label = "Club Payment" if kind == "club" else "Payment"
+    match = audit.get("reuse_match") or "same Telegram file"
+    return (
+        f"♻️ <b>REUSED RECEIPT DETECTED</b>\n"
+        f"────────────────────\n"
+        f"🔁 Already submitted for <b>{label} #{pay_id}</b> by user <code>{user_id}</code>.\n"
+        f"🧬 <b>Match:</b> {match}\n"
+        f"🛡️ <i>One transfer, one approval. Check before releasing anything.</i>"
+    )
 
 
 # ─────────────────────────────────────────────
@@ -364,23 +541,14 @@ async def start_upload_test(callback: types.CallbackQuery, state: FSMContext):
 
 
 @router.message(PaymentStates.waiting_for_screenshot, F.photo)
-async def handle_screenshot_test(message: types.Message, state: FSMContext, bot: Bot):
+async def handle_screenshot_test(message: types.Message, state: FSMContext, bot: Bot, db):
     start_time = time.perf_counter()
     status_msg = await message.answer("🔄 <b>Analyzing receipt...</b>", parse_mode="HTML")
 
-    # ── 1. Download ────────────────────────────────────────────────────────────
-    t0         = time.perf_counter()
-    photo = message.photo[-2] if len(message.photo) > 1 else message.photo[-1]
-    file       = await bot.get_file(photo.file_id)
-    img_stream = io.BytesIO()
-    await bot.download_file(file.file_path, destination=img_stream)
-    img_stream.seek(0)
-    t_download = time.perf_counter() - t0
-
-    # ── 2. OCR ─────────────────────────────────────────────────────────────────
-    t1    = time.perf_counter()
-    local = await extract_local_data(img_stream)
-    t_ocr = time.perf_counter() - t1
+    # ── 1-2. Download + OCR (skipped for receipts already in the cache) ────────
+    photo = pick_photo_size(message.photo, settings.OCR_TARGET_WIDTH)
+    audit = await scan_receipt(bot, db, photo.file_id, photo.file_unique_id)
+    local = audit["local"]
 
     # ── 3. Abort if no ref extracted ───────────────────────────────────────────
     if not local["ref"] or len(str(local["ref"])) < 8:
@@ -396,19 +564,18 @@ async def handle_screenshot_test(message: types.Message, state: FSMContext, bot:
         return
 
     # ── 4. Verify ──────────────────────────────────────────────────────────────
-    await status_msg.edit_text(
-        f"📡 <b>Querying bank ledger:</b> <code>{local['ref']}</code>...\n"
-        f"<i>Connecting to {local['provider']} (may take up to 30s)...</i>",
-        parse_mode="HTML",
-    )
-    t2        = time.perf_counter()
-    bank_data = await verify_external(local["ref"], local["provider"])
-    t_api     = time.perf_counter() - t2
+    if audit["bank_data"] is None:
+        await status_msg.edit_text(
+            f"📡 <b>Querying bank ledger:</b> <code>{local['ref']}</code>...\n"
+            f"<i>Connecting to {local['provider']} (may take up to {settings.VERIFY_DEADLINE:.0f}s)...</i>",
+            parse_mode="HTML",
+        )
+    bank_data = await verify_receipt(db, audit)
     is_real   = bank_data.get("success", False)
     
 
     # Handle Server / Bank Timeout specifically
-    if bank_data.get("error") and "timed out" in bank_data.get("error", "").lower():
+    if bank_data.get("retryable"):
         await status_msg.edit_text(
             f"⏳ <b>BANK NETWORK DELAY</b>\n"
             f"────────────────────\n"
@@ -422,7 +589,9 @@ async def handle_screenshot_test(message: types.Message, state: FSMContext, bot:
         return
 
     total = time.perf_counter() - start_time
-    print(f"⏱️  Dwn:{t_download:.2f}s | OCR:{t_ocr:.2f}s | API:{t_api:.2f}s | Total:{total:.2f}s")
+    t     = audit["timings"]
+    print(f"⏱️  Dwn:{t['download']:.2f}s | OCR:{t['ocr']:.2f}s | API:{t['api']:.2f}s | "
+          f"Total:{total:.2f}s | Cache:{audit['cached'] or 'miss'}")
 
     # ── 5. Report ──────────────────────────────────────────────────────────────
     is_hilawe = is_hilawe_receiver(local["raw_text"], bank_data)
@@ -445,18 +614,11 @@ async def test_batch_from_db(callback: types.CallbackQuery, bot: Bot, db):
     async def process_one(rec):
         start_time = time.perf_counter()
         try:
-            img_stream = io.BytesIO()
-            file       = await bot.get_file(rec["proof_file_id"])
-            await bot.download_file(file.file_path, destination=img_stream)
-            img_stream.seek(0)
-
-            local     = await extract_local_data(img_stream)
-            bank_data = {}
-            is_real   = False
-
-            if local["ref"]:
-                bank_data = await verify_external(local["ref"], local["provider"])
-                is_real   = bank_data.get("success", False)
+            # Same photo size the audit queue scanned, so the receipt cache answers
+            audit     = await audit_receipt(bot, db, rec["audit_file_id"], rec["audit_file_unique_id"])
+            local     = audit["local"]
+            bank_data = audit["bank_data"]
+            is_real   = bank_data.get("success", False)
 
             is_hilawe      = is_hilawe_receiver(local["raw_text"], bank_data)
             api_amount     = bank_data.get("data", {}).get("amount")
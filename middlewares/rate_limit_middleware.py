@@ -0,0 +1,183 @@
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Async token bucket. Waiters queue on a lock, so tokens are handed out in FIFO order.
+    `pause()` freezes the bucket (used when Telegram answers with retry_after).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = now
+
+    def is_idle(self, now: float) -> bool:
+        """Full and unlocked: safe to drop, a fresh bucket would behave identically."""
+        return not self._lock.locked() and now >= self.paused_until and \
+            self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class TelegramRateLimiter:
+    """
+    One global bucket (~30 msg/s) plus one bucket per chat (~1 msg/s in private chats,
+    20 msg/min in groups). Shared by every module through the Bot session.
+    Chat admin calls (invite links) have their own flood limit and their own bucket,
+    so a kickoff burst never eats message tokens and vice versa.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        global_burst: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        group_burst: float = 3.0,
+        admin_rate: float = 1.0,
+        admin_burst: float = 3.0,
+        max_idle_buckets: int = 5000,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.admin_bucket = TokenBucket(admin_rate, admin_burst)
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.max_idle_buckets = max_idle_buckets
+        self.chats: Dict[Any, TokenBucket] = {}
+        self.flood_waits = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= self.max_idle_buckets:
+                self._prune()
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(
+                self.group_rate if is_group else self.chat_rate,
+                self.group_burst if is_group else self.chat_burst,
+            )
+            self.chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        self.chats = {k: b for k, b in self.chats.items() if not b.is_idle(now)}
+
+    async def acquire(self, chat_id=None, tokens: float = 1.0):
+        # Per-chat first so a slow chat never sits on global tokens
+        if chat_id is not None:
+            await self._chat_bucket(chat_id).acquire(tokens)
+        await self.global_bucket.acquire(tokens)
+
+    def pause(self, seconds: float, chat_id=None):
+        """Telegram flood control: stop everyone, not just the caller that tripped it."""
+        self.flood_waits += 1
+        self.global_bucket.pause(seconds)
+        if chat_id is not None:
+            self._chat_bucket(chat_id).pause(seconds)
+
+    async def acquire_admin(self):
+        await self.admin_bucket.acquire()
+
+    def pause_admin(self, seconds: float):
+        self.flood_waits += 1
+        self.admin_bucket.pause(seconds)
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware: every outgoing send*/copy*/forward* request (and every
+    ADMIN_METHODS call, on the admin bucket) waits for the shared limiter, and
+    TelegramRetryAfter pauses the buckets and retries.
+    """
+
+    LIMITED_PREFIXES = ("Send", "Copy", "Forward")
+    ADMIN_METHODS = ("CreateChatInviteLink",)
+
+    def __init__(self, limiter: Optional[TelegramRateLimiter] = None, max_retries: int = 3):
+        self.limiter = limiter or TelegramRateLimiter()
+        self.max_retries = max_retries
+
+    def _cost(self, method: TelegramMethod) -> tuple[bool, Any, float]:
+        name = type(method).__name__
+        if name in self.ADMIN_METHODS:
+            return True, None, 1.0
+        if not name.startswith(self.LIMITED_PREFIXES):
+            return False, None, 0
+        chat_id = getattr(method, "chat_id", None)
+        media = getattr(method, "media", None)
+        # An album is delivered as one message per item
+        tokens = float(len(media)) if isinstance(media, list) else 1.0
+        return True, chat_id, tokens
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        limited, chat_id, tokens = self._cost(method)
+        if not limited:
+            return await make_request(bot, method)
+        admin = type(method).__name__ in self.ADMIN_METHODS
+
+        attempt = 0
+        while True:
+            if admin:
+                await self.limiter.acquire_admin()
+            else:
+                await self.limiter.acquire(chat_id, tokens)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if admin:
+                    self.limiter.pause_admin(e.retry_after)
+                else:
+                    self.limiter.pause(e.retry_after, chat_id)
+                logger.warning(
+                    f"⏳ Flood control on {type(method).__name__} (chat {chat_id}): "
+                    f"pausing sends for {e.retry_after}s [{attempt}/{self.max_retries}]"
+                )
+                if attempt >= self.max_retries:
+                    raise
@@ -18,6 +18,9 @@ from aiogram.types import ReplyKeyboardRemove
 
 from config import settings
 from database.db import Database
+from database.batch_sink import BatchSink
+from database import segments
+from utils.send_queue import stream_to_workers
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from keyboards import inline as akb
 from testimonial.testimonial_questions import run_testimonial_cycle  # Updated to use your new hybrid keyboard file
@@ -376,59 +379,13 @@ async def on_confirm_launch(callback: types.CallbackQuery, state: FSMContext, bo
 async def confirm_broadcast_target(callback: types.CallbackQuery, state: FSMContext):
     target = callback.data.split(":", 1)[1]  # test | unpaid | paid | all | recent | recent_unpaid
     
-    # Define targeting fragments to inject into the CTE
-    target_filter = ""
-    
-    if target == "unpaid":
-        target_filter = """
-        AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')
-        """
-        
-    elif target == "paid":
-        target_filter = "AND EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')"
-        
-    elif target == "test":
-        target_filter = f"AND u.telegram_id = ANY(ARRAY{settings.ADMIN_IDS}::BIGINT[])"
-        
-    # 🔥 TARGET NEW SEGMENT: Everyone who joined in the last 3 weeks
-    elif target == "recent":
-        target_filter = "AND u.created_at >= NOW() - INTERVAL '3 weeks'"
-        
-    # 🔥 TARGET NEW SEGMENT: Unpaid leads who joined in the last 3 weeks (High-conversion recovery!)
-    elif target == "recent_unpaid":
-        target_filter = """
-        AND u.created_at >= NOW() - INTERVAL '3 weeks'
-        AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')
-        """
-
-    # Use a single, clean CTE. The fallback logic and targeting are handled inside.
-    query = f"""
-    WITH user_prices AS (
-        SELECT 
-            u.telegram_id,
-            COALESCE(s.selected_price, 399) as effective_price
-        FROM users u
-        INNER JOIN products p ON 
-            UPPER(TRIM(u.language)) = UPPER(TRIM(p.language)) AND 
-            UPPER(TRIM(u.gender)) = UPPER(TRIM(p.gender)) AND 
-            UPPER(REPLACE(TRIM(u.level), ' ', '_')) = UPPER(REPLACE(TRIM(p.level), ' ', '_')) AND 
-            u.frequency = p.frequency
-        LEFT JOIN price_survey_results s ON s.user_id = u.telegram_id
-        WHERE p.is_active = TRUE 
-        {target_filter}
-    )
-    SELECT 
-        COUNT(*) as total,
-        COUNT(*) FILTER (WHERE effective_price = 100) as p100,
-        COUNT(*) FILTER (WHERE effective_price = 199) as p199,
-        COUNT(*) FILTER (WHERE effective_price = 299) as p299,
-        COUNT(*) FILTER (WHERE effective_price = 399) as p399,
-        COUNT(*) FILTER (WHERE effective_price = 499) as p499,
-        COUNT(*) FILTER (WHERE effective_price = 700) as p700
-    FROM user_prices
-    """
-
-    stats = await db._pool.fetchrow(query)
+    # Same registry segment (and statement text) the launch will price and queue
+    try:
+        tiers = await segments.price_tiers(db, target, admin_ids=settings.ADMIN_IDS)
+    except ValueError:
+        return await callback.answer("⚠️ Unknown target segment.", show_alert=True)
+    stats = {"total": sum(tiers.values())}
+    stats.update({f"p{price}": tiers.get(price, 0) for price in (100, 199, 299, 399, 499, 700)})
     
     confirm_kb = InlineKeyboardBuilder()
     confirm_kb.button(text="🚀 Launch Broadcast", callback_data=f"confirm_launch:{target}")
@@ -461,209 +418,204 @@ from datetime import datetime, timedelta, timezone
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("BROADCAST_ENGINE")
 
+CAMPAIGN_IMAGE_FILE_ID = "AgACAgQAAxkBAAICD2ml995Hk2v_RvtWWalCMmnL_HVbAAJ_Dmsbkw8xUTFX3jgeoXQOAQADAgADdwADOgQ"  # 🔁 replace this
+# CAMPAIGN_IMAGE_FILE_ID = "AgACAgQAAxkBAALX8Gn94mHeVAmqYUPkO9gE8xL34843AAJTDmsb9b7pU3MRcPN22trVAQADAgADeQADOwQ"  # 🔁 replace this
+
+BLOCKED_MARKERS = ["blocked", "chat not found", "deactivated", "user_is_deactivated"]
+
+# Recipients claimed per round trip; each batch is sent concurrently and paced by the shared limiter
+JOB_BATCH_SIZE = 30
+
+# Result write-back: flush buffered rows every N rows or T seconds
+SINK_MAX_ROWS = 200
+SINK_MAX_DELAY = 0.5
+
+# broadcast_id -> running worker task, so resume/launch never double-drive a job in one process
+_ACTIVE_JOBS: dict[int, asyncio.Task] = {}
+
+
 async def execute_broadcast_run(bot: Bot, db, admin_id: int, target: str):
     """
     Indestructible Broadcast Engine with Social Proof & Real-time Logging.
+    Resolves targets, locks in their deal price, persists them to broadcast_recipients
+    and then drains the queue via run_broadcast_job (which also powers resume-on-startup).
     """
     # 1. Configuration & Safety
-    BATCH_LIMIT = 25  # Respecting Telegram's 30 msg/sec limit
-    semaphore = asyncio.Semaphore(BATCH_LIMIT)
     DEAL_DURATION = int(getattr(settings, "BROADCAST_DURATION_HOURS", 90))
     expires_at = datetime.now(timezone.utc) + timedelta(hours=DEAL_DURATION)
-    
-    # Initialize high-granularity stats
-    stats = {
-        "sent": 0, "failed": 0, "deleted": 0, "skipped_cleanup": 0,
-        "100": 0, "199": 0, "299": 0, "399": 0, "499": 0, "700": 0
-    }
 
-    # 2. Optimized Data Fetching (Injecting survey price directly)
-    base_query = """
-        SELECT 
-            u.telegram_id, u.language, u.full_name, u.gender, p.id as p_id, 
-            COALESCE(s.selected_price, 399) as final_price
-        FROM users u
-        INNER JOIN products p ON 
-            u.language = p.language AND u.gender = p.gender AND 
-            u.level = p.level AND u.frequency = p.frequency
-        LEFT JOIN price_survey_results s ON s.user_id = u.telegram_id
-        WHERE p.is_active = TRUE
-    """
-    
-    if target == "unpaid":
-            base_query += """
-            AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')
-            """
-    elif target == "paid":
-        base_query += " AND EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')"
-    elif target == "test":
-        base_query += f" AND u.telegram_id = ANY(ARRAY{settings.ADMIN_IDS}::BIGINT[])"
-    
-    # 🔥 Add these two new target blocks here:
-    elif target == "recent":
-        base_query += " AND u.created_at >= NOW() - INTERVAL '3 weeks'"
-    elif target == "recent_unpaid":
-        base_query += """
-            AND u.created_at >= NOW() - INTERVAL '3 weeks' 
-            AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.user_id = u.telegram_id AND pay.status = 'approved')
-        """
-
-    targets = await db._pool.fetch(base_query)
-    
-    
-    if not targets:
+    # 2. Audience comes from the segment registry (survey price injected by the deal source)
+    target_spec = segments.deal_targets(target, admin_ids=settings.ADMIN_IDS)
+
+    # 3. Lock in prices and persist the recipient queue (the durable source of truth
+    # from here on) with a single UPDATE ... FROM (targets) RETURNING -> INSERT round trip.
+    broadcast_id = await db.create_broadcast_job(
+        name=f"flash_deal_{target}",
+        target_filter=target,
+        expires_at=expires_at,
+        admin_id=admin_id,
+    )
+    try:
+        queued = await db.apply_campaign_pricing(target_spec, expires_at, broadcast_id=broadcast_id)
+    except Exception:
+        await db.finish_broadcast(broadcast_id, "cancelled")
+        raise
+
+    if not queued:
+        await db.finish_broadcast(broadcast_id, "cancelled")
         logger.warning(f"⚠️ Broadcast aborted: No users found for target '{target}'")
         return {"error": "No users found"}
 
-    logger.info(f"🚀 Initializing broadcast for {len(targets)} targets...")
+    total = await db.activate_broadcast(broadcast_id)
+    logger.info(f"📦 Broadcast #{broadcast_id} queued with {total} priced targets")
 
-    # 3. Synchronized Pre-Update (Locking in prices before sending)
-    sync_data = [(t['final_price'], expires_at, t['telegram_id']) for t in targets]
-    await db._pool.executemany(
-        "UPDATE users SET deal_price = $1, deal_expires_at = $2 WHERE telegram_id = $3",
-        sync_data
-    )
+    # 4. Drain the queue
+    return await start_broadcast_job(bot, db, broadcast_id)
 
-    # 4. Atomic & Fault-Tolerant Sender Task
-    CAMPAIGN_IMAGE_FILE_ID = "AgACAgQAAxkBAAICD2ml995Hk2v_RvtWWalCMmnL_HVbAAJ_Dmsbkw8xUTFX3jgeoXQOAQADAgADdwADOgQ"  # 🔁 replace this
-    # CAMPAIGN_IMAGE_FILE_ID = "AgACAgQAAxkBAALX8Gn94mHeVAmqYUPkO9gE8xL34843AAJTDmsb9b7pU3MRcPN22trVAQADAgADeQADOwQ"  # 🔁 replace this
-    
-    
-    
-    async def send_to_user(user):
-        uid = user['telegram_id']
-        price_key = str(int(user['final_price']))
-    
-        async with semaphore:
-            try:
-                text, kb = build_deal_message(
-                    lang=user['language'],
-                    product_id=user['p_id'],
-                    price=int(user['final_price']),
-                    full_name=user.get('full_name', ''),
-                    gender=user.get('gender', 'MALE') # <-- PASSING GENDER HERE
-                )
 
-    
-                # ── SEND PHOTO WITH TEXT AS CAPTION ──────────────
-                # Telegram caption limit is 1024 chars.
-                # If your text ever exceeds that, we fall back to
-                # photo + separate text message automatically.
-    
-                if len(text) <= 1024:
-                    sent_msg = await bot.send_photo(
-                        chat_id=uid,
-                        photo=CAMPAIGN_IMAGE_FILE_ID,
-                        caption=text,
-                        reply_markup=kb,
-                        parse_mode="HTML"
-                    )
-                else:
-                    # Caption too long — send photo clean, text below
-                    await bot.send_photo(
-                        chat_id=uid,
-                        photo=CAMPAIGN_IMAGE_FILE_ID,
-                        parse_mode="HTML"
-                    )
-                    sent_msg = await bot.send_message(
-                        chat_id=uid,
-                        text=text,
-                        reply_markup=kb,
-                        parse_mode="HTML"
-                    )
-                # ─────────────────────────────────────────────────
-    
-                await db._pool.execute(
-                    "UPDATE users SET last_broadcast_msg_id = $1, matched_product_id = $2 WHERE telegram_id = $3",
-                    sent_msg.message_id, user['p_id'], uid
-                )
-    
-                stats["sent"] += 1
-                if price_key in stats:
-                    stats[price_key] += 1
-                logger.info(f"✅ Delivered: {uid} | Price: {price_key}")
-    
-            except Exception as e:
-                stats["failed"] += 1
-                err = str(e).lower()
-                logger.error(f"❌ Delivery Failed for {uid}: {err}")
-    
-                if any(x in err for x in ["blocked", "chat not found", "deactivated", "user_is_deactivated"]):
-                    try:
-                        await db._pool.execute("DELETE FROM users WHERE telegram_id = $1", uid)
-                        stats["deleted"] += 1
-                        logger.info(f"🗑 Cleaned user {uid} from database.")
-                    except Exception as db_err:
-                        stats["skipped_cleanup"] += 1
-                        logger.warning(f"⚠️ Could not delete {uid} (Referenced in payments): {db_err}")
-    
-            await asyncio.sleep(0.05)
+async def _deliver_deal(bot: Bot, rec) -> tuple[str, str | None, int | None]:
+    """
+    Sends one personalised deal card. Returns (recipient_status, error, message_id).
+    No DB writes here: the caller buffers results and writes them back in batches.
+    """
+    uid = rec['telegram_id']
+    try:
+        text, kb = build_deal_message(
+            lang=rec['language'],
+            product_id=rec['product_id'],
+            price=int(rec['price']),
+            full_name=rec['full_name'] or '',
+            gender=rec['gender'] or 'MALE' # <-- PASSING GENDER HERE
+        )
 
-    # async def send_to_user(user):
-    #         uid = user['telegram_id']
-    #         price_key = str(int(user['final_price']))
-        
-    #         async with semaphore:
-    #             try:
-    #                 # የፅሁፍ መልዕክቱን እና በተንቀሳቃሽ ቁልፉን ማዘጋጀት
-    #                 text, kb = build_deal_message(
-    #                     lang=user['language'],
-    #                     product_id=user['p_id'],
-    #                     price=int(user['final_price'])
-    #                 )
-        
-    #                 # ── 1. መጀመሪያ የድምፅ መልዕክቱን መላክ ──────────────────
-    #                 await bot.send_voice(
-    #                     chat_id=uid,
-    #                     voice=CAMPAIGN_VOICE_FILE_ID
-    #                 )
-                    
-    #                 # ── 2. በመቀጠል ሙሉ የፅሁፍ መረጃውን ከቁልፍ ጋር መላክ ───────
-    #                 # የፅሁፍ ገደብ (1024) ስጋት የለብንም ምክንያቱም send_message እስከ 4096 ቁምፊዎችን ያስተናግዳል።
-    #                 sent_msg = await bot.send_message(
-    #                     chat_id=uid,
-    #                     text=text,
-    #                     reply_markup=kb,
-    #                     parse_mode="HTML"
-    #                 )
-    #                 # ─────────────────────────────────────────────────
-        
-    #                 # የላክነውን የፅሁፍ መልዕክት ID በዳታቤዝ ውስጥ ማስቀመጥ (ለክፍያ ማረጋገጫ ሂደት እንዲጠቅመን)
-    #                 await db._pool.execute(
-    #                     "UPDATE users SET last_broadcast_msg_id = $1, matched_product_id = $2 WHERE telegram_id = $3",
-    #                     sent_msg.message_id, user['p_id'], uid
-    #                 )
-        
-    #                 stats["sent"] += 1
-    #                 if price_key in stats:
-    #                     stats[price_key] += 1
-    #                 logger.info(f"✅ Delivered Voice + Msg: {uid} | Price: {price_key}")
-        
-    #             except Exception as e:
-    #                 stats["failed"] += 1
-    #                 err = str(e).lower()
-    #                 logger.error(f"❌ Delivery Failed for {uid}: {err}")
-        
-    #                 if any(x in err for x in ["blocked", "chat not found", "deactivated", "user_is_deactivated"]):
-    #                     try:
-    #                         await db._pool.execute("DELETE FROM users WHERE telegram_id = $1", uid)
-    #                         stats["deleted"] += 1
-    #                         logger.info(f"🗑 Cleaned user {uid} from database.")
-    #                     except Exception as db_err:
-    #                         stats["skipped_cleanup"] += 1
-    #                         logger.warning(f"⚠️ Could not delete {uid} (Referenced in payments): {db_err}")
-        
-    #             await asyncio.sleep(0.05)
-    
+        # ── SEND PHOTO WITH TEXT AS CAPTION ──────────────
+        # Telegram caption limit is 1024 chars.
+        # If your text ever exceeds that, we fall back to
+        # photo + separate text message automatically.
+
+        if len(text) <= 1024:
+            sent_msg = await bot.send_photo(
+                chat_id=uid,
+                photo=CAMPAIGN_IMAGE_FILE_ID,
+                caption=text,
+                reply_markup=kb,
+                parse_mode="HTML"
+            )
+        else:
+            # Caption too long — send photo clean, text below
+            await bot.send_photo(
+                chat_id=uid,
+                photo=CAMPAIGN_IMAGE_FILE_ID,
+                parse_mode="HTML"
+            )
+            sent_msg = await bot.send_message(
+                chat_id=uid,
+                text=text,
+                reply_markup=kb,
+                parse_mode="HTML"
+            )
+        # ─────────────────────────────────────────────────
 
-    # 6. Parallel Non-Blocking Execution
-    await asyncio.gather(*(send_to_user(u) for u in targets))
+        logger.info(f"✅ Delivered: {uid} | Price: {rec['price']}")
+        return "sent", None, sent_msg.message_id
+
+    except Exception as e:
+        err = str(e).lower()
+        logger.error(f"❌ Delivery Failed for {uid}: {err}")
+
+        # Blocked users are pruned in one batched DELETE once the job finishes
+        if any(x in err for x in BLOCKED_MARKERS):
+            return "blocked", err[:500], None
+        return "failed", err[:500], None
+
+
+async def run_broadcast_job(bot: Bot, db, broadcast_id: int):
+    """
+    Drains broadcast_recipients for one broadcast. Safe to call again after a crash:
+    only 'pending' rows are claimed, and broadcasts.sent_count/failed_count are
+    updated after every batch so the table doubles as the live progress record.
+    The counters are rebuilt from broadcast_recipients on start and on finish.
+    """
+    job = await db.get_broadcast(broadcast_id)
+    if not job:
+        logger.warning(f"⚠️ Broadcast #{broadcast_id} not found")
+        return None
+
+    sent, failed = await db.recount_broadcast_stats(broadcast_id)
+    cancelled = False
+
+    # Producer: claims pending rows in batches (FOR UPDATE SKIP LOCKED) until the queue is empty
+    async def claimed_batches():
+        nonlocal cancelled
+        while True:
+            if await db._pool.fetchval("SELECT cancelled FROM broadcasts WHERE id = $1", broadcast_id):
+                cancelled = True
+                return
+
+            batch = await db.claim_broadcast_batch(broadcast_id, JOB_BATCH_SIZE)
+            if not batch:
+                return
+
+            await db.update_broadcast_stats(broadcast_id, sent, failed)
+            yield batch
+
+    # Per-recipient results are buffered and written back with set-based statements
+    status_sink = BatchSink(
+        lambda rows: db.bulk_mark_broadcast_recipients(broadcast_id, rows),
+        max_rows=SINK_MAX_ROWS, max_delay=SINK_MAX_DELAY, name=f"broadcast#{broadcast_id}:status",
+    )
+    message_sink = BatchSink(
+        db.bulk_set_broadcast_messages,
+        max_rows=SINK_MAX_ROWS, max_delay=SINK_MAX_DELAY, name=f"broadcast#{broadcast_id}:messages",
+    )
+
+    # Consumers: no local pacing, the Bot session limiter (app_context) spaces every send
+    async def send_one(rec):
+        nonlocal sent, failed
+        uid = rec['telegram_id']
+        status, error, message_id = await _deliver_deal(bot, rec)
+        await status_sink.add((uid, status, error))
+        if message_id:
+            await message_sink.add((uid, message_id, rec['product_id']))
+        if status == "sent":
+            sent += 1
+        else:
+            failed += 1
+
+    try:
+        await stream_to_workers(
+            claimed_batches(), send_one,
+            workers=settings.BROADCAST_WORKERS, maxsize=JOB_BATCH_SIZE * 2,
+        )
+    finally:
+        await status_sink.close()
+        await message_sink.close()
+        sent, failed = await db.recount_broadcast_stats(broadcast_id)
+
+    # One batched prune for everyone who blocked the bot during this job
+    blocked_ids = await db.get_broadcast_recipient_ids(broadcast_id, "blocked")
+    if blocked_ids:
+        deleted_ids = await db.prune_blocked_users(blocked_ids)
+        await db.mark_broadcast_recipients(broadcast_id, deleted_ids, "deleted", "blocked")
+        logger.info(f"🗑 Cleaned {len(deleted_ids)}/{len(blocked_ids)} blocked users from database.")
+
+    await db.finish_broadcast(broadcast_id, "cancelled" if cancelled else "completed")
+
+    # 7. Premium Admin Insight Report (built from the durable queue, so it survives restarts)
+    breakdown = await db.get_broadcast_breakdown(broadcast_id)
+    counts = breakdown["statuses"]
+    tiers = breakdown["tiers"]
+    stats = {
+        "sent": sent,
+        "failed": failed,
+        "deleted": counts.get("deleted", 0),
+        "skipped_cleanup": counts.get("blocked", 0),
+        **{k: tiers.get(k, 0) for k in ("100", "199", "299", "399", "499", "700")},
+    }
+    logger.info(f"🏁 Broadcast #{broadcast_id} finished. Success: {stats['sent']}, Failed: {stats['failed']}")
 
-    # 7. Premium Admin Insight Report
-    logger.info(f"🏁 Broadcast finished. Success: {stats['sent']}, Failed: {stats['failed']}")
-    
     summary = (
-        f"🏁 <b>BROADCAST ENGINE COMPLETE</b>\n"
+        f"🏁 <b>BROADCAST ENGINE {'CANCELLED' if cancelled else 'COMPLETE'}</b> <code>#{broadcast_id}</code>\n"
         f"━━━━━━━━━━━━━━\n"
         f"✅ <b>Delivered:</b> <code>{stats['sent']}</code>\n"
         f"❌ <b>Failed:</b> <code>{stats['failed']}</code>\n"
@@ -679,34 +631,84 @@ async def execute_broadcast_run(bot: Bot, db, admin_id: int, target: str):
         f"━━━━━━━━━━━━━━\n"
         f"ℹ️ <i>Real-time logs available in console.</i>"
     )
-    
-    await bot.send_message(admin_id, summary, parse_mode="HTML")
+
+    if job['admin_id']:
+        try:
+            await bot.send_message(job['admin_id'], summary, parse_mode="HTML")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not deliver broadcast summary to {job['admin_id']}: {e}")
     return stats
 
+
+def start_broadcast_job(bot: Bot, db, broadcast_id: int) -> asyncio.Task:
+    """Spawns run_broadcast_job unless this process is already driving that broadcast."""
+    task = _ACTIVE_JOBS.get(broadcast_id)
+    if task and not task.done():
+        return task
+    task = asyncio.create_task(run_broadcast_job(bot, db, broadcast_id))
+    _ACTIVE_JOBS[broadcast_id] = task
+    task.add_done_callback(lambda _t: _ACTIVE_JOBS.pop(broadcast_id, None))
+    return task
+
+
+async def resume_broadcasts(bot: Bot, db):
+    """Startup hook: picks up every broadcast that was still running when the process died."""
+    try:
+        jobs = await db.get_resumable_broadcasts()
+    except Exception as e:
+        logger.error(f"❌ Could not load resumable broadcasts: {e}")
+        return
+
+    for job in jobs:
+        logger.info(f"♻️ Resuming broadcast #{job['id']} ({job['sent_count']}/{job['total_target']} sent)")
+        start_broadcast_job(bot, db, job['id'])
+
+@router.message(Command("broadcast_status"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def broadcast_status(message: types.Message):
+    """Live progress straight from the broadcasts table."""
+    rows = await db.get_active_broadcasts(limit=5)
+    if not rows:
+        return await message.answer("📭 No broadcasts recorded yet.")
+
+    lines = ["📡 <b>BROADCAST JOBS</b>", "━━━━━━━━━━━━━━"]
+    for r in rows:
+        total = r['total_target'] or 0
+        done = (r['sent_count'] or 0) + (r['failed_count'] or 0)
+        pct = (done / total * 100) if total else 0
+        lines.append(
+            f"<code>#{r['id']}</code> {r['target_filter'] or r['name'] or '-'} • <b>{(r['status'] or '').upper()}</b>\n"
+            f"├ ✅ {r['sent_count'] or 0}  ❌ {r['failed_count'] or 0}  / {total}\n"
+            f"└ Progress: <code>{pct:.1f}%</code>"
+        )
+    lines.append("<i>Stop a running job with /broadcast_cancel &lt;id&gt;</i>")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("broadcast_cancel"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def broadcast_cancel(message: types.Message):
+    args = message.text.split()
+    if len(args) < 2 or not args[1].isdigit():
+        return await message.answer("Usage: /broadcast_cancel 12")
+    result = await db._pool.execute(
+        "UPDATE broadcasts SET cancelled = TRUE WHERE id = $1 AND status = 'running'", int(args[1])
+    )
+    if result == "UPDATE 0":
+        return await message.answer("⚠️ No running broadcast with that id.")
+    await message.answer(f"🛑 Broadcast <code>#{args[1]}</code> will stop after the current batch.", parse_mode="HTML")
+
+
 @router.message(F.text == "/broadcast_dryrun", F.from_user.id.in_(settings.ADMIN_IDS))
 async def broadcast_dryrun(message: types.Message):
     try:
-        # One query to rule them all: Single pass over the user/product join
-        stats = await db._pool.fetchrow("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE NOT EXISTS (
-                    SELECT 1 FROM payments p WHERE p.user_id = u.telegram_id AND p.status = 'approved'
-                )) as unpaid_count,
-                COUNT(*) FILTER (WHERE EXISTS (
-                    SELECT 1 FROM payments p WHERE p.user_id = u.telegram_id AND p.status = 'approved'
-                )) as paid_count,
-                COUNT(*) FILTER (WHERE prod.price = 100) as tier_100,
-                COUNT(*) FILTER (WHERE prod.price = 199) as tier_199,
-                COUNT(*) FILTER (WHERE prod.price = 299) as tier_299,
-                COUNT(*) FILTER (WHERE prod.price = 399) as tier_399,
-                COUNT(*) FILTER (WHERE prod.price = 499) as tier_499
-            FROM users u
-            LEFT JOIN products prod ON 
-                u.language = prod.language AND u.gender = prod.gender AND 
-                u.level = prod.level AND u.frequency = prod.frequency
-            WHERE prod.is_active = TRUE
-        """)
+        # Precomputed segment counts (one pass over the user/product join, cached briefly)
+        sizes = await segments.counts(db, "all", "unpaid", "paid")
+        tiers = await segments.product_price_tiers(db, "all")
+        stats = {
+            "total": sizes["all"],
+            "unpaid_count": sizes["unpaid"],
+            "paid_count": sizes["paid"],
+            **{f"tier_{price}": tiers.get(price, 0) for price in (100, 199, 299, 399, 499)},
+        }
 
         report = (
             f"📊 <b>BROADCAST PRE-FLIGHT DATA</b>\n"
@@ -803,6 +805,7 @@ async def cleanup_flash_deal(message: types.Message, bot: Bot, db):
 
     # 4. Clear the database columns so we are ready for the next deal
     await db._pool.execute("UPDATE users SET last_broadcast_msg_id = NULL")
+    db.invalidate_user()
 
     # 5. Final Report
     report = (
@@ -6,7 +6,7 @@ import logging
 from datetime import datetime, timezone
 
 from aiogram import Bot, F, Router, types
-from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.exceptions import TelegramForbiddenError
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -14,6 +14,8 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config import settings
 from database.db import Database
+from database import segments
+from utils.send_queue import stream_to_workers
 
 
 router = Router(name="product_feedback")
@@ -325,9 +327,9 @@ async def request_product_feedback_preview(
     await state.clear()
     await ensure_feedback_schema(db)
 
-    stats = await db._pool.fetchrow(
+    stats_query, stats_args = segments.select(
+        "feedback_due",
         """
-        SELECT
             COUNT(*)::INT AS eligible,
             COUNT(*) FILTER (
                 WHERE UPPER(COALESCE(u.language, 'EN')) = 'AM'
@@ -335,25 +337,10 @@ async def request_product_feedback_preview(
             COUNT(*) FILTER (
                 WHERE UPPER(COALESCE(u.language, 'EN')) = 'EN'
             )::INT AS en_count
-        FROM users u
-        WHERE EXISTS (
-            SELECT 1
-            FROM payments p
-            WHERE p.user_id = u.telegram_id
-              AND p.status = 'approved'
-              AND COALESCE(p.approved_at, p.created_at)
-                    <= NOW() - INTERVAL '2 days'
-        )
-        AND NOT EXISTS (
-            SELECT 1
-            FROM product_feedback_sessions fs
-            WHERE fs.user_id = u.telegram_id
-              AND fs.campaign_key = $1
-              AND fs.status = 'completed'
-        )
         """,
-        CAMPAIGN_KEY,
+        campaign_key=CAMPAIGN_KEY,
     )
+    stats = await db._pool.fetchrow(stats_query, *stats_args)
 
     en_text, en_kb = build_feedback_broadcast("EN")
     am_text, am_kb = build_feedback_broadcast("AM")
@@ -479,30 +466,11 @@ async def launch_product_feedback_broadcast(
         parse_mode="HTML",
     )
 
-    targets = await db._pool.fetch(
-        """
-        SELECT
-            u.telegram_id,
-            UPPER(COALESCE(u.language, 'EN')) AS language
-        FROM users u
-        WHERE EXISTS (
-            SELECT 1
-            FROM payments p
-            WHERE p.user_id = u.telegram_id
-              AND p.status = 'approved'
-              AND COALESCE(p.approved_at, p.created_at)
-                    <= NOW() - INTERVAL '2 days'
-        )
-        AND NOT EXISTS (
-            SELECT 1
-            FROM product_feedback_sessions fs
-            WHERE fs.user_id = u.telegram_id
-              AND fs.campaign_key = $1
-              AND fs.status = 'completed'
-        )
-        ORDER BY u.telegram_id
-        """,
-        CAMPAIGN_KEY,
+    targets_query, targets_args = segments.select(
+        "feedback_due",
+        "u.telegram_id, UPPER(COALESCE(u.language, 'EN')) AS language",
+        order_by="u.telegram_id",
+        campaign_key=CAMPAIGN_KEY,
     )
 
     stats = {
@@ -511,46 +479,38 @@ async def launch_product_feedback_broadcast(
         "blocked": 0,
     }
 
-    semaphore = asyncio.Semaphore(20)
-
+    # Pacing and flood-control retries are handled by the shared Bot session limiter
     async def send_to_user(record):
         uid = record["telegram_id"]
         lang = record["language"]
 
-        async with semaphore:
-            text, markup = build_feedback_broadcast(lang)
+        text, markup = build_feedback_broadcast(lang)
 
-            while True:
-                try:
-                    await bot.send_message(
-                        chat_id=uid,
-                        text=text,
-                        reply_markup=markup,
-                        parse_mode="HTML",
-                    )
-                    stats["sent"] += 1
-                    break
-
-                except TelegramRetryAfter as exc:
-                    await asyncio.sleep(exc.retry_after)
-
-                except TelegramForbiddenError:
-                    stats["blocked"] += 1
-                    break
-
-                except Exception as exc:
-                    stats["failed"] += 1
-                    logger.exception(
-                        "Feedback broadcast failed for %s: %s",
-                        uid,
-                        exc,
-                    )
-                    break
+        try:
+            await bot.send_message(
+                chat_id=uid,
+                text=text,
+                reply_markup=markup,
+                parse_mode="HTML",
+            )
+            stats["sent"] += 1
+
+        except TelegramForbiddenError:
+            stats["blocked"] += 1
 
-            await asyncio.sleep(0.05)
+        except Exception as exc:
+            stats["failed"] += 1
+            logger.exception(
+                "Feedback broadcast failed for %s: %s",
+                uid,
+                exc,
+            )
 
-    await asyncio.gather(
-        *(send_to_user(record) for record in targets)
+    # Targets are streamed in keyset pages into a bounded worker queue
+    total = await stream_to_workers(
+        db.iter_chunks(targets_query, *targets_args),
+        send_to_user,
+        workers=settings.BROADCAST_WORKERS,
     )
 
     report = (
@@ -559,7 +519,7 @@ async def launch_product_feedback_broadcast(
         f"✅ Delivered: <code>{stats['sent']}</code>\n"
         f"🚫 Blocked: <code>{stats['blocked']}</code>\n"
         f"❌ Failed: <code>{stats['failed']}</code>\n"
-        f"👥 Total selected: <code>{len(targets)}</code>"
+        f"👥 Total selected: <code>{total}</code>"
     )
 
     await bot.send_message(
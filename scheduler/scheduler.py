@@ -4,6 +4,7 @@ from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import settings
 from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from database.batch_sink import BatchSink
 
 
 async def check_and_send_reminders(bot: Bot, db):
@@ -26,8 +27,12 @@ async def check_and_send_reminders(bot: Bot, db):
 
     sent_count = 0
     failed_count = 0
+    # `reminded = TRUE` is written back in batches instead of once per user
+    reminded_sink = BatchSink(db.mark_users_reminded, name="reminders")
 
-    for user in ghost_users:
+    # Sends run concurrently; the shared Bot session limiter keeps them under Telegram's caps
+    async def remind(user):
+        nonlocal sent_count, failed_count
         uid = user["user_id"]
         lang = user["language"]
         level = user["level"].upper() if user["level"] else "TRANSFORMATION"
@@ -83,18 +88,15 @@ async def check_and_send_reminders(bot: Bot, db):
 
         try:
             await bot.send_message(uid, text, reply_markup=kb, parse_mode="HTML")
-            await db._pool.execute(
-                "UPDATE users SET reminded = TRUE WHERE telegram_id = $1", uid
-            )
+            await reminded_sink.add(uid)
             sent_count += 1
-            await asyncio.sleep(0.05)  # anti-flood
 
         except TelegramForbiddenError:
             logging.warning(f"🚫 User {uid} blocked the bot. Skipping.")
             failed_count += 1
         except TelegramRetryAfter as e:
-            logging.error(f"⏳ Flood limit hit. Sleeping {e.retry_after}s")
-            await asyncio.sleep(e.retry_after)
+            logging.error(f"⏳ Flood limit still hit after retries for {uid} ({e.retry_after}s)")
+            failed_count += 1
         except TelegramAPIError as e:
             logging.error(f"⚠️ Telegram API Error for {uid}: {e}")
             failed_count += 1
@@ -102,6 +104,9 @@ async def check_and_send_reminders(bot: Bot, db):
             logging.error(f"❓ Unknown error for {uid}: {type(e).__name__}: {e}")
             failed_count += 1
 
+    async with reminded_sink:
+        await asyncio.gather(*(remind(u) for u in ghost_users))
+
     # ─────────────────────────────────────────────
     # ADMIN REPORT
     # ─────────────────────────────────────────────
@@ -166,6 +171,7 @@ async def test_reminder_for_user(bot: Bot, db, user_id: int):
         await db._pool.execute(
             "UPDATE users SET reminded = TRUE WHERE telegram_id = $1", user_id
         )
+        db.invalidate_user(user_id)
 
         # Notify your group/admin log channel
         admin_report = (
@@ -0,0 +1,188 @@
+# audit_queue.py
+"""
+Receipt audit pipeline: proofs are persisted in receipt_audits by the payment handlers
+and drained here by a fixed pool of workers.
+
+  - `workers` bounds how many audits run at once; everything else waits in the table
+    (backpressure lives in Postgres, not in unbounded asyncio tasks)
+  - StageLimits caps each resource separately: Telegram downloads, CPU work
+    (preprocessing + local OCR) and remote calls (OCR.space + verify API)
+  - a failing job is retried with exponential backoff up to `max_attempts`, then
+    marked failed and handed to a human; a job whose worker died is taken over once
+    its lease expires
+
+Job handlers register per kind (`@audit_handler("payment")`) and receive
+(bot, db, job, queue); they may return the audit stage timings for the metrics.
+A handler raises RetryAudit when the outcome is not a verdict yet (bank unreachable),
+so the job goes back to the table with backoff like any other failure.
+"""
+import asyncio
+import html
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from database.db import Database
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("download", "ocr", "api")
+
+_HANDLERS: Dict[str, Callable[..., Awaitable[Optional[dict]]]] = {}
+
+
+class RetryAudit(Exception):
+    """Transient audit outcome: reschedule the job instead of finishing it."""
+
+
+def audit_handler(kind: str):
+    def decorator(fn):
+        _HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+class StageLimits:
+    """Separate concurrency caps per resource; handed down to verify.scan_receipt."""
+
+    def __init__(self, download: int = 4, cpu: int = 2, remote: int = 4):
+        self.download = asyncio.Semaphore(download)
+        self.cpu = asyncio.Semaphore(cpu)
+        self.remote = asyncio.Semaphore(remote)
+
+
+class AuditQueue:
+    def __init__(self, db: "Database", bot: "Bot", workers: int = 4, limits: Optional[StageLimits] = None,
+                 max_attempts: int = 4, retry_base: float = 15.0, lease_seconds: float = 300.0,
+                 poll_interval: float = 5.0):
+        self.db = db
+        self.bot = bot
+        self.workers = workers
+        self.limits = limits or StageLimits()
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.stage_latency: Dict[str, float] = {}
+
+    async def enqueue(self, kind: str, payment_id: int, user_id: int, file_id: str,
+                      file_unique_id: Optional[str] = None, context: Optional[dict] = None) -> int:
+        job_id = await self.db.enqueue_receipt_audit(kind, payment_id, user_id, file_id, file_unique_id, context or {})
+        self._wake.set()
+        return job_id
+
+    async def set_admin_message(self, job: dict, chat_id: int, message_id: int):
+        """Remembers the founder alert so a retried job replies to it instead of re-posting."""
+        job["admin_chat_id"], job["admin_message_id"] = chat_id, message_id
+        await self.db.set_receipt_audit_message(job["id"], chat_id, message_id)
+
+    def _record(self, timings: Optional[dict]):
+        for stage in STAGES:
+            seconds = (timings or {}).get(stage)
+            if seconds:
+                prev = self.stage_latency.get(stage)
+                self.stage_latency[stage] = seconds if prev is None else 0.3 * seconds + 0.7 * prev
+
+    async def _run(self, job: dict):
+        handler = _HANDLERS.get(job["kind"])
+        if handler is None:
+            await self.db.retry_receipt_audit(job["id"], f"no handler for '{job['kind']}'", None)
+            return
+        try:
+            timings = await handler(self.bot, self.db, job, self)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job["attempts"] < self.max_attempts:
+                delay = self.retry_base * 2 ** (job["attempts"] - 1)
+                logger.warning(f"⚠️ Audit #{job['id']} ({job['kind']} #{job['payment_id']}) failed, retry in {delay:.0f}s: {error}")
+                await self.db.retry_receipt_audit(job["id"], error, delay)
+            else:
+                logger.error(f"❌ Audit #{job['id']} gave up after {job['attempts']} attempts: {error}")
+                await self.db.retry_receipt_audit(job["id"], error, None)
+                await self._escalate(job, error)
+            return
+        self._record(timings)
+        await self.db.finish_receipt_audit(job["id"], timings)
+
+    async def _escalate(self, job: dict, error: str):
+        if not job.get("admin_message_id"):
+            return
+        try:
+            await self.bot.send_message(
+                job["admin_chat_id"],
+                f"🤖 <b>AI SCAN: GAVE UP AFTER {job['attempts']} ATTEMPTS 🧐</b>\n"
+                f"────────────────────\n"
+                f"⚠️ <code>{html.escape(error[:300])}</code>\n"
+                f"🛡️ <i>Manual review required.</i>",
+                reply_to_message_id=job["admin_message_id"],
+                parse_mode="HTML",
+            )
+        except Exception as e:
+            logger.error(f"Audit escalation failed for #{job['id']}: {e}")
+
+    async def _worker(self, n: int):
+        while True:
+            try:
+                job = await self.db.claim_receipt_audit(self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audit worker {n} claim failed: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            self.busy += 1
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Audit worker {n} crashed on job #{job['id']}: {e}")
+            finally:
+                self.busy -= 1
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+            logger.info(f"🧾 Receipt audit queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def metrics(self) -> dict:
+        m = await self.db.get_receipt_audit_metrics()
+        m["workers"], m["busy"] = self.workers, self.busy
+        m["stages"] = {k: round(v, 2) for k, v in self.stage_latency.items()}
+        return m
+
+    async def format_metrics(self) -> str:
+        m = await self.metrics()
+
+        def secs(v):
+            return f"{float(v):.1f}s" if v is not None else "n/a"
+
+        stages = " · ".join(f"{k} {v:.2f}s" for k, v in m["stages"].items()) or "n/a"
+        return (
+            f"Audit queue: {m['queued']} queued ({m['retrying']} retrying) · "
+            f"{m['busy']}/{m['workers']} workers busy · oldest {secs(m['oldest_queued'])}\n"
+            f"• last hour: {m['done_1h']} done · p50 {secs(m['total_p50'])} · p95 {secs(m['total_p95'])} "
+            f"· wait p95 {secs(m['wait_p95'])}\n"
+            f"• stages: {stages}\n"
+            f"• failed (24h): {m['failed_24h']}"
+        )
@@ -0,0 +1,229 @@
+# ocr_engine.py
+"""
+OCR engine abstraction behind handlers/verify.extract_local_data.
+
+Backends:
+  - TesseractBackend: local tesseract-ocr (installed in the Dockerfile) in a process pool
+  - RemoteBackend:    any async bytes -> text callable (OCR.space today)
+
+Modes:
+  - "local" / "remote": always use that backend (the other one is the fallback)
+  - "race":  run every backend at once, first usable text wins, the rest are cancelled
+  - "auto":  race until each backend has a few samples, then route to the backend with
+             the best latency/usability score; re-race every `explore_every` calls so a
+             backend that got faster (or recovered) is noticed
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODES = ("auto", "race", "local", "remote")
+
+
+# ─────────────────────────────────────────────
+#  BACKENDS
+# ─────────────────────────────────────────────
+def _tesseract_worker(image_bytes: bytes, lang: str, config: str, timeout: float) -> str:
+    """Runs inside the OCR process pool (must stay module-level to be picklable)."""
+    import pytesseract
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != "L":
+        img = img.convert("L")
+    return pytesseract.image_to_string(img, lang=lang, config=config, timeout=timeout)
+
+
+class OcrBackend:
+    name = "base"
+    kind = "remote"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    async def recognize(self, image_bytes: bytes) -> str:
+        raise NotImplementedError
+
+
+class TesseractBackend(OcrBackend):
+    name = "tesseract"
+    kind = "local"
+
+    def __init__(self, executor: ProcessPoolExecutor, lang: str = "eng",
+                 config: str = "--oem 1 --psm 6", timeout: float = 15.0):
+        self.executor = executor
+        self.lang = lang
+        self.config = config
+        self.timeout = timeout
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                self._available = True
+            except Exception as e:
+                logger.warning(f"⚠️ Tesseract unavailable, local OCR disabled: {e}")
+                self._available = False
+        return self._available
+
+    async def recognize(self, image_bytes: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, _tesseract_worker, image_bytes, self.lang, self.config, self.timeout
+        )
+
+
+class RemoteBackend(OcrBackend):
+    kind = "remote"
+
+    def __init__(self, name: str, fn: Callable[[bytes], Awaitable[str]]):
+        self.name = name
+        self.fn = fn
+
+    async def recognize(self, image_bytes: bytes) -> str:
+        return await self.fn(image_bytes)
+
+
+# ─────────────────────────────────────────────
+#  ENGINE
+# ─────────────────────────────────────────────
+class BackendStats:
+    """EWMA latency and usability per backend; feeds auto mode."""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.usable_rate = 1.0
+        self.samples = 0
+        self.wins = 0
+
+    def record(self, seconds: float, usable: bool):
+        a = self.alpha
+        self.latency = seconds if self.latency is None else a * seconds + (1 - a) * self.latency
+        self.usable_rate = a * (1.0 if usable else 0.0) + (1 - a) * self.usable_rate
+        self.samples += 1
+
+    def score(self, miss_penalty: float) -> float:
+        # Expected cost: an unusable result means paying for a fallback call as well
+        return (self.latency or 0.0) + (1.0 - self.usable_rate) * miss_penalty
+
+
+class OcrEngine:
+    def __init__(self, backends: List[OcrBackend], mode: str = "auto",
+                 warmup_samples: int = 3, explore_every: int = 25, miss_penalty: float = 5.0):
+        if mode not in MODES:
+            raise ValueError(f"OCR mode must be one of {MODES}, got '{mode}'")
+        self.backends = backends
+        self.mode = mode
+        self.warmup_samples = warmup_samples
+        self.explore_every = explore_every
+        self.miss_penalty = miss_penalty
+        self.stats: Dict[str, BackendStats] = {b.name: BackendStats() for b in backends}
+        self.calls = 0
+
+    def _live(self) -> List[OcrBackend]:
+        return [b for b in self.backends if b.available]
+
+    async def _run(self, backend: OcrBackend, image_bytes: bytes, usable: Callable[[str], bool],
+                   gates: Optional[dict] = None) -> Tuple[str, bool]:
+        gate = (gates or {}).get(backend.kind) or contextlib.nullcontext()
+        t0 = time.perf_counter()
+        try:
+            async with gate:
+                text = await backend.recognize(image_bytes) or ""
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ OCR backend {backend.name} failed: {type(e).__name__}: {e}")
+            text = ""
+        ok = usable(text)
+        self.stats[backend.name].record(time.perf_counter() - t0, ok)
+        return text, ok
+
+    async def _race(self, backends: List[OcrBackend], image_bytes: bytes,
+                    usable: Callable[[str], bool], gates: Optional[dict] = None) -> Tuple[str, Optional[str]]:
+        """First usable result wins; otherwise the longest text any backend produced."""
+        tasks = {asyncio.create_task(self._run(b, image_bytes, usable, gates)): b for b in backends}
+        best, best_name = "", None
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    text, ok = task.result()
+                    name = tasks[task].name
+                    if ok:
+                        self.stats[name].wins += 1
+                        return text, name
+                    if len(text) > len(best):
+                        best, best_name = text, name
+            return best, best_name
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _pick(self, live: List[OcrBackend]) -> Optional[OcrBackend]:
+        if self.mode in ("local", "remote"):
+            preferred = [b for b in live if b.kind == self.mode]
+            return preferred[0] if preferred else None
+        if self.mode == "race":
+            return None
+        # auto: race while measuring, and periodically to refresh the numbers
+        if any(self.stats[b.name].samples < self.warmup_samples for b in live):
+            return None
+        if self.explore_every and self.calls % self.explore_every == 0:
+            return None
+        return min(live, key=lambda b: self.stats[b.name].score(self.miss_penalty))
+
+    async def recognize(self, image_bytes: bytes,
+                        usable: Callable[[str], bool] = lambda t: bool(t.strip()),
+                        gates: Optional[dict] = None) -> Tuple[str, Optional[str]]:
+        """
+        Returns (text, backend_name). `usable` decides whether a result ends the search.
+        `gates` maps backend kind ("local"/"remote") to a semaphore bounding that kind of work.
+        """
+        self.calls += 1
+        live = self._live()
+        if not live:
+            return "", None
+        if len(live) == 1:
+            text, _ = await self._run(live[0], image_bytes, usable, gates)
+            return text, live[0].name
+
+        chosen = self._pick(live)
+        if chosen is None:
+            return await self._race(live, image_bytes, usable, gates)
+
+        text, ok = await self._run(chosen, image_bytes, usable, gates)
+        if ok:
+            self.stats[chosen.name].wins += 1
+            return text, chosen.name
+
+        # Chosen backend came back empty/unusable: race the others before giving up
+        others = [b for b in live if b is not chosen]
+        fallback_text, fallback_name = await self._race(others, image_bytes, usable, gates)
+        if usable(fallback_text) or len(fallback_text) > len(text):
+            return fallback_text, fallback_name
+        return text, chosen.name
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "latency_ms": round(s.latency * 1000) if s.latency is not None else None,
+                "usable_rate": round(s.usable_rate, 2),
+                "samples": s.samples,
+                "wins": s.wins,
+            }
+            for name, s in self.stats.items()
+        }
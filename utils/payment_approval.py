@@ -0,0 +1,166 @@
+# payment_approval.py
+"""
+Product delivery after approval, shared by the admin approve button and the
+opt-in auto-approval fast path used by the receipt audit (handlers/payment.py).
+
+Auto-approval only fires when every check passes:
+  - the provider has a policy (AUTO_APPROVE_PROVIDERS, e.g. "CBE:0:48,Telebirr:5:24"
+    = provider[:amount tolerance ETB[:max transaction age hours]])
+  - the bank confirmed the transaction and Hilawe is the receiver
+  - the receipt is not reused by another payment and the reference was never
+    auto-approved before
+  - the bank amount covers the deal price (or product price) minus the tolerance
+  - the transaction is recent enough
+
+Every decision, approved or not, is written to payment_auto_approvals.
+"""
+import html
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from database.db import Database
+
+logger = logging.getLogger(__name__)
+
+
+async def deliver_product(bot: "Bot", info) -> bool:
+    """Sends the purchased PDF with the localized access message. False if the user can't be reached."""
+    msg = (
+        "🔥 <b>ACCESS GRANTED</b>\n\nYour payment is verified. Your personalized Product is attached below. Let's work."
+        if info['language'] == "EN" else
+        "🔥 <b>ፈቃድ ተሰጥቷል</b>\n\nክፍያዎ ተረጋግጧል። የእርስዎ ልዩ የልምምድ እቅድ ከታች ተያይዟል። ስራ እንጀምር።"
+    )
+    try:
+        await bot.send_document(
+            chat_id=info['user_id'],
+            document=info['telegram_file_id'],
+            caption=msg,
+            parse_mode="HTML"
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Delivery failed: {e}")
+        return False
+
+
+@dataclass(frozen=True)
+class ApprovalPolicy:
+    provider: str
+    amount_tolerance: float = 0.0
+    max_age_hours: float = 48.0
+
+
+def parse_policies(spec: str, default_tolerance: float = 0.0, default_max_age: float = 48.0) -> Dict[str, ApprovalPolicy]:
+    policies = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        fields = item.split(":")
+        provider = fields[0].strip()
+        tolerance = float(fields[1]) if len(fields) > 1 and fields[1] else default_tolerance
+        max_age = float(fields[2]) if len(fields) > 2 and fields[2] else default_max_age
+        policies[provider.upper()] = ApprovalPolicy(provider, tolerance, max_age)
+    return policies
+
+
+class AutoApprover:
+    def __init__(self, db: "Database", policies: Dict[str, ApprovalPolicy]):
+        self.db = db
+        self.policies = policies
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.policies)
+
+    async def evaluate(self, payment_id: int, audit: dict, is_real: bool, is_hilawe: bool) -> Tuple[List[str], dict]:
+        """Returns (reasons it can't be auto-approved, facts for the trail). No reasons = approve."""
+        local = audit["local"]
+        data = (audit.get("bank_data") or {}).get("data", {}) or {}
+        facts = {"provider": local.get("provider"), "reference": local.get("ref"),
+                 "expected": None, "paid": None}
+        reasons = []
+
+        policy = self.policies.get(str(local.get("provider") or "").upper())
+        if policy is None:
+            reasons.append(f"no policy for provider {local.get('provider')}")
+        if not is_real:
+            reasons.append("bank did not confirm the transaction")
+        if not is_hilawe:
+            reasons.append("receiver is not Hilawe")
+        if audit.get("reused_from"):
+            kind, pay_id, _ = audit["reused_from"]
+            reasons.append(f"receipt already used by {kind} #{pay_id}")
+        if reasons:
+            return reasons, facts
+
+        if await self.db.reference_auto_approved(local["ref"], payment_id):
+            reasons.append("reference already auto-approved for another payment")
+
+        expectation = await self.db.get_payment_expectation(payment_id)
+        if expectation is None:
+            return reasons + ["payment not found"], facts
+        if expectation["status"] != "pending":
+            reasons.append(f"payment is {expectation['status']}")
+        facts["expected"] = expectation["expected_amount"]
+
+        try:
+            facts["paid"] = Decimal(str(data.get("amount")))
+        except Exception:
+            reasons.append("bank amount missing")
+        else:
+            if facts["paid"] + Decimal(str(policy.amount_tolerance)) < facts["expected"]:
+                reasons.append(f"paid {facts['paid']} < expected {facts['expected']}")
+
+        try:
+            paid_at = datetime.fromisoformat(str(data.get("date")).replace("Z", "+00:00"))
+            if paid_at.tzinfo is None:
+                paid_at = paid_at.replace(tzinfo=timezone.utc)
+            age_hours = (datetime.now(timezone.utc) - paid_at).total_seconds() / 3600
+            if age_hours > policy.max_age_hours:
+                reasons.append(f"transaction is {age_hours:.0f}h old (max {policy.max_age_hours:.0f}h)")
+        except Exception:
+            reasons.append("bank transaction date missing")
+
+        return reasons, facts
+
+    async def try_approve(self, bot: "Bot", payment_id: int, audit: dict,
+                          is_real: bool, is_hilawe: bool) -> Tuple[Optional[dict], List[str]]:
+        """
+        Approves + delivers when the policy allows. Returns (approval info or None, reasons).
+        info["delivered"] tells whether the PDF reached the user.
+        """
+        reasons, facts = await self.evaluate(payment_id, audit, is_real, is_hilawe)
+        trail = (payment_id, facts["provider"], facts["reference"], facts["expected"], facts["paid"])
+        if reasons:
+            await self.db.record_auto_approval(*trail, "skipped", reasons)
+            return None, reasons
+
+        # The unique index on approved references settles concurrent claims of one receipt
+        approval_id = await self.db.record_auto_approval(*trail, "approved", [])
+        if approval_id is None:
+            reasons = ["reference already auto-approved for another payment"]
+            await self.db.record_auto_approval(*trail, "skipped", reasons)
+            return None, reasons
+
+        info = await self.db.approve_payment(payment_id, only_pending=True)
+        if not info:
+            await self.db.void_auto_approval(approval_id, "payment no longer pending")
+            return None, ["payment no longer pending"]
+
+        delivered = await deliver_product(bot, info)
+        logger.info(f"⚡ Payment #{payment_id} auto-approved ({facts['provider']} {facts['reference']}), delivered={delivered}")
+        return {**dict(info), "delivered": delivered}, []
+
+
+def format_auto_approval(info: Optional[dict], reasons: List[str]) -> str:
+    if info is None:
+        return "🧑‍⚖️ <b>AUTO-APPROVAL SKIPPED</b>\n" + "\n".join(f"• {html.escape(r)}" for r in reasons)
+    if not info["delivered"]:
+        return (
+            f"⚡ <b>AUTO-APPROVED</b> — ⚠️ delivery failed (user may have blocked the bot).\n"
+            f"🛠 Resend manually."
+        )
+    return "⚡ <b>AUTO-APPROVED & DELIVERED</b>\n🤖 <b>By:</b> Verification engine"
@@ -1,13 +1,112 @@
 # product_matcher.py
-from database.db import Database
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from database.db import Database
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "products_changed"
+
 
 class ProductMatcher:
-    def __init__(self, db: Database):
+    """
+    In-process index of active products keyed by (language, gender, level, frequency).
+    Loaded once at startup and reloaded when Postgres NOTIFYs a catalog change
+    (trigger on products, see SCHEMA_SQL), plus a slow periodic refresh as a safety net.
+
+    Fallbacks: exact gender -> 'ALL' products -> any gender (legacy behaviour).
+    Ties resolve to the lowest product id.
+    """
+
+    def __init__(self, db: "Database", listen_dsn: Optional[str] = None, refresh_interval: float = 300.0):
         self.db = db
+        self.listen_dsn = listen_dsn or db.dsn
+        self.refresh_interval = refresh_interval
+        self._exact: Dict[Tuple, asyncpg.Record] = {}
+        self._any_gender: Dict[Tuple, asyncpg.Record] = {}
+        self._reload_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.reloads = 0
+
+    async def load(self):
+        async with self._reload_lock:
+            rows = await self.db._pool.fetch("SELECT * FROM products WHERE is_active = TRUE ORDER BY id")
+            exact, any_gender = {}, {}
+            for r in rows:
+                exact.setdefault((r['language'], r['gender'], r['level'], r['frequency']), r)
+                any_gender.setdefault((r['language'], r['level'], r['frequency']), r)
+            # Swap whole dicts so readers never see a half-built index
+            self._exact, self._any_gender = exact, any_gender
+            self.loaded = True
+            self.reloads += 1
+            logger.info(f"📦 Product index loaded: {len(rows)} active products")
+
+    def match(self, language: str, level: str, frequency: int, gender: Optional[str] = None):
+        if gender:
+            for g in (gender, "ALL"):
+                product = self._exact.get((language, g, level, frequency))
+                if product:
+                    return product
+        return self._any_gender.get((language, level, frequency))
 
     async def get_plan_for_user(self, user_record: dict):
-        return await self.db.match_product(
+        if not self.loaded:
+            await self.load()
+        return self.match(
             language=user_record['language'],
             level=user_record['level'],
-            frequency=user_record['frequency']
+            frequency=user_record['frequency'],
+            gender=user_record.get('gender'),
         )
+
+    # --- LISTEN/NOTIFY ---
+    def _on_notify(self, conn, pid, channel, payload):
+        logger.info(f"🔔 Products changed ({payload}), reloading index")
+        asyncio.create_task(self._safe_load())
+
+    async def _safe_load(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"❌ Product index reload failed: {e}")
+
+    async def _watch(self):
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.listen_dsn)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                # Catch anything that changed while we were not listening
+                await self._safe_load()
+                while not conn.is_closed():
+                    await asyncio.sleep(self.refresh_interval)
+                    await self._safe_load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Product LISTEN connection lost ({e}); polling every {self.refresh_interval}s")
+                await asyncio.sleep(self.refresh_interval)
+                await self._safe_load()
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    async def start(self):
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,186 @@
+# receipt_cache.py
+"""
+Content-addressed cache of receipt audits (OCR output + verify API response).
+
+Keys:
+  - Telegram file_unique_id: same file forwarded/resent -> no download at all
+  - perceptual hash (dHash) of the decoded image: a hint only. Receipts rendered from
+    the same bank template can hash alike, so the new image is still OCR'd and the
+    earlier verification/owner carry over only when the reference matches as well
+
+Backed by the receipt_cache table with an in-memory LRU in front of it. The first
+payment that submits a receipt becomes its owner; any other payment presenting the
+same receipt is reported as a reuse.
+"""
+import io
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from PIL import Image
+
+if TYPE_CHECKING:
+    from database.db import Database
+
+logger = logging.getLogger(__name__)
+
+# (kind, payment_id, user_id) — kind is "payment" or "club"
+Owner = Tuple[str, int, int]
+
+
+def perceptual_hash(image_bytes: bytes, size: int = 16) -> str:
+    """Difference hash over a (size+1) x size grayscale thumbnail, as hex."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("L", (size * 8, size * 8))  # JPEG: decode at a reduced scale, no-op otherwise
+    img = img.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    px = list(img.getdata())
+    bits = 0
+    for row in range(size):
+        base = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[base + col] < px[base + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class ReceiptCache:
+    def __init__(self, db: "Database", max_entries: int = 2048,
+                 negative_ttl: float = 600.0, phash_distance: int = 0):
+        self.db = db
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.phash_distance = phash_distance
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._by_phash: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    # --- in-memory LRU ---
+    def _remember(self, entry: dict) -> dict:
+        key = entry["file_unique_id"]
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry["phash"]:
+            self._by_phash[entry["phash"]] = key
+        while len(self._entries) > self.max_entries:
+            _, old = self._entries.popitem(last=False)
+            if old["phash"] and self._by_phash.get(old["phash"]) == old["file_unique_id"]:
+                del self._by_phash[old["phash"]]
+        return entry
+
+    @staticmethod
+    def _entry(row) -> dict:
+        owner = (row["owner_kind"], row["owner_id"], row["owner_user_id"]) if row["owner_kind"] else None
+        return {
+            "file_unique_id": row["file_unique_id"],
+            "phash": row["phash"],
+            "local": json.loads(row["local_data"]),
+            "bank_data": json.loads(row["bank_data"]) if row["bank_data"] else None,
+            "verified_at": row["verified_at"].timestamp() if row["verified_at"] else None,
+            "owner": owner,
+        }
+
+    # --- lookups ---
+    async def get(self, file_unique_id: str) -> Optional[dict]:
+        entry = self._entries.get(file_unique_id)
+        if entry is not None:
+            self._entries.move_to_end(file_unique_id)
+            self.hits += 1
+            return entry
+        row = await self.db._pool.fetchrow(
+            "SELECT * FROM receipt_cache WHERE file_unique_id = $1", file_unique_id
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._remember(self._entry(row))
+
+    async def find_similar(self, phash: str) -> Optional[dict]:
+        key = self._by_phash.get(phash)
+        if key is None and self.phash_distance:
+            for entry in reversed(self._entries.values()):
+                if entry["phash"] and hamming(entry["phash"], phash) <= self.phash_distance:
+                    key = entry["file_unique_id"]
+                    break
+        if key is not None:
+            self.hits += 1
+            return self._entries[key]
+        row = await self.db._pool.fetchrow(
+            "SELECT * FROM receipt_cache WHERE phash = $1 ORDER BY created_at LIMIT 1", phash
+        )
+        if row is None:
+            return None
+        self.hits += 1
+        return self._remember(self._entry(row))
+
+    def bank_data_fresh(self, entry: dict) -> bool:
+        """Successful verifications are final; not-found answers are retried after negative_ttl."""
+        bank_data = entry.get("bank_data")
+        if not bank_data or not entry.get("verified_at") or bank_data.get("retryable"):
+            return False
+        return bool(bank_data.get("success")) or time.time() - entry["verified_at"] < self.negative_ttl
+
+    @staticmethod
+    def reused_from(entry: dict, owner: Optional[Owner]) -> Optional[Owner]:
+        """The earlier owner if `owner` is presenting someone else's receipt."""
+        if owner is None or entry.get("owner") is None:
+            return None
+        return entry["owner"] if tuple(entry["owner"][:2]) != tuple(owner[:2]) else None
+
+    # --- writes ---
+    async def put(self, file_unique_id: str, phash: Optional[str], local: dict,
+                  bank_data: Optional[dict], owner: Optional[Owner]) -> dict:
+        """Upserts a result; an existing owner is kept, so concurrent submitters still see the first one."""
+        kind, pay_id, user_id = owner or (None, None, None)
+        row = await self.db._pool.fetchrow("""
+            INSERT INTO receipt_cache (file_unique_id, phash, local_data, bank_data, verified_at,
+                                       owner_kind, owner_id, owner_user_id)
+            VALUES ($1, $2, $3::jsonb, $4::jsonb, CASE WHEN $4::jsonb IS NULL THEN NULL ELSE NOW() END, $5, $6, $7)
+            ON CONFLICT (file_unique_id) DO UPDATE SET
+                phash = COALESCE(EXCLUDED.phash, receipt_cache.phash),
+                local_data = EXCLUDED.local_data,
+                bank_data = COALESCE(EXCLUDED.bank_data, receipt_cache.bank_data),
+                verified_at = COALESCE(EXCLUDED.verified_at, receipt_cache.verified_at),
+                owner_kind = COALESCE(receipt_cache.owner_kind, EXCLUDED.owner_kind),
+                owner_id = CASE WHEN receipt_cache.owner_kind IS NULL THEN EXCLUDED.owner_id ELSE receipt_cache.owner_id END,
+                owner_user_id = CASE WHEN receipt_cache.owner_kind IS NULL THEN EXCLUDED.owner_user_id ELSE receipt_cache.owner_user_id END,
+                hits = receipt_cache.hits + 1,
+                last_seen_at = NOW()
+            RETURNING *
+        """, file_unique_id, phash, json.dumps(local), json.dumps(bank_data) if bank_data else None,
+            kind, pay_id, user_id)
+        return self._remember(self._entry(row))
+
+    async def claim(self, entry: dict, owner: Optional[Owner]) -> dict:
+        """Records a cache hit; an unowned entry (admin test scans) is claimed by `owner`."""
+        if owner is None or entry.get("owner") is not None:
+            return entry
+        kind, pay_id, user_id = owner
+        row = await self.db._pool.fetchrow("""
+            UPDATE receipt_cache SET
+                hits = hits + 1,
+                last_seen_at = NOW(),
+                owner_kind = COALESCE(owner_kind, $2),
+                owner_id = CASE WHEN owner_kind IS NULL THEN $3 ELSE owner_id END,
+                owner_user_id = CASE WHEN owner_kind IS NULL THEN $4 ELSE owner_user_id END
+            WHERE file_unique_id = $1
+            RETURNING *
+        """, entry["file_unique_id"], kind, pay_id, user_id)
+        return self._remember(self._entry(row)) if row else entry
+
+    async def store_bank_data(self, entry: dict, bank_data: dict):
+        entry["bank_data"] = bank_data
+        entry["verified_at"] = time.time()
+        await self.db._pool.execute(
+            "UPDATE receipt_cache SET bank_data = $2::jsonb, verified_at = NOW() WHERE file_unique_id = $1",
+            entry["file_unique_id"], json.dumps(bank_data),
+        )
+
+    def snapshot(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,255 @@
+# receipt_parser.py
+"""
+Receipt text parser behind handlers/verify._parse_ocr_text.
+
+Banks are provider plugins (`@register_provider`). Each plugin declares:
+  - keywords: regex -> weight, used to recognise its receipts
+  - ref / amount / receiver patterns, compiled once at registration
+
+Provider detection is one pass: every plugin's keywords are merged into a single
+alternation, the OCR text is scanned once and each provider scores the sum of the
+distinct keywords it matched. Highest score wins; ties go to the plugin registered
+first. Adding a bank never adds another pass over the text.
+
+Keywords must start with a literal character (use `word()` for whole-word matches):
+each alternative is tagged by an empty named group *after* it, so `re` can still build
+its first-character prefilter and skip every position no keyword can start at.
+"""
+import re
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# Same sanitisation the verifier always used: letters/digits/colons/dashes only
+_SANITIZE = re.compile(r"[^A-Z0-9\n\s:\-]")
+_AMOUNT_ANY = re.compile(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)")
+_SPACES = re.compile(r"\s+")
+
+
+def word(literal: str) -> str:
+    """Whole-word keyword that still starts with a literal (boundary checked behind it)."""
+    return rf"{literal}(?<![A-Z0-9]{literal})\b"
+
+
+class ProviderPlugin:
+    name = "base"
+    # regex -> weight, matched on the sanitised uppercase text
+    keywords: Dict[str, int] = {}
+    # tried in order on the sanitised text, then `raw_ref_patterns` on the original text
+    ref_patterns: Tuple[str, ...] = ()
+    raw_ref_patterns: Tuple[str, ...] = ()
+    # tried on the uppercase text with punctuation kept (amounts need "," and ".")
+    amount_patterns: Tuple[str, ...] = (
+        r"(?:TRANSFERRED\s*AMOUNT|TOTAL\s*(?:PAID\s*)?AMOUNT(?:\s*PAID)?|SETTLED\s*AMOUNT|DEBITED|AMOUNT)[^0-9\n]{0,20}"
+        r"(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)",
+    )
+    receiver_patterns: Tuple[str, ...] = ()
+    # an unrecognised receipt is handed to this plugin (and becomes its provider on a ref hit)
+    claims_unknown = False
+
+    def __init__(self):
+        self._ref = [re.compile(p) for p in self.ref_patterns]
+        self._raw_ref = [re.compile(p, re.UNICODE) for p in self.raw_ref_patterns]
+        self._amount = [re.compile(p) for p in self.amount_patterns]
+        self._receiver = [re.compile(p) for p in self.receiver_patterns]
+
+    def ref(self, up: str, raw: str) -> Optional[str]:
+        for pattern in self._ref:
+            m = pattern.search(up)
+            if m:
+                return _SPACES.sub("", m.group(1))
+        for pattern in self._raw_ref:
+            m = pattern.search(raw)
+            if m:
+                return m.group(1).strip().upper()
+        return None
+
+    def amount(self, raw_up: str) -> Optional[str]:
+        for pattern in self._amount:
+            m = pattern.search(raw_up)
+            if m:
+                return m.group(1)
+        return None
+
+    def receiver(self, up: str) -> Optional[str]:
+        for pattern in self._receiver:
+            m = pattern.search(up)
+            if m:
+                return m.group(1).strip()
+        return None
+
+
+_PROVIDERS: List[ProviderPlugin] = []
+_scanner: Optional[Tuple[Pattern, Dict[str, Tuple[str, int]]]] = None
+
+
+def register_provider(cls):
+    """Class decorator: instantiates the plugin and adds it to the detection scan."""
+    global _scanner
+    _PROVIDERS[:] = [p for p in _PROVIDERS if p.name != cls.name] + [cls()]
+    _scanner = None
+    return cls
+
+
+def providers() -> List[ProviderPlugin]:
+    return list(_PROVIDERS)
+
+
+def _compiled_scanner() -> Tuple[Pattern, Dict[str, Tuple[str, int]]]:
+    global _scanner
+    if _scanner is None:
+        parts, groups = [], {}
+        for i, plugin in enumerate(_PROVIDERS):
+            for j, (pattern, weight) in enumerate(plugin.keywords.items()):
+                group = f"p{i}k{j}"
+                parts.append(f"(?:{pattern})(?P<{group}>)")
+                groups[group] = (plugin.name, weight)
+        _scanner = (re.compile("|".join(parts) or r"(?!)"), groups)
+    return _scanner
+
+
+def score_providers(up: str) -> Dict[str, int]:
+    """Single scan of the sanitised text -> {provider: score}, distinct keywords only."""
+    pattern, groups = _compiled_scanner()
+    seen = {m.lastgroup for m in pattern.finditer(up)}
+    scores: Dict[str, int] = {}
+    for group in seen:
+        name, weight = groups[group]
+        scores[name] = scores.get(name, 0) + weight
+    return scores
+
+
+def parse_receipt(raw: str) -> dict:
+    """{provider, ref, amount, receiver, scores} from raw OCR text."""
+    raw_up = raw.upper()
+    up = _SANITIZE.sub(" ", raw_up)
+    scores = score_providers(up)
+
+    plugin = None
+    if scores:
+        best = max(scores.values())
+        plugin = next(p for p in _PROVIDERS if scores.get(p.name) == best)
+
+    provider, ref = (plugin.name if plugin else "Unknown"), None
+    if plugin is not None:
+        ref = plugin.ref(up, raw)
+    else:
+        for candidate in (p for p in _PROVIDERS if p.claims_unknown):
+            ref = candidate.ref(up, raw)
+            if ref:
+                plugin, provider = candidate, candidate.name
+                break
+
+    amount = plugin.amount(raw_up) if plugin is not None else None
+    if amount is None:
+        amounts = _AMOUNT_ANY.findall(raw)
+        amount = max(amounts, key=lambda x: len(x.replace(",", ""))) if amounts else None
+
+    return {
+        "provider": provider,
+        "ref":      ref,
+        "amount":   amount,
+        "receiver": plugin.receiver(up) if plugin is not None else None,
+        "scores":   scores,
+    }
+
+
+def receiver_matches(raw: str, name: str) -> bool:
+    """
+    True if `name` is the receiver printed on the receipt. Uses the provider's receiver
+    field; only when no such field was read does it fall back to scanning the whole text.
+    """
+    name = name.upper()
+    receiver = parse_receipt(raw)["receiver"]
+    if receiver:
+        return name in receiver
+    return name in raw.upper()
+
+
+# ─────────────────────────────────────────────
+#  BUILT-IN PROVIDERS  (registration order = tie-break order)
+# ─────────────────────────────────────────────
+@register_provider
+class CBEProvider(ProviderPlugin):
+    name = "CBE"
+    keywords = {
+        r"COMMERCIAL\s+BANK": 3,
+        word("CBE"): 2,
+        r"BRECIEPT": 3,
+        r"FT2": 1,
+    }
+    ref_patterns = (
+        r"F\s*T\s*([A-Z0-9]{8,12})",
+        r"(?:ID|TRANSACTION\s*ID)[:\s]+([A-Z0-9]{10,14})",
+    )
+    receiver_patterns = (
+        r"RECEIVER(?:\s*NAME)?[: \t]+([A-Z][A-Z \t]{2,40})",
+        r"CREDITED\s*(?:PARTY|ACCOUNT)\s*NAME[: \t]+([A-Z][A-Z \t]{2,40})",
+    )
+
+    def ref(self, up: str, raw: str) -> Optional[str]:
+        m = self._ref[0].search(up)
+        if m:
+            return "FT" + _SPACES.sub("", m.group(1))
+        m = self._ref[1].search(up)
+        return m.group(1).strip() if m else None
+
+
+@register_provider
+class TelebirrProvider(ProviderPlugin):
+    name = "Telebirr"
+    keywords = {
+        r"TELEBIRR": 3,
+        r"ETHIO\s+TELECOM": 3,
+        r"TELE\s+BIRR": 3,
+        r"D(?<![A-Z0-9]D)[A-Z0-9]{9}\b": 1,
+    }
+    ref_patterns = tuple(
+        rf"{label}[:\s#]+([A-Z0-9]{{8,14}})"
+        for label in ("TRANSACTION NUMBER", "TRANSACTION NO", "INVOICE NO",
+                      "INVOICE NUMBER", "REF NO", "REFERENCE NO", "NUMBER")
+    ) + (r"\b(D[A-Z0-9]{9})\b",)
+    # Amharic label — OCR reads Ethiopic script reliably; checked after the English labels
+    raw_ref_patterns = (r"የግብይት\s*ቁጥር[:\s]+([A-Z0-9a-z]{8,14})",)
+    receiver_patterns = (
+        r"CREDITED\s*PARTY\s*NAME[: \t]+([A-Z][A-Z \t]{2,40})",
+        r"RECEIVER(?:\s*NAME)?[: \t]+([A-Z][A-Z \t]{2,40})",
+    )
+    claims_unknown = True
+
+    def ref(self, up: str, raw: str) -> Optional[str]:
+        labels, d_prefix = self._ref[:-1], self._ref[-1]
+        for pattern in labels:
+            m = pattern.search(up)
+            if m:
+                return m.group(1).strip()
+        m = self._raw_ref[0].search(raw)
+        if m:
+            return m.group(1).strip().upper()
+        # D-prefix fallback: Telebirr IDs are consistently D + 9 alphanumeric chars
+        m = d_prefix.search(up)
+        return m.group(1) if m else None
+
+
+@register_provider
+class BOAProvider(ProviderPlugin):
+    name = "BOA"
+    keywords = {
+        r"BANK\s+OF\s+ABYSSINIA": 4,
+        r"ABYSSINIA": 2,
+        word("BOA"): 2,
+    }
+    ref_patterns = (
+        r"(?:TRANSACTION\s*REF(?:ERENCE)?|REFERENCE\s*NO|REF\s*NO)[:\s#]+([A-Z0-9]{8,16})",
+        r"\b(FT[A-Z0-9]{8,12})\b",
+    )
+    receiver_patterns = (
+        r"BENEFICIARY(?:\s*NAME)?[: \t]+([A-Z][A-Z \t]{2,40})",
+        r"CREDITED\s*TO[: \t]+([A-Z][A-Z \t]{2,40})",
+        r"RECEIVER(?:\s*NAME)?[: \t]+([A-Z][A-Z \t]{2,40})",
+    )
+
+
+@register_provider
+class AwashProvider(ProviderPlugin):
+    # Detected so it isn't mistaken for another bank; no reference format yet
+    name = "Awash"
+    keywords = {r"AWASH": 3}
@@ -0,0 +1,48 @@
+# send_queue.py
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def stream_to_workers(
+    chunks: AsyncIterator[Iterable[Any]],
+    handler: Callable[[Any], Awaitable[Any]],
+    workers: int = 30,
+    maxsize: Optional[int] = None,
+) -> int:
+    """
+    Bounded producer/consumer pump for broadcasts.
+    The producer pulls chunks (e.g. from Database.iter_chunks) into a queue of at most
+    `maxsize` items; `workers` consumers call `handler(item)` concurrently.
+    Memory stays flat regardless of audience size and the first send starts as soon as
+    the first chunk arrives. Returns the number of items produced.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize or workers * 4)
+    produced = 0
+
+    async def consumer():
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            try:
+                await handler(item)
+            except Exception as e:
+                logger.exception(f"❌ Send worker error: {e}")
+
+    consumers = [asyncio.create_task(consumer()) for _ in range(max(1, workers))]
+    try:
+        async for chunk in chunks:
+            for item in chunk:
+                await queue.put(item)
+                produced += 1
+    finally:
+        # Stop the workers even if the producer blew up, then let them drain
+        for _ in consumers:
+            await queue.put(_DONE)
+        await asyncio.gather(*consumers)
+    return produced
@@ -0,0 +1,54 @@
+# throttle_store.py
+"""
+Last-seen table behind middlewares/throttling_middleware.ThrottlingMiddleware.
+
+Keys are small integer tuples, (EVENT_MESSAGE | EVENT_CALLBACK, user_id), so one store
+serves every event type without building a string per update. Expiry is a time wheel:
+each hit appends its key to the bucket of the current `bucket_width` slice, and buckets
+older than `ttl` are popped from the front. A popped key is dropped only if it wasn't
+seen again since (a later hit sits in a later bucket). Every append is popped once, so
+eviction is amortised O(1) per hit and never scans the whole table.
+"""
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+EVENT_MESSAGE = 0
+EVENT_CALLBACK = 1
+
+Key = Tuple[int, int]
+
+
+class ThrottleStore:
+    def __init__(self, ttl: float, bucket_width: float = 0.25):
+        # ttl: how long a timestamp can still throttle anything (the longest interval)
+        self.ttl = ttl
+        self.bucket_width = bucket_width
+        self.last_seen: Dict[Key, float] = {}
+        self._wheel: Deque[Tuple[int, List[Key]]] = deque()
+
+    def hit(self, key: Key, now: float, interval: float) -> bool:
+        """True and records `now` if `key` was quiet for `interval` seconds, else False."""
+        self._expire(now)
+        last = self.last_seen.get(key)
+        if last is not None and now - last < interval:
+            return False
+        self.last_seen[key] = now
+        bucket = int(now // self.bucket_width)
+        if not self._wheel or self._wheel[-1][0] != bucket:
+            self._wheel.append((bucket, []))
+        self._wheel[-1][1].append(key)
+        return True
+
+    def _expire(self, now: float):
+        # Every timestamp in a bucket below `horizon` is at least ttl old
+        horizon = int((now - self.ttl) // self.bucket_width)
+        wheel, last_seen = self._wheel, self.last_seen
+        while wheel and wheel[0][0] < horizon:
+            _, keys = wheel.popleft()
+            for key in keys:
+                last = last_seen.get(key)
+                if last is not None and now - last >= self.ttl:
+                    del last_seen[key]
+
+    def __len__(self):
+        return len(self.last_seen)
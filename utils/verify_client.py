@@ -0,0 +1,186 @@
+# verify_client.py
+"""
+Hedged, single-flight client for the bank verification API.
+
+  - Every endpoint for a provider is queried in parallel; the first success wins
+    and the remaining requests are cancelled.
+  - If nothing has succeeded after `hedge_delay`, another round is fired without
+    abandoning the requests already in flight (hedging), up to `max_attempts` rounds
+    inside an overall `deadline`.
+  - Concurrent lookups of the same (reference, provider) share one in-flight lookup.
+  - Each endpoint has a circuit breaker: after `failure_threshold` consecutive
+    transport/5xx failures it is skipped for `reset_timeout` seconds, then probed once.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """A probe was cancelled before it got an answer."""
+        self._probing = False
+
+
+class VerifyClient:
+    def __init__(self, client_factory: Callable[[], httpx.AsyncClient],
+                 endpoints_for: Callable[[str], List[str]],
+                 hedge_delay: float = 1.5, max_attempts: int = 3, retry_delay: float = 0.5,
+                 deadline: float = 20.0, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.client_factory = client_factory
+        self.endpoints_for = endpoints_for
+        self.hedge_delay = hedge_delay
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.coalesced = 0
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        if url not in self.breakers:
+            self.breakers[url] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[url]
+
+    async def verify(self, reference: str, payload: dict, provider: str) -> dict:
+        """Single-flight entry point: callers asking for the same lookup share one result."""
+        key = (reference.strip().upper(), provider)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(payload, provider))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded: one caller giving up must not cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def _post(self, url: str, payload: dict) -> Tuple[str, Optional[dict]]:
+        """Returns ("hit" | "miss" | "error", body)."""
+        breaker = self._breaker(url)
+        try:
+            resp = await self.client_factory().post(url, json=payload)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Verify request to {url} failed: {type(e).__name__}: {e}")
+            breaker.record_failure()
+            return "error", None
+
+        if resp.status_code >= 500:
+            logger.warning(f"⚠️ Verify endpoint {url} returned {resp.status_code}")
+            breaker.record_failure()
+            return "error", None
+
+        breaker.record_success()
+        try:
+            data = resp.json()
+        except ValueError:
+            return "miss", None
+        if resp.status_code == 200 and data.get("success"):
+            return "hit", data
+        return "miss", data
+
+    async def _lookup(self, payload: dict, provider: str) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        endpoints = self.endpoints_for(provider)
+        pending = set()
+        sent_by = {}            # task -> (round, url)
+        outcomes = {}           # (round, url) -> "miss" | "error"
+        final_round = None      # (round, urls) of the last round that sent anything
+        sent = 0
+        try:
+            for attempt in range(self.max_attempts):
+                live = [url for url in endpoints if self._breaker(url).allow()]
+                for url in live:
+                    task = asyncio.create_task(self._post(url, payload))
+                    sent_by[task] = (attempt, url)
+                    pending.add(task)
+                if live:
+                    final_round = (attempt, live)
+                sent += len(live)
+                if not pending:
+                    break
+
+                last_round = attempt == self.max_attempts - 1
+                hedge_at = deadline if last_round else min(deadline, loop.time() + self.hedge_delay)
+                while pending:
+                    timeout = hedge_at - loop.time()
+                    if timeout <= 0:
+                        break
+                    done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        outcome, data = task.result()
+                        if outcome == "hit":
+                            return data
+                        outcomes[sent_by[task]] = outcome
+
+                if loop.time() >= deadline:
+                    break
+                if not pending and not last_round:
+                    await asyncio.sleep(self.retry_delay)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not sent:
+            return {"success": False, "retryable": True,
+                    "error": "Bank verification endpoints unavailable (circuit open), timed out fast."}
+        # Definitive only if every endpoint of the final round answered "miss":
+        # an error or a request still in flight there may be the one that has it
+        attempt, urls = final_round
+        if all(outcomes.get((attempt, url)) == "miss" for url in urls):
+            return {"success": False, "retryable": False, "error": "Transaction not found on the bank ledger."}
+        if "error" in (outcomes.get((attempt, url)) for url in urls):
+            return {"success": False, "retryable": True,
+                    "error": "Bank verification server failed to answer; the lookup will be retried."}
+        return {"success": False, "retryable": True,
+                "error": f"Bank verification server timed out after {self.deadline:.0f} seconds."}
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            url: {"state": b.state, "failures": b.failures}
+            for url, b in self.breakers.items()
+        }